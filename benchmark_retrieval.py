@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Full-guidelines vs retrieval-mode benchmark for the OneDay agent.
+
+Runs the same cases twice for one model — once with the full guidelines in the
+system prompt, once with `--retrieval-k K` — and compares pass rate, agent prompt
+tokens and agent latency per variant.
+
+Usage:
+    python benchmark_retrieval.py --model gpt-5-mini --max-cases 20
+    python benchmark_retrieval.py --model gpt-5-mini --top-k 6 --variant diagnosis_only
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from run_all_models import ALL_MODELS, load_results
+
+PROJECT_ROOT = Path(__file__).parent
+
+
+def run_mode(model: str, results_dir: str, retrieval_k: int, max_cases: int | None, variant: str | None) -> int:
+    """Run pytest for one guidelines mode and return the exit code."""
+    cmd = [
+        sys.executable, "-m", "pytest",
+        "-n", "auto",
+        "--model", model,
+        "test_oneday_evaluation.py",
+    ]
+    if retrieval_k:
+        cmd += ["--retrieval-k", str(retrieval_k)]
+    if max_cases is not None:
+        cmd += ["--max-cases", str(max_cases)]
+    if variant:
+        cmd += ["-k", variant]
+
+    env = {**os.environ, "ONEDAY_RESULTS_DIR": results_dir}
+
+    label = f"retrieval (k={retrieval_k})" if retrieval_k else "full guidelines"
+    print(f"\n{'=' * 60}")
+    print(f"  Running {model}: {label}")
+    print(f"{'=' * 60}\n")
+
+    proc = subprocess.run(cmd, cwd=PROJECT_ROOT, env=env, capture_output=False)
+    return proc.returncode
+
+
+def summarize(data: dict) -> dict:
+    """Per-variant pass rate, agent prompt tokens and agent time from a results JSON."""
+    summary = {}
+    for variant, vdata in data.get("variants", {}).items():
+        cases = vdata["cases"]
+        passed = sum(1 for c in cases if c["passed"])
+        agent_prompt = [c["agent_prompt_tokens"] for c in cases if c.get("agent_prompt_tokens") is not None]
+        agent_stats = vdata.get("agent_time_stats") or {}
+        summary[variant] = {
+            "passed": passed,
+            "total": len(cases),
+            "pass_rate": round(passed / len(cases) * 100, 1) if cases else 0,
+            "total_prompt_tokens": vdata.get("total_prompt_tokens", 0),
+            "agent_prompt_tokens": sum(agent_prompt) if agent_prompt else None,
+            "agent_time_avg": agent_stats.get("avg"),
+            "agent_time_p90": agent_stats.get("p90"),
+            "total_cost": vdata.get("total_cost", 0),
+        }
+    return summary
+
+
+def _fmt(val, spec: str = "", suffix: str = "") -> str:
+    return "—" if val is None else f"{val:{spec}}{suffix}"
+
+
+def _change(full, retrieval) -> str:
+    if not full or retrieval is None:
+        return ""
+    return f"{(retrieval - full) / full * 100:+.1f}%"
+
+
+def print_comparison(full: dict, retrieval: dict, top_k: int) -> None:
+    rows = [
+        ("Pass rate", "pass_rate", ".1f", "%"),
+        ("Prompt tokens (all roles)", "total_prompt_tokens", ",", ""),
+        ("Agent prompt tokens", "agent_prompt_tokens", ",", ""),
+        ("Agent time avg", "agent_time_avg", ".1f", "s"),
+        ("Agent time p90", "agent_time_p90", ".1f", "s"),
+        ("Cost", "total_cost", ".4f", ""),
+    ]
+    for variant in ["standard", "diagnosis_only"]:
+        if variant not in full and variant not in retrieval:
+            continue
+        f = full.get(variant, {})
+        r = retrieval.get(variant, {})
+        print(f"\n  {variant}: full {f.get('passed', 0)}/{f.get('total', 0)}, retrieval k={top_k} {r.get('passed', 0)}/{r.get('total', 0)}")
+        print(f"  {'':<28}{'full':>14}{'retrieval':>14}{'change':>10}")
+        for label, key, spec, suffix in rows:
+            print(f"  {label:<28}{_fmt(f.get(key), spec, suffix):>14}{_fmt(r.get(key), spec, suffix):>14}{_change(f.get(key), r.get(key)):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-guidelines and retrieval-mode agent runs")
+    parser.add_argument("--model", choices=ALL_MODELS, default="gpt-5-mini", help="Model to benchmark")
+    parser.add_argument("--top-k", type=int, default=4, metavar="K", help="Guideline sections retrieved per turn (default: 4)")
+    parser.add_argument("--max-cases", type=int, default=None, metavar="N", help="Only run the first N test cases")
+    parser.add_argument("--variant", choices=["standard", "diagnosis_only"], default=None, help="Only run a specific test variant")
+    parser.add_argument("--output", "-o", default=None, help="Also write the comparison as JSON to this path")
+    args = parser.parse_args()
+
+    if args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+
+    full_dir = tempfile.mkdtemp(prefix="oneday_full_")
+    retrieval_dir = tempfile.mkdtemp(prefix="oneday_retrieval_")
+    print(f"OneDay Retrieval Benchmark")
+    print(f"Model: {args.model}, top-k: {args.top_k}")
+    print(f"Results dirs: {full_dir}, {retrieval_dir}")
+
+    run_mode(args.model, full_dir, 0, args.max_cases, args.variant)
+    run_mode(args.model, retrieval_dir, args.top_k, args.max_cases, args.variant)
+
+    full_results = load_results(full_dir).get(args.model)
+    retrieval_results = load_results(retrieval_dir).get(args.model)
+    if not full_results or not retrieval_results:
+        print("\nNo results collected for one of the modes. Check that tests ran successfully.")
+        sys.exit(1)
+
+    full = summarize(full_results)
+    retrieval = summarize(retrieval_results)
+
+    print(f"\n{'=' * 60}")
+    print(f"  {args.model}: full guidelines vs retrieval (k={args.top_k})")
+    print(f"{'=' * 60}")
+    print_comparison(full, retrieval, args.top_k)
+    print()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"model": args.model, "top_k": args.top_k, "max_cases": args.max_cases,
+                       "full": full, "retrieval": retrieval}, f, indent=2)
+        print(f"Comparison written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,16 +8,59 @@ to avoid redundant API calls and cache race conditions.
 """
 
 import pytest
+import pytest_asyncio
 import json
 import re
-import math
 import os
-import requests
-import litellm
-from litellm.types.utils import ModelResponse, Usage
+import time
+import uuid
 from datetime import datetime, timezone
 from collections import defaultdict
 from dotenv import load_dotenv
+
+# Timed here, before harness (whose modules import it) — the one-off cost --profile reports
+_litellm_import_started = time.perf_counter()
+import litellm  # noqa: E402,F401
+LITELLM_IMPORT_S = time.perf_counter() - _litellm_import_started
+
+from harness import (  # noqa: E402
+    CASSETTE_MODES,
+    LLM_ROLES,
+    LatencyHistogram,
+    MetricTable,
+    ResultsLog,
+    RunBudget,
+    ScenarioPool,
+    StackSampler,
+    TraceFetcher,
+    close_turn_async_client,
+    compact_results_log,
+    cache_dir,
+    default_cassette_path,
+    install_call_accounting,
+    install_cassette,
+    install_profiling,
+    install_rate_limiter,
+    installed_call_accounting,
+    installed_rate_limiter,
+    llm_role,
+    merge_breakdowns,
+    merge_histograms,
+    new_run_id,
+    parse_duration,
+    parse_rate_limits,
+    read_results_log,
+    run_history,
+    set_turn_base_url,
+    summarize,
+    trace_store,
+    uninstall_call_accounting,
+    uninstall_cassette,
+    uninstall_profiling,
+    uninstall_rate_limiter,
+    usage_by_role,
+    usage_from_traces,
+)
 load_dotenv()
 
 
@@ -28,78 +71,135 @@ _completed_count = 0
 _total_count = 0
 
 
-def compute_usage_from_traces(trace_ids: list[str]) -> dict:
-    """Fetch LangWatch traces and compute total token usage, cost, and per-agent LLM timing."""
-    langwatch_api_key = os.getenv("LANGWATCH_API_KEY")
-    total_prompt_tokens = 0
-    total_completion_tokens = 0
-    total_cost = 0.0
-    agent_llm_ms = 0
-    judge_llm_ms = 0
-    user_sim_llm_ms = 0
-
-    for trace_id in trace_ids:
-        try:
-            response = requests.get(
-                f"https://app.langwatch.ai/api/traces/{trace_id}",
-                headers={"X-Auth-Token": langwatch_api_key},
-            )
-            if response.status_code != 200:
-                continue
-            trace = response.json()
-        except Exception:
-            continue
+_trace_fetcher: TraceFetcher | None = None
+# Per-case JSONL log in ONEDAY_RESULTS_DIR, appended as cases finish (controller only)
+_results_log: ResultsLog | None = None
+# Per-call LLM latency histograms by "role|model", merged from every worker
+_llm_latency: dict[str, LatencyHistogram] = {}
+# --max-cost / --max-wall-time; enforced on the controller, observed by workers through its stop file
+_budget = RunBudget()
+# --profile-sample-ms stack sampler for this process's main thread
+_sampler: StackSampler | None = None
 
-        spans_by_id = {s["span_id"]: s for s in trace.get("spans", [])}
-
-        for span in trace.get("spans", []):
-            if span.get("type") != "llm":
-                continue
-            metrics = span.get("metrics") or {}
-            model = span.get("model", "")
-            prompt_tokens = metrics.get("prompt_tokens") or 0
-            completion_tokens = metrics.get("completion_tokens") or 0
-            total_prompt_tokens += prompt_tokens
-            total_completion_tokens += completion_tokens
-            try:
-                mock_response = ModelResponse(
-                    model=model,
-                    usage=Usage(
-                        prompt_tokens=prompt_tokens,
-                        completion_tokens=completion_tokens,
-                        total_tokens=prompt_tokens + completion_tokens,
-                    ),
-                )
-                total_cost += litellm.completion_cost(  # type: ignore[attr-defined]
-                    completion_response=mock_response,
-                    model=model,
-                )
-            except Exception:
-                pass  # Model not in litellm pricing table
-
-            # Per-agent LLM timing via parent span name
-            ts = span.get("timestamps") or {}
-            started = ts.get("started_at")
-            finished = ts.get("finished_at")
-            if started and finished:
-                duration_ms = finished - started
-                parent_id = span.get("parent_id")
-                parent_name = (spans_by_id.get(parent_id) or {}).get("name", "") if parent_id else ""
-                if "UserSimulator" in parent_name:
-                    user_sim_llm_ms += duration_ms
-                elif "Judge" in parent_name:
-                    judge_llm_ms += duration_ms
-                else:
-                    agent_llm_ms += duration_ms
 
-    return {
-        "prompt_tokens": total_prompt_tokens,
-        "completion_tokens": total_completion_tokens,
-        "cost": total_cost,
-        "agent_llm_ms": agent_llm_ms,
-        "judge_llm_ms": judge_llm_ms,
-        "user_sim_llm_ms": user_sim_llm_ms,
+def _get_trace_fetcher() -> TraceFetcher | None:
+    """Background LangWatch downloader (controller only); None when traces can't be fetched."""
+    global _trace_fetcher
+    # Workers forward their reports to the controller, which does the fetching.
+    # Replayed runs are offline, and their traces carry no real LLM spans.
+    if _test_metadata.get("worker") or _test_metadata.get("cassette") == "replay":
+        return None
+    api_key = os.getenv("LANGWATCH_API_KEY")
+    if not api_key:
+        return None
+    if _trace_fetcher is None:
+        _trace_fetcher = TraceFetcher(api_key, store=trace_store())
+    return _trace_fetcher
+
+
+def _accounted_usage(props: dict) -> dict | None:
+    """A case's usage from the in-process litellm accounting, or None if it wasn't counted."""
+    by_role = usage_by_role(props)
+    if not by_role:
+        return None
+    usage = {
+        field: sum(role_usage[field] for role_usage in by_role.values())
+        for field in ("prompt_tokens", "cached_prompt_tokens", "completion_tokens", "cost")
     }
+    for role in ("agent", "judge", "user_sim"):
+        usage[f"{role}_llm_ms"] = round(by_role.get(role, {}).get("llm_ms", 0))
+    usage["unpriced_models"] = {key[len("unpriced:"):]: calls for key, calls in props.items() if key.startswith("unpriced:")}
+    return usage
+
+
+def _apply_usage(row: dict, usage: dict, inputs: dict) -> None:
+    """Fills a result row's token, cost and LLM timing fields."""
+    if inputs["turn_agent_prompt_tokens"] is not None:
+        # Turn runs: only count OneDay agent tokens (production metric).
+        # Judge/UserSimulator calls are used solely for the timing breakdown.
+        usage.update(
+            prompt_tokens=int(inputs["turn_agent_prompt_tokens"]),
+            cached_prompt_tokens=0,
+            completion_tokens=int(inputs["turn_agent_completion_tokens"] or 0),
+            cost=0.0,
+            unpriced_models={},
+        )
+    elif not usage["cached_prompt_tokens"]:
+        # LangWatch doesn't report cache reads for every provider; fall back to the
+        # agent's own litellm usage so prompt caching is still visible.
+        usage["cached_prompt_tokens"] = int(inputs["agent_cached_prompt_tokens"] or 0)
+    row.pop("_usage_inputs", None)
+    row.update(
+        prompt_tokens=usage["prompt_tokens"],
+        cached_prompt_tokens=usage["cached_prompt_tokens"],
+        uncached_prompt_tokens=max(usage["prompt_tokens"] - usage["cached_prompt_tokens"], 0),
+        completion_tokens=usage["completion_tokens"],
+        cost=usage["cost"],
+        agent_llm_ms=usage["agent_llm_ms"],
+        judge_llm_ms=usage["judge_llm_ms"],
+        user_sim_llm_ms=usage["user_sim_llm_ms"],
+        unpriced_models=usage["unpriced_models"],
+    )
+
+
+def _apply_trace_usage(row: dict, traces: dict) -> None:
+    """Fills a result row's usage from its LangWatch traces (cases without in-process accounting)."""
+    usage = usage_from_traces([traces.get(trace_id) for trace_id in row["trace_ids"]])
+    _apply_usage(row, usage, row["_usage_inputs"])
+
+
+def _collect_trace_usage() -> None:
+    """Waits once for the background trace downloads and fills in usage for every result."""
+    global _trace_fetcher
+    pending = [row for results in _test_results.values() for row in results if "_usage_inputs" in row]
+    if _trace_fetcher is not None:
+        traces = _trace_fetcher.collect()
+        _trace_fetcher.close()
+        _trace_fetcher = None
+    elif pending and not _test_metadata.get("worker"):
+        # No LangWatch access: use whatever earlier runs or prefetch_traces.py stored
+        traces = trace_store().get_many([trace_id for row in pending for trace_id in row["trace_ids"]])
+    else:
+        traces = {}
+    for row in pending:
+        _apply_trace_usage(row, traces)
+        _log_case(row)
+
+
+def _open_results_log(run_label: str, timestamp: str) -> None:
+    global _results_log
+    results_dir = os.environ.get("ONEDAY_RESULTS_DIR")
+    if not results_dir:
+        return
+    os.makedirs(results_dir, exist_ok=True)
+    _results_log = ResultsLog(os.path.join(results_dir, f"{run_label}.jsonl"))
+    _results_log.write({"type": "run", "model": run_label, "timestamp": timestamp})
+
+
+def _log_case(row: dict) -> None:
+    """Appends a case's current result row to the results log (again, once its usage is known)."""
+    if _results_log is not None:
+        _results_log.write({
+            "type": "case",
+            "variant": row["_variant"],
+            "key": row["_nodeid"],
+            "row": _public_row(row),
+        })
+
+
+def _public_row(row: dict) -> dict:
+    return {key: value for key, value in row.items() if not key.startswith("_")}
+
+
+def _close_results_log() -> str | None:
+    """Closes the results log; returns its path."""
+    global _results_log
+    if _results_log is None:
+        return None
+    _results_log.close()
+    path = _results_log.path
+    _results_log = None
+    return path
 
 
 def _is_xdist_worker(config):
@@ -137,6 +237,102 @@ def pytest_addoption(parser):
         metavar="UUID",
         help="Turn.io journey UUID to use (overrides TURN_JOURNEY_UUID env var; auto-enables --turn)",
     )
+    parser.addoption(
+        "--turn-base-url",
+        action="store",
+        default=None,
+        metavar="URL",
+        help="Turn.io-compatible server to simulate against, e.g. the local stand-in "
+             "(python -m harness.turn_standin); default: $TURN_BASE_URL or https://whatsapp.turn.io",
+    )
+    parser.addoption(
+        "--scenario-source",
+        action="store",
+        default=None,
+        metavar="SOURCE",
+        help="Where to read the cases from: a Google Doc URL/ID, or file://PATH for a local snapshot "
+             "(python -m doc_extraction.doc_extraction --save PATH); default: the DOC_ID Google Doc",
+    )
+    parser.addoption(
+        "--reuse-near-duplicates",
+        action="store_true",
+        default=False,
+        help="Let a lightly edited doc case reuse its previous version's cached scenario (edits patched in) "
+             "instead of being reformatted; cases whose answers changed are always reformatted",
+    )
+    parser.addoption(
+        "--sync-agent",
+        action="store_true",
+        default=False,
+        help="Use the blocking litellm/requests agent path instead of the async one",
+    )
+    parser.addoption(
+        "--prompt-cache",
+        action="store_true",
+        default=False,
+        help="Enable provider prompt caching for the agent system prompt (Anthropic cache_control, OpenAI cache key)",
+    )
+    parser.addoption(
+        "--stream-agent",
+        action="store_true",
+        default=False,
+        help="Stream agent replies and report per-turn time-to-first-token, generation time and tokens/sec",
+    )
+    parser.addoption(
+        "--no-agent-cache",
+        action="store_true",
+        default=False,
+        help="Disable the agent response cache (memory LRU + $ONEDAY_CACHE_DIR/agent_responses.sqlite) for fresh sampling; "
+             "--cassette also disables it",
+    )
+    parser.addoption(
+        "--retrieval-k",
+        action="store",
+        type=int,
+        default=0,
+        metavar="K",
+        help="Send the agent only the top-K guideline sections (BM25) plus danger signs, instead of the full guidelines",
+    )
+    parser.addoption(
+        "--concurrency",
+        action="store",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Run up to N scenarios at once on each worker's event loop (default: 1)",
+    )
+    parser.addoption(
+        "--cassette",
+        action="store",
+        default=None,
+        choices=CASSETTE_MODES,
+        help="Record/replay all LLM calls (agent, user simulator, judge, doc formatter). "
+             "replay is strictly offline and fails on a missing entry",
+    )
+    parser.addoption(
+        "--cassette-path",
+        action="store",
+        default=None,
+        metavar="PATH",
+        help="Cassette file (default: $ONEDAY_CACHE_DIR/cassettes.sqlite)",
+    )
+    parser.addoption(
+        "--rate-limit",
+        action="append",
+        default=[],
+        metavar="PROVIDER=RPM[:TPM]",
+        help="Host-wide rate limit shared by all workers, e.g. --rate-limit openai=500:200000 --rate-limit turn=120. "
+             "Providers are litellm prefixes (openai, anthropic, gemini, ...) or 'turn'",
+    )
+    parser.addoption(
+        "--max-retries",
+        action="store",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Retries for 429/5xx/connection errors, with jittered exponential backoff honouring Retry-After "
+             "(default: 4 when the session runs evaluation cases, otherwise none)",
+    )
     parser.addoption(
         "--max-cases",
         action="store",
@@ -145,6 +341,41 @@ def pytest_addoption(parser):
         metavar="N",
         help="Only run the first N test cases (by case order)",
     )
+    parser.addoption(
+        "--no-history",
+        action="store_true",
+        default=False,
+        help="Don't record this run in the run history database ($ONEDAY_CACHE_DIR/run_history.sqlite)",
+    )
+    parser.addoption(
+        "--max-cost",
+        action="store",
+        type=float,
+        default=None,
+        metavar="USD",
+        help="Stop starting new cases once the run's projected LLM cost exceeds USD; running cases finish, the rest are skipped",
+    )
+    parser.addoption(
+        "--max-wall-time",
+        action="store",
+        default=None,
+        metavar="DURATION",
+        help="Stop starting new cases once the run's projected wall time exceeds DURATION (e.g. 900, 15m, 1.5h)",
+    )
+    parser.addoption(
+        "--profile",
+        action="store_true",
+        default=False,
+        help="Profile harness hot paths per case (collapsed stacks in $ONEDAY_CACHE_DIR/profiles/) and summarise harness overhead vs network wait",
+    )
+    parser.addoption(
+        "--profile-sample-ms",
+        action="store",
+        type=float,
+        default=None,
+        metavar="MS",
+        help="With --profile, also sample each process's Python stack every MS milliseconds",
+    )
 
 
 def pytest_configure(config):
@@ -167,24 +398,121 @@ def pytest_configure(config):
     config.model_name = model_label
     config.use_turn = use_turn
     config.turn_uuid = turn_uuid_arg  # None when not provided; env var fallback stays in the test
+    if config.getoption("--turn-base-url"):
+        set_turn_base_url(config.getoption("--turn-base-url"))
     config.timestamp = timestamp
+    _configure_budget(config)
+
+    # Concurrent mode hands each worker one xdist group of cases, so it can schedule them all up front
+    if config.getoption("--concurrency") > 1 and not _is_xdist_worker(config):
+        dist = config.getoption("dist", default="no")
+        if dist == "load":
+            config.option.dist = "loadgroup"
+        elif dist not in ("no", "loadgroup"):
+            raise pytest.UsageError(f"--concurrency requires --dist load or loadgroup (got --dist {dist})")
 
     # Store metadata for final report
     _test_metadata["model"] = run_label
     _test_metadata["timestamp"] = timestamp
+    _test_metadata["started_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    # base_uid is minute-resolution and year-less; the run history needs an id no other run shares
+    _test_metadata["run_id"] = new_run_id(_test_metadata["started_at"])
+    _test_metadata["worker"] = _is_xdist_worker(config)
+    if not _is_xdist_worker(config):
+        _open_results_log(run_label, timestamp)
+
+    try:
+        rate_limits = parse_rate_limits(config.getoption("--rate-limit"))
+    except ValueError as e:
+        raise pytest.UsageError(str(e))
+    # Without --rate-limit / --max-retries, the limiter is installed once evaluation cases are collected
+    max_retries = config.getoption("--max-retries")
+    if rate_limits or max_retries is not None:
+        install_rate_limiter(rate_limits, **({} if max_retries is None else {"max_retries": max_retries}))
+    accounting = install_call_accounting()
+    _configure_profiling(config)
+
+    # Cassette goes in before doc extraction so scenario formatting is recorded/replayed too
+    cassette_mode = config.getoption("--cassette")
+    if cassette_mode:
+        install_cassette(config.getoption("--cassette-path") or default_cassette_path(), cassette_mode)
+        _test_metadata["cassette"] = cassette_mode
 
     # Load scenarios - only in main process, workers get them via workerinput
     if not _is_xdist_worker(config):
         # Main process: run doc extraction once
+        from doc_extraction import set_scenario_source
         from doc_extraction.doc_to_scenarios import doc_to_scenarios
-        scenarios = doc_to_scenarios()
+        from doc_extraction.near_duplicates import DEFAULT_THRESHOLD
+        set_scenario_source(config.getoption("--scenario-source"))
+        with llm_role("doc_formatter"):
+            scenarios = doc_to_scenarios(
+                near_duplicate_threshold=DEFAULT_THRESHOLD if config.getoption("--reuse-near-duplicates") else None
+            )
+        if "doc_formatter" in accounting.totals:
+            _test_metadata["doc_formatter"] = dict(accounting.totals["doc_formatter"])
+            _budget.add_cost(_test_metadata["doc_formatter"]["cost"])
         config._scenarios = scenarios
-        print(f"✓ Loaded {len(scenarios)} scenarios from Google Doc (main process)")
+        print(f"✓ Loaded {len(scenarios)} scenarios from {config.getoption('--scenario-source') or 'Google Doc'} (main process)")
     else:
         # Worker process: deserialize scenarios from workerinput
         config._scenarios = json.loads(config.workerinput['scenarios'])
 
 
+def _configure_budget(config) -> None:
+    """Sets up the run budget; workers only watch for the controller's stop file."""
+    global _budget
+    if _is_xdist_worker(config):
+        _budget = RunBudget(stop_file=config.workerinput.get("budget_stop_file") or None)
+        return
+    max_wall_time = config.getoption("--max-wall-time")
+    try:
+        max_wall_time_s = parse_duration(max_wall_time) if max_wall_time else None
+    except ValueError as e:
+        raise pytest.UsageError(str(e))
+    _budget = RunBudget(config.getoption("--max-cost"), max_wall_time_s)
+    if _budget.enabled:
+        _budget.stop_file = os.path.join(cache_dir(), f"budget-stop-{uuid.uuid4().hex}")
+
+
+def _configure_profiling(config) -> None:
+    """--profile: one directory per run for the case profiles, shared with the workers."""
+    global _sampler
+    if not config.getoption("--profile"):
+        return
+    if _is_xdist_worker(config):
+        directory = config.workerinput["profile_dir"]
+    else:
+        directory = os.path.join(cache_dir(), "profiles", config.base_testrun_uid)
+    install_profiling(directory)
+    _test_metadata["profile_dir"] = directory
+    sample_ms = config.getoption("--profile-sample-ms")
+    if sample_ms:
+        if sample_ms <= 0:
+            raise pytest.UsageError("--profile-sample-ms must be positive")
+        _sampler = StackSampler(sample_ms / 1000).start()
+
+
+def _stop_sampler(config) -> None:
+    global _sampler
+    if _sampler is None:
+        return
+    worker_id = config.workerinput["workerid"] if _is_xdist_worker(config) else "controller"
+    _sampler.stop(os.path.join(_test_metadata["profile_dir"], f"sampled-{worker_id}.folded"))
+    _sampler = None
+
+
+def pytest_unconfigure(config):
+    if not _is_xdist_worker(config):
+        _budget.remove_stop_file()
+    _stop_sampler(config)
+    _close_results_log()
+    uninstall_call_accounting()
+    uninstall_cassette()
+    uninstall_profiling()
+    uninstall_rate_limiter()
+
+
 def pytest_configure_node(node):
     """Pass the base testrun_uid, model, and scenarios to each xdist worker."""
     node.workerinput["base_testrun_uid"] = node.config.base_testrun_uid
@@ -192,14 +520,60 @@ def pytest_configure_node(node):
     node.workerinput["use_turn"] = str(node.config.use_turn)
     node.workerinput["turn_uuid"] = node.config.turn_uuid or ""
     node.workerinput["timestamp"] = node.config.timestamp
+    node.workerinput["budget_stop_file"] = _budget.stop_file or ""
+    node.workerinput["profile_dir"] = _test_metadata.get("profile_dir", "")
     # Serialize scenarios to JSON for worker
     node.workerinput["scenarios"] = json.dumps(node.config._scenarios)
 
 
-def pytest_collection_modifyitems(items):
-    """Store total test count after collection."""
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(config, items):
+    """Set up retries and per-worker groups for evaluation cases."""
+    # Evaluation cases retry transient provider errors by default; unit tests make no retries
+    if installed_rate_limiter() is None and any(item.get_closest_marker("agent_test") for item in items):
+        install_rate_limiter({})
+
+    # Runs before xdist's own hook so the group suffix lands on every worker's node ids
+    if config.getoption("--concurrency") > 1 and _is_xdist_worker(config):
+        worker_count = int(config.workerinput["workercount"])
+        for index, item in enumerate(items):
+            item.add_marker(pytest.mark.xdist_group(f"oneday-{index % worker_count}"))
+
+
+def _is_evaluation_case(item) -> bool:
+    return "test_scenario" in getattr(getattr(item, "callspec", None), "params", {})
+
+
+# Node id of an evaluation case: its parameters include the scenario's "case_<n>" id (see pytest_generate_tests)
+_CASE_NODE_ID = re.compile(r"\[(?:[^\]]*-)?case_\d+(?:-[^\]]*)?\]")
+
+
+def pytest_collection_finish(session):
+    """
+    Evaluation cases the run will execute, for the budget's projections: after -k/-m deselection,
+    and without the unit tests collected alongside them.
+    """
     global _total_count
-    _total_count = len(items)
+    _total_count = sum(1 for item in session.items if _is_evaluation_case(item))
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_node_collection_finished(node, ids):
+    """The controller doesn't collect under xdist; take the case count from a worker's (already deselected) collection."""
+    global _total_count
+    _total_count = sum(1 for node_id in ids if _CASE_NODE_ID.search(node_id))
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_call(item):
+    """Skip cases that haven't started once the run budget is spent (--concurrency: see ScenarioPool)."""
+    if item.config.getoption("--concurrency") > 1:
+        return
+    if not _is_evaluation_case(item):
+        return
+    reason = _budget.stop_reason()
+    if reason:
+        pytest.skip(reason)
 
 
 def pytest_report_teststatus(report, config):
@@ -238,66 +612,206 @@ def pytest_runtest_logreport(report):
         trace_ids_str = props.get("trace_ids", "")
         trace_ids = [t for t in trace_ids_str.split(",") if t] if trace_ids_str else []
 
-        turn_agent_prompt = props.get("turn_agent_prompt_tokens")
-        if turn_agent_prompt is not None:
-            # Turn runs: only count OneDay agent tokens (production metric).
-            # LangWatch is used solely for timing breakdown (Judge/UserSimulator overhead).
-            lw = compute_usage_from_traces(trace_ids)
-            usage = {
-                "prompt_tokens": int(turn_agent_prompt),
-                "completion_tokens": int(props.get("turn_agent_completion_tokens", 0)),
-                "cost": 0.0,
-                "agent_llm_ms": lw["agent_llm_ms"],
-                "judge_llm_ms": lw["judge_llm_ms"],
-                "user_sim_llm_ms": lw["user_sim_llm_ms"],
-            }
-        else:
-            usage = compute_usage_from_traces(trace_ids)
+        # Usage comes from the in-process litellm accounting; cases without accounted calls
+        # fall back to LangWatch traces, downloaded in the background and applied at session end
+        accounted = _accounted_usage(props)
+        fetcher = _get_trace_fetcher() if accounted is None else None
+        if fetcher is not None:
+            fetcher.submit(trace_ids, set_id=props.get("set_id"))
 
-        _test_results[variant].append({
+        row = {
+            "_variant": variant,
+            "_nodeid": report.nodeid,
             "case": case_num,
             "passed": report.passed,
             "failed": report.failed,
             "skipped": report.skipped,
             "total_time": props.get("total_time"),
             "agent_time": props.get("agent_time"),
-            "prompt_tokens": usage["prompt_tokens"],
-            "completion_tokens": usage["completion_tokens"],
-            "cost": usage["cost"],
-            "agent_llm_ms": usage["agent_llm_ms"],
-            "judge_llm_ms": usage["judge_llm_ms"],
-            "user_sim_llm_ms": usage["user_sim_llm_ms"],
+            "prompt_tokens": None,
+            "agent_prompt_tokens": props.get("agent_prompt_tokens"),
+            "cached_prompt_tokens": None,
+            "uncached_prompt_tokens": None,
+            "completion_tokens": None,
+            "cost": None,
+            "agent_llm_ms": None,
+            "judge_llm_ms": None,
+            "user_sim_llm_ms": None,
+            "unpriced_models": {},
             "trace_id": trace_ids[0] if trace_ids else None,
-        })
+            "trace_ids": trace_ids,
+            "set_id": props.get("set_id"),
+            "prompt_hash": props.get("prompt_hash"),
+            "cassette_hits": props.get("cassette_hits"),
+            "cassette_misses": props.get("cassette_misses"),
+            "agent_cache_hits": props.get("agent_cache_hits") or 0,
+            "agent_cache_misses": props.get("agent_cache_misses") or 0,
+            "agent_ttft_s": props.get("agent_ttft_s") or [],
+            "agent_generation_s": props.get("agent_generation_s") or [],
+            "agent_tokens_per_s": props.get("agent_tokens_per_s") or [],
+            "retries": props.get("retries") or 0,
+            "throttled_s": round(props.get("throttled_s") or 0, 2),
+            "profile": props.get("profile"),
+            "_usage_inputs": {
+                "turn_agent_prompt_tokens": props.get("turn_agent_prompt_tokens"),
+                "turn_agent_completion_tokens": props.get("turn_agent_completion_tokens"),
+                "agent_cached_prompt_tokens": props.get("agent_cached_prompt_tokens"),
+            },
+        }
+        # What the case really spent on LLM calls (every role); Turn rows report only the agent's cost
+        spend = accounted["cost"] if accounted is not None else None
+        if accounted is not None:
+            _apply_usage(row, accounted, row["_usage_inputs"])
+        _test_results[variant].append(row)
+        _log_case(row)
+        _charge_budget(report, spend)
+
+
+def _charge_budget(report, spend: float | None) -> None:
+    """Feeds a finished case's accounted LLM spend into the run budget (controller only); announces a stop once."""
+    if not _budget.enabled or _test_metadata.get("worker"):
+        return
+    stopped = _budget.reason
+    if report.skipped and stopped and stopped in str(report.longrepr):
+        return
+    reason = _budget.record(spend, _total_count)
+    if reason and not stopped:
+        print(f"\n⚠ {reason} — letting running cases finish, skipping the rest")
+
+
+# Per-case fields aggregated (per variant) for the summary and the results JSON
+_CASE_METRICS = (
+    "passed", "failed", "skipped", "total_time", "agent_time",
+    "prompt_tokens", "cached_prompt_tokens", "uncached_prompt_tokens", "completion_tokens", "cost",
+    "agent_llm_ms", "judge_llm_ms", "user_sim_llm_ms",
+    "agent_cache_hits", "agent_cache_misses", "retries", "throttled_s",
+)
+
+
+def _variant_stats(results_by_variant):
+    """{variant: {metric: stats or None}} from one columnar aggregation over every case."""
+    variants = [variant for variant, rows in results_by_variant.items() if rows]
+    rows = [row for variant in variants for row in results_by_variant[variant]]
+    keys = [(variant,) for variant in variants for _ in results_by_variant[variant]]
+    aggregated = MetricTable.from_rows(rows, _CASE_METRICS, keys=keys).aggregate()
+    return {key[0]: stats for key, stats in aggregated.items()}
+
+
+def _total(stats, digits=None):
+    """Sum of a metric's stats (0 when no case had it)."""
+    total = stats["sum"] if stats else 0
+    return round(total, digits) if digits is not None else total
+
+
+def _streaming_stats(results):
+    """Per-turn streaming percentiles across all cases, or None when not streaming."""
+    stats = {
+        metric: summarize(v for r in results for v in r.get(f"agent_{metric}") or [])
+        for metric in ("ttft_s", "generation_s", "tokens_per_s")
+    }
+    return stats if stats["ttft_s"] else None
+
+
+def _unpriced_models(results):
+    """Calls per model that had no known price, summed over cases (their cost is missing)."""
+    totals = defaultdict(int)
+    for r in results:
+        for name, calls in (r.get("unpriced_models") or {}).items():
+            totals[name] += calls
+    return dict(sorted(totals.items()))
+
 
+def _prompt_hashes():
+    """Distinct agent prompt versions seen across all finished cases."""
+    return sorted({r["prompt_hash"] for results in _test_results.values() for r in results if r.get("prompt_hash")})
 
-def _compute_timing_stats(values):
-    """Compute avg, min, max, and p90 for a list of numeric values."""
-    if not values:
+
+def _cassette_summary():
+    mode = _test_metadata.get("cassette")
+    if not mode:
         return None
-    values = sorted(values)
-    n = len(values)
-    avg = sum(values) / n
-    stdev = math.sqrt(sum((v - avg) ** 2 for v in values) / n)
-    p90_idx = int(n * 0.9)
-    # For small lists, p90 is the last element
-    p90 = values[min(p90_idx, n - 1)]
+    results = [r for variant_results in _test_results.values() for r in variant_results]
     return {
-        "avg": avg,
-        "stdev": stdev,
-        "min": values[0],
-        "max": values[-1],
-        "p90": p90,
+        "mode": mode,
+        "hits": sum(r.get("cassette_hits") or 0 for r in results),
+        "misses": sum(r.get("cassette_misses") or 0 for r in results),
     }
 
 
 def _format_timing_stats(stats):
     """Format timing stats dict into a readable string."""
-    return f"avg={stats['avg']:.1f}s  stdev={stats['stdev']:.1f}s  min={stats['min']:.1f}s  max={stats['max']:.1f}s  p90={stats['p90']:.1f}s"
+    return (f"avg={stats['avg']:.1f}s (95% CI {stats['ci95_low']:.1f}-{stats['ci95_high']:.1f}s)  stdev={stats['stdev']:.1f}s  "
+            f"min={stats['min']:.1f}s  p50={stats['p50']:.1f}s  p90={stats['p90']:.1f}s  max={stats['max']:.1f}s")
+
+
+def pytest_testnodedown(node, error):
+    """Merge a finished worker's latency histograms into the controller's."""
+    merge_histograms(_llm_latency, getattr(node, "workeroutput", {}).get("llm_latency", {}))
+
+
+def _ship_latency(session) -> None:
+    """Workers hand their histograms to the controller; the controller adds its own calls."""
+    accounting = installed_call_accounting()
+    if accounting is None:
+        return
+    config = getattr(session, "config", None)
+    if hasattr(config, "workeroutput"):
+        config.workeroutput["llm_latency"] = accounting.latency_snapshot()
+    else:
+        merge_histograms(_llm_latency, accounting.latency_snapshot())
+
+
+def _latency_summary():
+    """p50/p90/p99/max of individual LLM calls (ms) per role, overall and per model."""
+    by_role = defaultdict(dict)
+    for key, histogram in _llm_latency.items():
+        role, _, llm_model = key.partition("|")
+        by_role[role][llm_model] = histogram
+    summary = {}
+    for role in sorted(by_role, key=lambda r: (LLM_ROLES.index(r) if r in LLM_ROLES else len(LLM_ROLES), r)):
+        combined = LatencyHistogram()
+        for histogram in by_role[role].values():
+            combined.merge(histogram)
+        summary[role] = {
+            "all": combined.summary(),
+            "models": {llm_model: h.summary() for llm_model, h in sorted(by_role[role].items())},
+        }
+    return summary
+
+
+def _format_latency(stats):
+    return (f"n={stats['count']:<5} p50={stats['p50'] / 1000:.2f}s  p90={stats['p90'] / 1000:.2f}s  "
+            f"p99={stats['p99'] / 1000:.2f}s  max={stats['max'] / 1000:.2f}s")
+
+
+def _profile_summary(logged):
+    """Run-wide harness overhead vs network wait from the cases' --profile breakdowns."""
+    profile = merge_breakdowns([r["profile"] for results in logged.values() for r in results if r.get("profile")])
+    if profile:
+        profile["directory"] = _test_metadata.get("profile_dir")
+        profile["litellm_import_ms"] = round(LITELLM_IMPORT_S * 1000, 1)
+    return profile
+
+
+def _print_profile(profile):
+    wall_s = profile["wall_ms"] / 1000
+    print(f"\n  Profile ({profile['cases']} cases, {wall_s:.1f}s case wall time):")
+    for label, key in (("Network wait", "network_ms"), ("Harness overhead", "overhead_ms")):
+        seconds = profile[key] / 1000
+        share = seconds / wall_s * 100 if wall_s else 0
+        print(f"    {label + ':':<18}{seconds:>8.1f}s  {share:>5.1f}%")
+    print(f"    Self time by span:")
+    for name, ms in profile["self_ms"].items():
+        print(f"      {name:<16}{ms / 1000:>8.2f}s  (avg {ms / profile['cases']:.0f}ms per case)")
+    print(f"    litellm import:   {profile['litellm_import_ms'] / 1000:.2f}s (once per process)")
+    print(f"    Collapsed stacks: {profile['directory']}")
 
 
 def pytest_sessionfinish(session, exitstatus):
     """Print formatted results summary at the end of the test run."""
+    _ship_latency(session)
+    _collect_trace_usage()
+    results_log_path = _close_results_log()
     if not _test_results:
         return
 
@@ -309,19 +823,39 @@ def pytest_sessionfinish(session, exitstatus):
     print(f"\n\n{separator}")
     print(f"  TEST RESULTS SUMMARY")
     print(f"  Model: {model}  |  Time: {timestamp}")
+    prompt_hashes = _prompt_hashes()
+    if prompt_hashes:
+        print(f"  Prompt: {', '.join(prompt_hashes)}")
+    cassette = _cassette_summary()
+    if cassette:
+        print(f"  Cassette: {cassette['mode']}  hits={cassette['hits']}  misses={cassette['misses']}")
+    doc_formatter = _test_metadata.get("doc_formatter")
+    if doc_formatter:
+        print(f"  Doc formatter: {doc_formatter['llm_calls']} calls  "
+              f"{doc_formatter['prompt_tokens'] + doc_formatter['completion_tokens']:,} tokens  ${doc_formatter['cost']:.4f}")
+    budget = _budget.summary()
+    if budget and budget["stopped"]:
+        print(f"  ⚠ {budget['stopped']} — stopped after {budget['stopped_after']} cases")
     print(separator)
 
+    # One results table for the summary, the JSON and the run history: a compaction of the results log
+    if results_log_path:
+        logged = compact_results_log(read_results_log(results_log_path))["variants"]
+    else:
+        logged = {variant: [_public_row(row) for row in rows] for variant, rows in _test_results.items()}
+    for rows in logged.values():
+        rows.sort(key=lambda x: x["case"])
+    stats_by_variant = _variant_stats(logged)
+
     for variant in ["standard"]:
-        results = _test_results.get(variant, [])
+        results = logged.get(variant, [])
         if not results:
             continue
+        stats = stats_by_variant[variant]
 
-        # Sort by case number
-        results.sort(key=lambda x: x["case"])
-
-        passed = sum(1 for r in results if r["passed"])
-        failed = sum(1 for r in results if r["failed"])
-        skipped = sum(1 for r in results if r["skipped"])
+        passed = int(_total(stats["passed"]))
+        failed = int(_total(stats["failed"]))
+        skipped = int(_total(stats["skipped"]))
         total = len(results)
 
         print(f"\n  {variant.upper()} TESTS ({passed}/{total} passed)")
@@ -346,6 +880,8 @@ def pytest_sessionfinish(session, exitstatus):
                 timing_str += f"  tokens={tokens}"
             if r.get("cost") is not None:
                 timing_str += f"  cost=${r['cost']:.4f}"
+            if r.get("retries") or r.get("throttled_s"):
+                timing_str += f"  retries={r['retries']}  throttled={r['throttled_s']:.1f}s"
 
             print(f"    Case {case_num:3d}: {status}{timing_str}")
 
@@ -353,78 +889,124 @@ def pytest_sessionfinish(session, exitstatus):
         print(f"  Passed: {passed}  |  Failed: {failed}  |  Skipped: {skipped}")
 
         # Timing statistics
-        total_times = [r["total_time"] for r in results if r.get("total_time") is not None]
-        agent_times = [r["agent_time"] for r in results if r.get("agent_time") is not None]
-
-        prompt_tokens = [r["prompt_tokens"] for r in results if r.get("prompt_tokens") is not None]
-        completion_tokens = [r["completion_tokens"] for r in results if r.get("completion_tokens") is not None]
-
-        if total_times:
-            total_stats = _compute_timing_stats(total_times)
-            print(f"\n  Total time:  {_format_timing_stats(total_stats)}")
-        if agent_times:
-            agent_stats = _compute_timing_stats(agent_times)
-            print(f"  Agent time:  {_format_timing_stats(agent_stats)}")
-        costs = [r["cost"] for r in results if r.get("cost") is not None]
-
-        if prompt_tokens:
-            total_prompt = sum(prompt_tokens)
-            total_completion = sum(completion_tokens)
+        if stats["total_time"]:
+            print(f"\n  Total time:  {_format_timing_stats(stats['total_time'])}")
+        if stats["agent_time"]:
+            print(f"  Agent time:  {_format_timing_stats(stats['agent_time'])}")
+
+        if stats["prompt_tokens"]:
+            total_prompt = int(_total(stats["prompt_tokens"]))
+            total_completion = int(_total(stats["completion_tokens"]))
+            total_cached = int(_total(stats["cached_prompt_tokens"]))
             print(f"\n  Agent tokens:  prompt={total_prompt}  completion={total_completion}  total={total_prompt + total_completion}")
-        if costs:
-            print(f"  Agent cost:   ${sum(costs):.4f}")
-
-        agent_llm_ms = [r["agent_llm_ms"] for r in results if r.get("agent_llm_ms")]
-        judge_llm_ms = [r["judge_llm_ms"] for r in results if r.get("judge_llm_ms")]
-        user_sim_llm_ms = [r["user_sim_llm_ms"] for r in results if r.get("user_sim_llm_ms")]
-        if agent_llm_ms or judge_llm_ms or user_sim_llm_ms:
-            def fmt_s(ms_list): return f"{sum(ms_list)/1000:.1f}s (avg {sum(ms_list)/len(ms_list)/1000:.1f}s)"
+            if total_cached:
+                hit_rate = total_cached / total_prompt * 100 if total_prompt else 0
+                print(f"  Prompt cache:  cached={total_cached}  uncached={max(total_prompt - total_cached, 0)}  hit rate={hit_rate:.1f}%")
+        if stats["cost"]:
+            print(f"  Agent cost:   ${_total(stats['cost']):.4f}")
+        unpriced = _unpriced_models(results)
+        if unpriced:
+            listed = ", ".join(f"{name} ({calls} calls)" for name, calls in unpriced.items())
+            print(f"  ⚠ Unpriced:   {listed} — not included in cost")
+        streaming = _streaming_stats(results)
+        if streaming:
+            print(f"\n  Streaming ({streaming['ttft_s']['count']} agent turns):")
+            for label, metric, unit in (("TTFT", "ttft_s", "s"), ("Generation", "generation_s", "s"), ("Tokens/sec", "tokens_per_s", "")):
+                pct = streaming[metric]
+                if pct:
+                    print(f"    {label + ':':<13}p50={pct['p50']:.2f}{unit}  p90={pct['p90']:.2f}{unit}  p99={pct['p99']:.2f}{unit}")
+        cache_hits = int(_total(stats["agent_cache_hits"]))
+        cache_misses = int(_total(stats["agent_cache_misses"]))
+        if cache_hits or cache_misses:
+            print(f"  Agent cache:  hits={cache_hits}  misses={cache_misses}  hit rate={cache_hits / (cache_hits + cache_misses) * 100:.1f}%")
+        total_retries = int(_total(stats["retries"]))
+        total_throttled = _total(stats["throttled_s"])
+        if total_retries or total_throttled:
+            print(f"  Throttling:   retries={total_retries}  throttled={total_throttled:.1f}s (avg {total_throttled / len(results):.1f}s per case)")
+
+        llm_roles = [("Agent", stats["agent_llm_ms"]), ("Judge", stats["judge_llm_ms"]), ("User sim", stats["user_sim_llm_ms"])]
+        if any(role_stats and role_stats["sum"] for _, role_stats in llm_roles):
             print(f"\n  LLM time breakdown (total across all cases, avg per case):")
-            if agent_llm_ms:
-                print(f"    Agent:    {fmt_s(agent_llm_ms)}")
-            if judge_llm_ms:
-                print(f"    Judge:    {fmt_s(judge_llm_ms)}")
-            if user_sim_llm_ms:
-                print(f"    User sim: {fmt_s(user_sim_llm_ms)}")
+            for label, role_stats in llm_roles:
+                if role_stats and role_stats["sum"]:
+                    print(f"    {label + ':':<10}{role_stats['sum'] / 1000:.1f}s (avg {role_stats['avg'] / 1000:.1f}s)")
+
+    profile = _profile_summary(logged)
+    if profile:
+        _print_profile(profile)
+
+    latency = _latency_summary()
+    if latency:
+        print(f"\n  LLM call latency (per call, all variants):")
+        for role, stats in latency.items():
+            models = stats["models"]
+            label = next(iter(models)) if len(models) == 1 else "all models"
+            print(f"    {role:<14}{label:<28}{_format_latency(stats['all'])}")
+            if len(models) > 1:
+                for llm_model, model_stats in models.items():
+                    print(f"    {'':<14}{llm_model:<28}{_format_latency(model_stats)}")
 
     print(f"\n{separator}\n")
 
-    # Write JSON results file for orchestration tooling
+    # JSON results for orchestration tooling and the run history
     json_output_dir = os.environ.get("ONEDAY_RESULTS_DIR")
+    json_data = {
+        "run_id": _test_metadata.get("run_id"),
+        "label": getattr(session.config, "base_testrun_uid", None),
+        "model": model,
+        "timestamp": timestamp,
+        "started_at": _test_metadata.get("started_at"),
+        "prompt_hashes": prompt_hashes,
+        "cassette": cassette,
+        "doc_formatter": doc_formatter,
+        "llm_latency_ms": latency,
+        "budget": budget,
+        "profile": profile,
+        "variants": {},
+    }
+    for variant in ["standard", "diagnosis_only"]:
+        results = logged.get(variant, [])
+        if not results:
+            continue
+        stats = stats_by_variant[variant]
+        json_data["variants"][variant] = {
+            "cases": results,
+            "total_time_stats": stats["total_time"],
+            "agent_time_stats": stats["agent_time"],
+            "metric_stats": stats,
+            "total_prompt_tokens": int(_total(stats["prompt_tokens"])),
+            "total_cached_prompt_tokens": int(_total(stats["cached_prompt_tokens"])),
+            "total_uncached_prompt_tokens": int(_total(stats["uncached_prompt_tokens"])),
+            "total_completion_tokens": int(_total(stats["completion_tokens"])),
+            "total_cost": _total(stats["cost"]),
+            "total_agent_llm_ms": int(_total(stats["agent_llm_ms"])),
+            "total_judge_llm_ms": int(_total(stats["judge_llm_ms"])),
+            "total_user_sim_llm_ms": int(_total(stats["user_sim_llm_ms"])),
+            "streaming_stats": _streaming_stats(results),
+            "total_agent_cache_hits": int(_total(stats["agent_cache_hits"])),
+            "total_agent_cache_misses": int(_total(stats["agent_cache_misses"])),
+            "total_retries": int(_total(stats["retries"])),
+            "total_throttled_s": _total(stats["throttled_s"], 2),
+            "unpriced_models": _unpriced_models(results),
+        }
     if json_output_dir:
         os.makedirs(json_output_dir, exist_ok=True)
-        json_data = {
-            "model": model,
-            "timestamp": timestamp,
-            "variants": {},
-        }
-        for variant in ["standard", "diagnosis_only"]:
-            results = _test_results.get(variant, [])
-            if not results:
-                continue
-            results.sort(key=lambda x: x["case"])
-            total_times = [r["total_time"] for r in results if r.get("total_time") is not None]
-            agent_times = [r["agent_time"] for r in results if r.get("agent_time") is not None]
-            prompt_tok = [r["prompt_tokens"] for r in results if r.get("prompt_tokens") is not None]
-            completion_tok = [r["completion_tokens"] for r in results if r.get("completion_tokens") is not None]
-            costs = [r["cost"] for r in results if r.get("cost") is not None]
-            agent_llm_ms = [r["agent_llm_ms"] for r in results if r.get("agent_llm_ms")]
-            judge_llm_ms = [r["judge_llm_ms"] for r in results if r.get("judge_llm_ms")]
-            user_sim_llm_ms = [r["user_sim_llm_ms"] for r in results if r.get("user_sim_llm_ms")]
-            json_data["variants"][variant] = {
-                "cases": results,
-                "total_time_stats": _compute_timing_stats(total_times),
-                "agent_time_stats": _compute_timing_stats(agent_times),
-                "total_prompt_tokens": sum(prompt_tok) if prompt_tok else 0,
-                "total_completion_tokens": sum(completion_tok) if completion_tok else 0,
-                "total_cost": sum(costs) if costs else 0,
-                "total_agent_llm_ms": sum(agent_llm_ms) if agent_llm_ms else 0,
-                "total_judge_llm_ms": sum(judge_llm_ms) if judge_llm_ms else 0,
-                "total_user_sim_llm_ms": sum(user_sim_llm_ms) if user_sim_llm_ms else 0,
-            }
         json_path = os.path.join(json_output_dir, f"{model}.json")
         with open(json_path, "w") as f:
             json.dump(json_data, f, indent=2)
+    _record_history(session.config, json_data)
+
+
+def _record_history(config, json_data: dict) -> None:
+    """Adds the finished run to the run history database (controller only; not for replayed runs)."""
+    if _test_metadata.get("worker") or _test_metadata.get("cassette") == "replay" or config.getoption("--no-history"):
+        return
+    history = run_history()
+    try:
+        history.record_run(json_data)
+    finally:
+        history.close()
+    print(f"Run recorded in {history.path} (query with: python query_runs.py)")
 
 
 # Model name mapping: friendly name -> litellm model ID
@@ -439,22 +1021,78 @@ MODEL_MAPPING = {
 }
 
 
+def _model_name(config):
+    if hasattr(config, "workerinput"):
+        return config.workerinput["model_name"]
+    return config.model_name
+
+
+def _use_turn(config):
+    if hasattr(config, "workerinput"):
+        return config.workerinput["use_turn"] == "True"
+    return config.use_turn
+
+
+def _turn_uuid(config):
+    if hasattr(config, "workerinput"):
+        val = config.workerinput.get("turn_uuid", "")
+        return val or None
+    return config.turn_uuid
+
+
+def _test_variant(test_name):
+    if "diagnosis_only" in test_name:
+        return "diagnosis_only"
+    elif "standard" in test_name:
+        return "standard"
+    return "unknown"
+
+
+def _testrun_uid(config, test_name):
+    # Get base UID from config or worker input
+    if hasattr(config, "workerinput"):
+        base_uid = config.workerinput["base_testrun_uid"]
+    else:
+        base_uid = config.base_testrun_uid
+    return f"{base_uid}-{_test_variant(test_name)}"
+
+
+def _agent_options(config):
+    return {
+        "sync": config.getoption("--sync-agent"),
+        "prompt_cache": config.getoption("--prompt-cache"),
+        "retrieval_k": config.getoption("--retrieval-k"),
+        # A response cache hit never reaches litellm, so a cassette would miss (record) or lack (replay) the call
+        "response_cache": not config.getoption("--no-agent-cache") and not config.getoption("--cassette"),
+        "stream": config.getoption("--stream-agent"),
+    }
+
+
+def _case_kwargs(item):
+    """Arguments for run_oneday_case, derived from an item without setting up its fixtures."""
+    config = item.config
+    return {
+        "test_scenario": item.callspec.params["test_scenario"],
+        "testrun_uid": _testrun_uid(config, item.name),
+        "model_id": MODEL_MAPPING[_model_name(config)],
+        "diagnosis_only": _test_variant(item.name) == "diagnosis_only",
+        "use_turn": _use_turn(config),
+        "turn_uuid": _turn_uuid(config),
+        "agent_options": _agent_options(config),
+        "offload_simulators": True,
+    }
+
+
 @pytest.fixture(scope="session")
 def model_id(request):
     """Get the litellm model ID for the selected model."""
-    if hasattr(request.config, "workerinput"):
-        model_name = request.config.workerinput["model_name"]
-    else:
-        model_name = request.config.model_name
-    return MODEL_MAPPING[model_name]
+    return MODEL_MAPPING[_model_name(request.config)]
 
 
 @pytest.fixture(scope="session")
 def use_turn(request):
     """Whether to use the Turn.io simulation API instead of calling the model directly."""
-    if hasattr(request.config, "workerinput"):
-        return request.config.workerinput["use_turn"] == "True"
-    return request.config.use_turn
+    return _use_turn(request.config)
 
 
 @pytest.fixture(scope="session")
@@ -464,10 +1102,32 @@ def turn_journey_uuid(request):
     When None, the test falls back to TURN_JOURNEY_UUID env var (existing behaviour).
     When set, the env var is ignored — the CLI arg takes exclusive precedence.
     """
-    if hasattr(request.config, "workerinput"):
-        val = request.config.workerinput.get("turn_uuid", "")
-        return val or None
-    return request.config.turn_uuid
+    return _turn_uuid(request.config)
+
+
+@pytest.fixture(scope="session")
+def agent_options(request):
+    """Agent call options from CLI flags (see AgentOptions in the test module)."""
+    return _agent_options(request.config)
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def scenario_pool(request):
+    """Per-worker pool that runs scenarios concurrently (--concurrency N), or None when N is 1."""
+    concurrency = request.config.getoption("--concurrency")
+    if concurrency <= 1:
+        yield None
+        return
+    pool = ScenarioPool(concurrency, _case_kwargs, stop_reason=_budget.stop_reason)
+    yield pool
+    await pool.aclose()
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session", autouse=True)
+async def turn_http_client():
+    """Close the pooled Turn.io client on the worker's session event loop at teardown."""
+    yield
+    await close_turn_async_client()
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -491,22 +1151,7 @@ def testrun_uid(request):
     Standard and diagnosis_only tests get different UIDs so they appear
     as separate runs in LangWatch, but all tests of the same variant share the same UID.
     """
-    # Get base UID from config or worker input
-    if hasattr(request.config, "workerinput"):
-        base_uid = request.config.workerinput["base_testrun_uid"]
-    else:
-        base_uid = request.config.base_testrun_uid
-
-    # Determine test variant from test function name
-    test_name = request.node.name
-    if "diagnosis_only" in test_name:
-        variant = "diagnosis_only"
-    elif "standard" in test_name:
-        variant = "standard"
-    else:
-        variant = "unknown"
-
-    return f"{base_uid}-{variant}"
+    return _testrun_uid(request.config, request.node.name)
 
 
 def pytest_generate_tests(metafunc):
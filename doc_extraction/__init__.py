@@ -7,11 +7,15 @@ from doc_extraction.doc_extraction import (
     extract_case_separated_docs,
     get_document_body_text,
     extract_doc_id,
+    load_document,
+    set_scenario_source,
 )
 
 __all__ = [
     "extract_case_separated_docs",
     "get_document_body_text",
     "extract_doc_id",
+    "load_document",
+    "set_scenario_source",
 ]
 
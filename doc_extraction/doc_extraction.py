@@ -1,17 +1,32 @@
 """
 This script extracts the docs file into a string.
 The docs file is a public Google Doc, fetched via the export URL (no OAuth required).
+
+The last download is kept in $ONEDAY_CACHE_DIR/doc_snapshot.json with its HTTP
+validators (ETag / Last-Modified), a hash of the cleaned text and the split cases.
+Later fetches are conditional: a 304, or a body that cleans to the same hash, reuses
+the stored cases without parsing or splitting again. A `file://` source (see
+`set_scenario_source`) reads a local snapshot of the doc instead, with no network.
 """
 
 from dotenv import load_dotenv
+import hashlib
+import json
 import os
 import re
 from typing import TypedDict
+from urllib.parse import unquote, urlparse
 import requests
 
+from harness.storage import cache_path
+
 load_dotenv()
 
 DOC_ID = os.getenv('DOC_ID')
+DOC_SNAPSHOT_FILE = "doc_snapshot.json"
+
+# --scenario-source; None means the DOC_ID Google Doc
+_scenario_source: str | None = None
 
 
 class Scenario(TypedDict):
@@ -22,60 +37,179 @@ class Scenario(TypedDict):
     expected_diagnosis: str | None
 
 
+class DocumentSnapshot(TypedDict):
+    """The cleaned doc text and its cases, with what's needed to revalidate it"""
+    source: str
+    etag: str | None
+    last_modified: str | None
+    # Of the raw export / file text: an identical read skips cleaning too
+    raw_hash: str
+    content_hash: str
+    text: str
+    cases: list[tuple[int, str]]
+
+
 def extract_doc_id(url_or_id: str) -> str:
     """Extract doc ID from various Google Docs URL formats or return as-is if already an ID."""
     match = re.search(r'/d/([a-zA-Z0-9_-]+)', url_or_id)
     return match.group(1) if match else url_or_id
 
 
-def get_document_body_text(doc_id: str) -> str:
-    """
-    Fetch Google Doc as plain text via public export URL.
-    The doc must be shared as "Anyone with the link can view".
-    """
-    doc_id = extract_doc_id(doc_id)
-    url = f"https://docs.google.com/document/d/{doc_id}/export?format=txt"
+def set_scenario_source(source: str | None) -> None:
+    """Reads cases from `source` (a Google Doc URL/ID, or file://PATH) instead of DOC_ID."""
+    global _scenario_source
+    _scenario_source = source or None
 
-    response = requests.get(url)
-    response.raise_for_status()
 
-    full_text = response.text
+def scenario_source() -> str:
+    """--scenario-source if set, else the DOC_ID Google Doc."""
+    source = _scenario_source or DOC_ID
+    if not source:
+        raise ValueError("DOC_ID environment variable is not set")
+    return source
+
 
-    # Clean up formatting
-    full_text = full_text.replace('\x0b', '')
-    full_text = re.sub(r' +', ' ', full_text)
+def clean_document_text(text: str) -> str:
+    """Collapses the export's formatting: no vertical tabs, single spaces, no blank lines, lowercase."""
+    text = text.replace('\x0b', '')
+    text = re.sub(r' +', ' ', text)
 
-    lines = full_text.split('\n')
+    lines = text.split('\n')
     cleaned_lines = [line.strip() for line in lines if line.strip()]
 
     return '\n'.join(cleaned_lines).lower()
 
 
-def extract_case_separated_docs() -> list[tuple[int, str]]:
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def split_cases(doc_text: str) -> list[tuple[int, str]]:
     """
-    Extracts the docs file and returns a list of tuples (case_number, case_text).
+    Splits the cleaned doc text into (case_number, case_text) tuples.
     Splits on 'case' followed by a number to avoid splitting on the word 'case' in descriptions.
     """
-    if not DOC_ID:
-        raise ValueError("DOC_ID environment variable is not set")
-    doc_text = get_document_body_text(DOC_ID)
-    
     # Split by "case" followed by optional whitespace and a number (case-insensitive)
     # The pattern captures the number so we can use it
     parts = re.split(r'(?i)\bcase\s*(\d+)', doc_text)
-    
+
     # parts[0] is text before first case (usually empty or header)
     # parts[1] is the first case number, parts[2] is the first case text
     # parts[3] is second case number, parts[4] is second case text, etc.
-    
+
     case_separated = []
     for i in range(1, len(parts), 2):
         if i + 1 < len(parts):
             case_num = int(parts[i])
             case_text = parts[i + 1].strip()
             case_separated.append((case_num, case_text))
-        
+
     return case_separated
 
+
+def _read_snapshot(source: str) -> DocumentSnapshot | None:
+    try:
+        with open(cache_path(DOC_SNAPSHOT_FILE), encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if snapshot.get("source") != source:
+        return None
+    snapshot["cases"] = [tuple(case) for case in snapshot.get("cases", [])]
+    return snapshot
+
+
+def _write_snapshot(snapshot: DocumentSnapshot) -> None:
+    path = cache_path(DOC_SNAPSHOT_FILE)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(temp_path, path)
+
+
+def _snapshot(source: str, raw_text: str, previous: DocumentSnapshot | None, etag: str | None = None, last_modified: str | None = None) -> DocumentSnapshot:
+    """Snapshot of freshly read doc text; it's only cleaned when the raw text changed, and split when the cleaned text did."""
+    raw_digest = content_hash(raw_text)
+    if previous is not None and previous.get("raw_hash") == raw_digest:
+        text, digest, cases = previous["text"], previous["content_hash"], previous["cases"]
+    else:
+        text = clean_document_text(raw_text)
+        digest = content_hash(text)
+        cases = previous["cases"] if previous is not None and previous["content_hash"] == digest else split_cases(text)
+    return {"source": source, "etag": etag, "last_modified": last_modified, "raw_hash": raw_digest,
+            "content_hash": digest, "text": text, "cases": cases}
+
+
+def _local_path(source: str) -> str:
+    parsed = urlparse(source)
+    return unquote(parsed.netloc + parsed.path)
+
+
+def load_document(source: str | None = None) -> DocumentSnapshot:
+    """
+    The current doc (default: `scenario_source()`), revalidated against the stored snapshot.
+    Google Docs are fetched with If-None-Match / If-Modified-Since; a `file://` source is read from disk.
+    """
+    source = source or scenario_source()
+    if source.startswith("file://"):
+        previous = _read_snapshot(source)
+        with open(_local_path(source), encoding="utf-8") as f:
+            snapshot = _snapshot(source, f.read(), previous)
+        if previous is None or previous.get("raw_hash") != snapshot["raw_hash"]:
+            _write_snapshot(snapshot)
+        return snapshot
+
+    doc_id = extract_doc_id(source)
+    previous = _read_snapshot(doc_id)
+    headers = {}
+    if previous is not None:
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+    url = f"https://docs.google.com/document/d/{doc_id}/export?format=txt"
+    response = requests.get(url, headers=headers)
+    if response.status_code == 304 and previous is not None:
+        print("Google Doc not modified since the last fetch; reusing its cases")
+        return previous
+    response.raise_for_status()
+
+    snapshot = _snapshot(doc_id, response.text, previous,
+                         etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"))
+    if previous is not None and previous["content_hash"] == snapshot["content_hash"]:
+        print("Google Doc content unchanged since the last fetch; reusing its cases")
+    _write_snapshot(snapshot)
+    return snapshot
+
+
+def get_document_body_text(doc_id: str) -> str:
+    """
+    Fetch Google Doc as plain text via public export URL.
+    The doc must be shared as "Anyone with the link can view".
+    """
+    return load_document(doc_id)["text"]
+
+
+def extract_case_separated_docs() -> list[tuple[int, str]]:
+    """
+    Extracts the docs file and returns a list of tuples (case_number, case_text).
+    Splits on 'case' followed by a number to avoid splitting on the word 'case' in descriptions.
+    """
+    return list(load_document()["cases"])
+
+
 if __name__ == "__main__":
-    print(extract_case_separated_docs())
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print the doc's cases, or save it as a local snapshot for --scenario-source")
+    parser.add_argument("--source", default=None, help="Google Doc URL/ID or file://PATH (default: $DOC_ID)")
+    parser.add_argument("--save", default=None, metavar="PATH", help="Write the cleaned doc text to PATH")
+    args = parser.parse_args()
+    set_scenario_source(args.source)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            f.write(load_document()["text"])
+        print(f"Saved to {args.save}; run with --scenario-source file://{os.path.abspath(args.save)}")
+    else:
+        print(extract_case_separated_docs())
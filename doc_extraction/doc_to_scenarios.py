@@ -1,10 +1,27 @@
 from typing import TypedDict
 import litellm
+import hashlib
 import json
 import os
 import asyncio
 import re
+import time
 from doc_extraction import extract_case_separated_docs
+from doc_extraction.near_duplicates import NearDuplicateIndex, edits_answers, refresh_scenario
+from doc_extraction.scenario_store import FormatterVersion, scenario_store
+from harness.case_stats import start_case_stats
+from harness.concurrency import AdaptiveLimit
+from harness.metrics import summarize
+from harness.prompts import prompt_hash
+from harness.storage import cache_path
+
+# Scenarios of the last fully formatted doc, reused as-is while its cases and the prompt are unchanged
+SCENARIO_SNAPSHOT_FILE = "scenario_snapshot.json"
+# Upper bound for formatting requests in flight; the adaptive window starts at batch_size
+MAX_FORMAT_CONCURRENCY = 50
+FORMATTER_MODEL = "gpt-5-nano"
+# Bump when the Scenario fields (or how they're derived from the model's JSON) change
+SCENARIO_SCHEMA_VERSION = 1
 
 
 class Scenario(TypedDict):
@@ -126,7 +143,7 @@ async def format_case_async(case_num: int, case_text: str) -> tuple[str, int, st
     """
     _system_prompt = system_prompt()
     response = await litellm.acompletion(
-        model="gpt-5-nano",
+        model=FORMATTER_MODEL,
         messages=[
             {"role": "system", "content": _system_prompt},
             {"role": "user", "content": case_text}
@@ -158,82 +175,188 @@ def check_json(response: str, case_index: int = 0) -> dict | None:
         print(f"Response was: {response[:200]}...")
         return None
 
+async def _format_case_timed(limit: AdaptiveLimit, case_num: int, case_text: str) -> tuple[tuple[str, int, str], float]:
+    """Formats one case in a slot of `limit` and reports its latency and whether it was throttled."""
+    async with limit.slot() as epoch:
+        # Per-request counters: the rate limiter counts its retries (429/5xx backoff) here
+        stats = start_case_stats()
+        started = time.perf_counter()
+        try:
+            result = await format_case_async(case_num, case_text)
+        except litellm.RateLimitError:
+            limit.record(time.perf_counter() - started, throttled=True, epoch=epoch)
+            raise
+        latency_s = time.perf_counter() - started
+        limit.record(latency_s, throttled=bool(stats.get("retries")), epoch=epoch)
+        return result, latency_s
+
+
 async def process_batch_async(cases: list[tuple[int, str]], batch_size: int = 10) -> list[tuple[str | None, int, str, dict | None]]:
     """
-    Process cases in batches to avoid overwhelming the API.
-    Returns list of (formatted_case, case_num, original_case_text, parsed_scenario).
+    Formats cases over a sliding window of requests: a new case starts as soon as any
+    request finishes, with `batch_size` in flight at first. The window grows while
+    latency stays flat and halves when the provider throttles (see AdaptiveLimit).
+    Returns list of (formatted_case, case_num, original_case_text, parsed_scenario), in input order;
+    cases that errored have no formatted_case and are retried by the caller.
     """
-    results = []
-    
-    for i in range(0, len(cases), batch_size):
-        batch = cases[i:i+batch_size]
-        
-        tasks = [format_case_async(case_num, case_text) for case_num, case_text in batch]
-        
-        batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        for result in batch_results:
-            if isinstance(result, BaseException):
-                print(f"Error processing case: {result}")
-                results.append((None, -1, "", None))
-            else:
-                formatted_case, case_num, original_case_text = result
-                print(f"Processed case number: {case_num} (/{len(cases)} total)")
-                checked = check_json(formatted_case, case_num)
-                if checked and not checked.get("expected_diagnosis"):
-                    print(f"Warning: Case {case_num} has null/missing expected_diagnosis, will retry. Response: {formatted_case[:200]}...")
-                    checked = None  # Force retry
-                results.append((formatted_case, case_num, original_case_text, checked))
-    
-    return results
+    limit = AdaptiveLimit(batch_size, maximum=max(batch_size, MAX_FORMAT_CONCURRENCY))
+    latencies: list[float] = []
+
+    async def process(case_num: int, case_text: str) -> tuple[str | None, int, str, dict | None]:
+        try:
+            (formatted_case, case_num, original_case_text), latency_s = await _format_case_timed(limit, case_num, case_text)
+        except Exception as e:
+            print(f"Error processing case {case_num}: {e}")
+            return None, case_num, case_text, None
+        latencies.append(latency_s)
+        print(f"Processed case number: {case_num} ({len(latencies)}/{len(cases)} total) in {latency_s:.1f}s [window {limit.limit}]")
+        checked = check_json(formatted_case, case_num)
+        if checked and not checked.get("expected_diagnosis"):
+            print(f"Warning: Case {case_num} has null/missing expected_diagnosis, will retry. Response: {formatted_case[:200]}...")
+            checked = None  # Force retry
+        return formatted_case, case_num, original_case_text, checked
+
+    results = await asyncio.gather(*(process(case_num, case_text) for case_num, case_text in cases))
+
+    stats = summarize(latencies)
+    if stats:
+        print(f"Formatting latency per case: p50={stats['p50']:.1f}s  p90={stats['p90']:.1f}s  max={stats['max']:.1f}s  "
+              f"(window peaked at {limit.peak}, throttled {limit.throttled} times)")
+    return list(results)
+
+def formatter_version() -> FormatterVersion:
+    """The prompt, model and schema version that cached scenarios are keyed by besides their case text."""
+    return FormatterVersion(prompt_hash(system_prompt()), FORMATTER_MODEL, SCENARIO_SCHEMA_VERSION)
+
+
+def scenario_set_key(case_separated: list[tuple[int, str]]) -> str:
+    """Hash of the doc's cases and the formatter version: what the formatted scenarios depend on."""
+    return hashlib.sha256(json.dumps([case_separated, *formatter_version()]).encode("utf-8")).hexdigest()
+
+
+def _read_scenario_snapshot(key: str) -> list[Scenario] | None:
+    try:
+        with open(cache_path(SCENARIO_SNAPSHOT_FILE), encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return snapshot["scenarios"] if snapshot.get("key") == key else None
+
+
+def _write_scenario_snapshot(key: str, scenarios: list[Scenario]) -> None:
+    path = cache_path(SCENARIO_SNAPSHOT_FILE)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"key": key, "scenarios": scenarios}, f)
+    os.replace(temp_path, path)
 
-async def doc_to_scenarios_async(retries: int = 2, batch_size: int = 10) -> list[Scenario]:
+
+def clear_scenario_snapshot() -> bool:
+    """Drops the last run's scenario set, so the next run reads the store; returns whether there was one."""
+    try:
+        os.remove(cache_path(SCENARIO_SNAPSHOT_FILE))
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def reuse_near_duplicates(uncached_cases: list[tuple[int, str]], stale_cases: dict[str, dict],
+                          threshold: float) -> tuple[list[Scenario], list[tuple[int, str]]]:
+    """
+    Matches cases missing from the cache against cached cases that left the doc (e.g. the same
+    case before a typo fix). A match is reused, with its edits patched in, only when the scenario
+    can follow every edit (see refresh_scenario) and none of them touches an answer (see
+    edits_answers); changed numbers are logged. Each stale entry is reused at most once.
+    Returns (reused scenarios, cases still to format).
+    """
+    if not uncached_cases or not stale_cases:
+        return [], uncached_cases
+    index = NearDuplicateIndex()
+    for stale_text in stale_cases:
+        index.add(stale_text, stale_text)
+    reused: list[Scenario] = []
+    remaining = []
+    for case_num, case_text in uncached_cases:
+        match = index.query(case_text, threshold)
+        if match is None:
+            remaining.append((case_num, case_text))
+            continue
+        stale_text, score = match
+        refresh = refresh_scenario(stale_cases[stale_text], stale_text, case_text)
+        if refresh.unpatched or edits_answers(stale_text, case_text):
+            reason = f"{refresh.unpatched} edits can't be patched" if refresh.unpatched else "an answer changed"
+            print(f"Case {case_num}: not reusing a near-duplicate's scenario (similarity {score:.3f}, {reason}); reformatting")
+            remaining.append((case_num, case_text))
+            continue
+        index.remove(stale_text)
+        print(f"Case {case_num}: reusing the cached scenario of a near-duplicate case (similarity {score:.3f}, "
+              f"{refresh.patched} edits patched, {refresh.spelling} spelling fixes already in the scenario)")
+        if refresh.readings:
+            print(f"Case {case_num}: changed readings patched into the reused scenario: {', '.join(refresh.readings)}")
+        reused.append(normalize_scenario(case_num, case_text, refresh.scenario))
+    return reused, remaining
+
+
+async def doc_to_scenarios_async(retries: int = 2, batch_size: int = 10, near_duplicate_threshold: float | None = None) -> list[Scenario]:
     """
     Converts the docs file into a list of test scenarios using gpt-5-nano.
-    Processes cases in parallel batches for faster execution.
+    Processes cases concurrently over an adaptive sliding window for faster execution.
+    Cached scenarios are only reused for the current prompt, model and schema version (see formatter_version).
+    An unchanged doc (same cases, same formatter) returns the last run's scenarios while the store still
+    has every one of them; only their keys are looked up.
+    With `near_duplicate_threshold` set (opt-in), a changed case whose text is at least that similar to
+    a cached one that left the doc reuses that scenario instead of being reformatted, when its edits
+    can all be patched in and leave the answers alone (see reuse_near_duplicates).
     """
-    cached_cases = {}
-    cache_file = 'case_scenarios_cache.jsonl'
-    
-    if os.path.exists(cache_file):
-        with open(cache_file, 'r') as f:
-            for line in f:
-                if line.strip():
-                    scenario = json.loads(line)
-                    if 'original_text' in scenario:
-                        cached_cases[scenario['original_text']] = scenario
-
     case_separated = extract_case_separated_docs()
+    snapshot_key = scenario_set_key(case_separated)
+    store = scenario_store(formatter_version())
+    unchanged = _read_scenario_snapshot(snapshot_key)
+    # Entries invalidated since (scenario_cache.py invalidate) are reformatted instead
+    if unchanged is not None and store.has_all([scenario["original_text"] for scenario in unchanged]):
+        store.close()
+        print(f"Doc unchanged since the last run; reusing its {len(unchanged)} scenarios")
+        return unchanged
+
     total_cases = len(case_separated)
-    current_case_texts = {case_text for _, case_text in case_separated}
-
-    # Drop stale cache entries that are no longer present in the source doc.
-    cached_cases = {
-        case_text: scenario
-        for case_text, scenario in cached_cases.items()
-        if case_text in current_case_texts
-    }
+    case_texts = [case_text for _, case_text in case_separated]
+    cached_cases = store.get_many(case_texts)
     cached_count = len(cached_cases)
 
     scenarios: list[Scenario] = []
     uncached_cases = []
+    refreshed = []
     for case_num, case_text in case_separated:
         cached_scenario = cached_cases.get(case_text)
         if cached_scenario:
             refreshed_scenario = normalize_scenario(case_num, case_text, cached_scenario)
-            cached_cases[case_text] = refreshed_scenario
+            if refreshed_scenario != cached_scenario:
+                refreshed.append(refreshed_scenario)
             scenarios.append(refreshed_scenario)
         else:
             uncached_cases.append((case_num, case_text))
+    cache_hits = len(scenarios)
+    # Only entries whose case number or name changed are written back
+    store.put_many(refreshed)
+
+    # Entries no longer in the source doc are dropped; an edited case may first reuse its old version's
+    stale_cases = store.others(case_texts) if uncached_cases or cached_count < len(store) else {}
+    near_duplicates: list[Scenario] = []
+    if near_duplicate_threshold is not None:
+        near_duplicates, uncached_cases = reuse_near_duplicates(uncached_cases, stale_cases, near_duplicate_threshold)
+    scenarios.extend(near_duplicates)
+    store.put_many(near_duplicates)
+    store.delete(list(stale_cases))
 
     print(f"Total cases extracted from Google Doc: {total_cases}")
     print(f"Number of cases found in cache: {cached_count}")
-    print(f"Cache hits: {len(scenarios)}")
+    print(f"Cache hits: {cache_hits}")
+    print(f"Near-duplicate hits: {len(near_duplicates)}")
     print(f"Cases to process: {len(uncached_cases)}")
     
     failed_cases = []
+    added = len(near_duplicates)
 
-    # is there a good way to make sure that cases which are _basically_ the same are not processed twice other than embedding and checking similarity?
     for r in range(retries):
         if len(failed_cases) > 0:
             print(f"Retrying {len(failed_cases)} failed cases...")
@@ -246,36 +369,42 @@ async def doc_to_scenarios_async(retries: int = 2, batch_size: int = 10) -> list
         results = await process_batch_async(cases_to_process, batch_size=batch_size)
         
         # Collect results
+        formatted = []
         for formatted_case, case_num, original_case_text, checked_scenario in results:
             if checked_scenario:
                 checked_scenario = normalize_scenario(case_num, original_case_text, checked_scenario)
-                cached_cases[original_case_text] = checked_scenario
+                formatted.append(checked_scenario)
                 scenarios.append(checked_scenario)
             elif original_case_text:
                 failed_cases.append((case_num, original_case_text))
-    
-    with open(cache_file, 'w') as f:
-        for scenario in cached_cases.values():
-            f.write(json.dumps(scenario) + '\n')
+        # Saved as each round finishes, so an interrupted run keeps what it formatted
+        store.put_many(formatted)
+        added += len(formatted)
+    store.close()
 
-    print(f"Added {len(cached_cases) - cached_count} new cases to cache.")
+    print(f"Added {added} new cases to cache.")
     print(f"Total cases processed: {len(scenarios)}")
 
     # Sort by case_number to ensure deterministic test collection
     scenarios.sort(key=lambda s: s['case_number'])
+
+    # Only a complete set is pinned; failed cases are retried next run
+    if len(scenarios) == total_cases:
+        _write_scenario_snapshot(snapshot_key, scenarios)
     
     return scenarios
 
-def doc_to_scenarios(retries: int = 2, batch_size: int = 10) -> list[Scenario]:
+def doc_to_scenarios(retries: int = 2, batch_size: int = 10, near_duplicate_threshold: float | None = None) -> list[Scenario]:
     """
     Converts the docs file into a list of test scenarios using gpt-5-nano.
     Synchronous wrapper for the async implementation.
     
     Args:
         retries: Number of retry attempts for failed cases
-        batch_size: Number of cases to process concurrently in each batch (default: 10)
+        batch_size: Formatting requests in flight at first; adapts up to MAX_FORMAT_CONCURRENCY (default: 10)
+        near_duplicate_threshold: Shingle similarity above which an edited case may reuse its old cached scenario (None: off, the default)
     
     Returns:
         List of formatted test scenarios
     """
-    return asyncio.run(doc_to_scenarios_async(retries=retries, batch_size=batch_size))
+    return asyncio.run(doc_to_scenarios_async(retries=retries, batch_size=batch_size, near_duplicate_threshold=near_duplicate_threshold))
@@ -0,0 +1,204 @@
+"""
+Offline near-duplicate detection for case texts (MinHash over character shingles).
+
+Fixing a typo in a case changes its text, which misses the exact-text scenario
+cache and sends the case back through the formatter. `NearDuplicateIndex` finds
+the cached case a new text was edited from: texts are reduced to 5-character
+shingles, MinHash signatures are bucketed with LSH banding to find candidates,
+and candidates are scored by the exact Jaccard similarity of their shingle sets.
+Everything is local; no embedding service is involved.
+
+`refresh_scenario` is the cheap follow-up: word-level substitutions between the
+old and new case text (e.g. "38.2" -> "39.2") are patched into the cached
+scenario where the old wording appears exactly once. A spelling fix the formatter
+already made ("tempreture" -> "temperature", with "temperature" in the scenario)
+needs no patch. Any other edit the scenario can't follow, including added or
+removed words, is reported as unpatched. A similar text can still be a different
+case: `edits_answers` spots edits to a question's answer ("blood in the stool (no)"
+-> "(yes)") or the expected answer.
+"""
+
+import difflib
+import hashlib
+import re
+from collections import defaultdict
+from typing import NamedTuple
+
+import numpy as np
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 32
+# Reuse a cached scenario only for a near-identical case text
+DEFAULT_THRESHOLD = 0.9
+# Character similarity of an edited word to its replacement that still reads as a spelling fix
+SPELLING_RATIO = 0.8
+
+# Smallest prime above 2^32, for the universal hash family
+_PRIME = np.uint64(4294967311)
+# Words and numbers ("38.2", "1,000"), without surrounding punctuation
+_WORD = re.compile(r"\w+(?:[.,]\w+)*")
+# Where a case states answers: "(yes)" after a question, and the "answer: ..." / "diagnosis: ..." line
+_ANSWER = re.compile(r"\([^()\n]*\)|\b(?:answer|diagnosis)\s*:[^\n]*", re.IGNORECASE)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set[str]:
+    text = _normalize(text)
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a: set[str], b: set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index of texts by key; `query` returns the most similar key above a threshold."""
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = BANDS, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._shingles: dict[str, set[str]] = {}
+        self._band_keys: dict[str, list[tuple]] = {}
+        self._buckets: dict[tuple, set[str]] = defaultdict(set)
+
+    def _signature(self, shingle_set: set[str]) -> np.ndarray:
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingle_set),
+            dtype=np.uint64, count=len(shingle_set),
+        )
+        # (a * x + b) mod p for every permutation × shingle; a, x < 2^32 so the product fits in uint64
+        permuted = ((np.outer(self._a, hashes) % _PRIME) + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1)
+
+    def _bands(self, signature: np.ndarray) -> list[tuple]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def add(self, key: str, text: str) -> None:
+        self.remove(key)
+        shingle_set = shingles(text)
+        band_keys = self._bands(self._signature(shingle_set))
+        self._shingles[key] = shingle_set
+        self._band_keys[key] = band_keys
+        for band_key in band_keys:
+            self._buckets[band_key].add(key)
+
+    def remove(self, key: str) -> None:
+        for band_key in self._band_keys.pop(key, []):
+            self._buckets[band_key].discard(key)
+        self._shingles.pop(key, None)
+
+    def query(self, text: str, threshold: float = DEFAULT_THRESHOLD) -> tuple[str, float] | None:
+        """(key, Jaccard similarity) of the closest indexed text at or above `threshold`, or None."""
+        if not self._shingles:
+            return None
+        shingle_set = shingles(text)
+        candidates = set()
+        for band_key in self._bands(self._signature(shingle_set)):
+            candidates |= self._buckets.get(band_key, set())
+        best = None
+        for key in sorted(candidates):
+            score = jaccard(shingle_set, self._shingles[key])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+
+def _replace_once(text: str, old: str, new: str) -> str | None:
+    """`text` with the single case-insensitive whole-word occurrence of `old` replaced, else None."""
+    matches = list(re.finditer(rf"(?<!\w){re.escape(old)}(?!\w)", text, flags=re.IGNORECASE))
+    if len(matches) != 1:
+        return None
+    match = matches[0]
+    return text[:match.start()] + new + text[match.end():]
+
+
+class Refresh(NamedTuple):
+    """A cached scenario with a case's edits patched in, and how each edit was handled."""
+    scenario: dict
+    patched: int
+    # Edits the scenario can't follow; the case should be reformatted
+    unpatched: int
+    # Spelling fixes the scenario already reads correctly
+    spelling: int
+    # Patched edits that change a number ("38.2 -> 39.2"), worth a look
+    readings: list[str]
+
+
+def _mentions(text, phrase: str) -> bool:
+    return isinstance(text, str) and re.search(rf"(?<!\w){re.escape(phrase)}(?!\w)", text, flags=re.IGNORECASE) is not None
+
+
+def _is_spelling_fix(old: str, new: str) -> bool:
+    """A small change to the letters of non-numeric words, spacing included ("blood in" for "bloodin")."""
+    if any(char.isdigit() for char in old + new):
+        return False
+    old, new = old.replace(" ", "").lower(), new.replace(" ", "").lower()
+    return difflib.SequenceMatcher(a=old, b=new, autojunk=False).ratio() >= SPELLING_RATIO
+
+
+def refresh_scenario(scenario: dict, old_text: str, new_text: str) -> Refresh:
+    """Patches word substitutions between a case's old and new text into its cached scenario."""
+    old_words = _WORD.findall(old_text)
+    new_words = _WORD.findall(new_text)
+    refreshed = dict(scenario)
+    patched = unpatched = spelling = 0
+    readings = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(a=old_words, b=new_words, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        old, new = " ".join(old_words[i1:i2]), " ".join(new_words[j1:j2])
+        if tag != "replace":
+            unpatched += 1
+            continue
+        applied = False
+        for field in ("description", "expected_diagnosis"):
+            value = refreshed.get(field)
+            if isinstance(value, str):
+                updated = _replace_once(value, old, new)
+                if updated is not None:
+                    refreshed[field] = updated
+                    applied = True
+        if applied:
+            patched += 1
+            if any(char.isdigit() for char in old + new):
+                readings.append(f"{old} -> {new}")
+        elif _is_spelling_fix(old, new) and any(_mentions(refreshed.get(field), new) for field in ("description", "expected_diagnosis")):
+            spelling += 1
+        else:
+            unpatched += 1
+    return Refresh(refreshed, patched, unpatched, spelling, readings)
+
+
+def _answer_word_indices(text: str) -> set[int]:
+    """Positions (in `_WORD.findall(text)`) of the words inside the text's answers."""
+    spans = [match.span() for match in _ANSWER.finditer(text)]
+    return {
+        index for index, word in enumerate(_WORD.finditer(text))
+        if any(start <= word.start() < end for start, end in spans)
+    }
+
+
+def edits_answers(old_text: str, new_text: str) -> bool:
+    """Whether any word edit between the two texts falls inside an answer of either one."""
+    old_answers, new_answers = _answer_word_indices(old_text), _answer_word_indices(new_text)
+    matcher = difflib.SequenceMatcher(a=_WORD.findall(old_text), b=_WORD.findall(new_text), autojunk=False)
+    return any(
+        not old_answers.isdisjoint(range(i1, i2)) or not new_answers.isdisjoint(range(j1, j2))
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"
+    )
@@ -0,0 +1,265 @@
+"""
+Cache of formatted scenarios, keyed by case text and formatter version.
+
+A scenario depends on more than its case text: the formatting prompt, the model
+that ran it and the Scenario schema shape it too. Entries are keyed by a compact
+digest of (case text hash, prompt hash, model, schema version), so changing any of
+them misses the cache instead of reusing scenarios made by the old formatter.
+Entries of other versions stay in the store until they're invalidated
+(`python scenario_cache.py invalidate --outdated`); `scenario_cache.py report`
+shows how many cases the next run would reformat, and why.
+
+Scenarios live in one SQLite file under ONEDAY_CACHE_DIR (WAL mode, see
+harness.storage), so runs only read the cases they look up and write the cases
+they format, and concurrent runs in the same directory (e.g. two
+run_all_models.py invocations) can't corrupt or drop each other's entries:
+every write is a single upsert transaction.
+
+An existing case_scenarios_cache.jsonl (the previous cache format) is imported
+the first time the store is opened empty, and a store written before entries
+were versioned is rekeyed when opened. Neither records which formatter made its
+scenarios, so they are attributed to the current one.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import NamedTuple
+
+from harness.storage import cache_path, connect_sqlite
+
+DEFAULT_SCENARIO_STORE_FILE = "scenarios.sqlite"
+LEGACY_CACHE_FILE = "case_scenarios_cache.jsonl"
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS scenarios (
+        cache_key TEXT PRIMARY KEY,
+        text_hash TEXT NOT NULL,
+        prompt_hash TEXT NOT NULL,
+        model TEXT NOT NULL,
+        schema_version INTEGER NOT NULL,
+        case_number INTEGER,
+        scenario TEXT NOT NULL,
+        updated REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS scenarios_text ON scenarios (text_hash)",
+    "CREATE INDEX IF NOT EXISTS scenarios_version ON scenarios (prompt_hash, model, schema_version)",
+)
+_VERSION_MATCHES = "prompt_hash = ? AND model = ? AND schema_version = ?"
+
+
+class FormatterVersion(NamedTuple):
+    """What a formatted scenario depends on besides its case text."""
+    prompt_hash: str
+    model: str
+    schema_version: int
+
+    def describe(self) -> str:
+        return f"prompt {self.prompt_hash}, model {self.model}, schema v{self.schema_version}"
+
+    def changes_from(self, other: "FormatterVersion") -> list[str]:
+        """Parts ("prompt", "model", "schema") that differ from `other`."""
+        return [
+            part for part, mine, theirs in (
+                ("prompt", self.prompt_hash, other.prompt_hash),
+                ("model", self.model, other.model),
+                ("schema", self.schema_version, other.schema_version),
+            ) if mine != theirs
+        ]
+
+
+def _digest(*parts) -> str:
+    return hashlib.blake2b("\x1f".join(str(part) for part in parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def text_hash(case_text: str) -> str:
+    return _digest(case_text)
+
+
+def cache_key(case_text: str, version: FormatterVersion) -> str:
+    """Fixed-size key of one case text under one formatter version."""
+    return _digest(text_hash(case_text), *version)
+
+
+class ScenarioStore:
+    """SQLite store of scenario dicts; lookups and writes are for the formatter `version`."""
+
+    def __init__(self, path: str, version: FormatterVersion):
+        self.path = path
+        self.version = version
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        unversioned = self._unversioned_rows()
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        if unversioned:
+            self.put_many(unversioned)
+            print(f"Rekeyed {len(unversioned)} cached scenarios in {path} by formatter version ({version.describe()})")
+
+    def _unversioned_rows(self) -> list[dict]:
+        """Drops a table from before entries were versioned, returning its scenarios."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(scenarios)")}
+        if not columns or "cache_key" in columns:
+            return []
+        rows = [json.loads(row[0]) for row in self._conn.execute("SELECT scenario FROM scenarios")]
+        self._conn.execute("DROP TABLE scenarios")
+        return rows
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM scenarios").fetchone()[0]
+
+    def count(self) -> int:
+        """Entries of the store's formatter version."""
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM scenarios WHERE {_VERSION_MATCHES}", self.version).fetchone()[0]
+
+    def get(self, case_text: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT scenario FROM scenarios WHERE cache_key = ?", (cache_key(case_text, self.version),)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def has_all(self, case_texts: list[str]) -> bool:
+        """Whether every one of `case_texts` has an entry of this version (only keys are read)."""
+        with self._lock:
+            return all(
+                self._conn.execute("SELECT 1 FROM scenarios WHERE cache_key = ?", (cache_key(case_text, self.version),)).fetchone()
+                for case_text in case_texts
+            )
+
+    def get_many(self, case_texts: list[str]) -> dict[str, dict]:
+        """{case text: scenario} for the stored ones among `case_texts`."""
+        return {case_text: scenario for case_text in case_texts if (scenario := self.get(case_text)) is not None}
+
+    def put_many(self, scenarios: list[dict]) -> None:
+        """Upserts scenarios (keyed by their `original_text`) in one transaction."""
+        if not scenarios:
+            return
+        now = time.time()
+        rows = [
+            (cache_key(scenario["original_text"], self.version), text_hash(scenario["original_text"]), *self.version,
+             scenario.get("case_number"), json.dumps(scenario), now)
+            for scenario in scenarios
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO scenarios (cache_key, text_hash, prompt_hash, model, schema_version, case_number, scenario, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (cache_key) DO UPDATE SET case_number = excluded.case_number, "
+                    "scenario = excluded.scenario, updated = excluded.updated",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def put(self, scenario: dict) -> None:
+        self.put_many([scenario])
+
+    def others(self, case_texts: list[str]) -> dict[str, dict]:
+        """{case text: scenario} for this version's stored cases whose text is not among `case_texts`."""
+        keep = {text_hash(case_text) for case_text in case_texts}
+        with self._lock:
+            keys = [
+                key for key, digest in self._conn.execute(
+                    f"SELECT cache_key, text_hash FROM scenarios WHERE {_VERSION_MATCHES}", self.version
+                ) if digest not in keep
+            ]
+            rows = [self._conn.execute("SELECT scenario FROM scenarios WHERE cache_key = ?", (key,)).fetchone() for key in keys]
+        # A row can disappear between the two queries when another run deletes it
+        scenarios = [json.loads(row[0]) for row in rows if row is not None]
+        return {scenario["original_text"]: scenario for scenario in scenarios}
+
+    def delete(self, case_texts: list[str]) -> int:
+        """Removes this version's entries for `case_texts`."""
+        return self.delete_keys([cache_key(case_text, self.version) for case_text in case_texts])
+
+    def delete_keys(self, keys: list[str]) -> int:
+        if not keys:
+            return 0
+        with self._lock:
+            return self._conn.executemany("DELETE FROM scenarios WHERE cache_key = ?", [(key,) for key in keys]).rowcount
+
+    def versions(self) -> list[tuple[FormatterVersion, int]]:
+        """Stored formatter versions with their entry counts, largest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT prompt_hash, model, schema_version, COUNT(*) FROM scenarios "
+                "GROUP BY prompt_hash, model, schema_version ORDER BY COUNT(*) DESC"
+            ).fetchall()
+        return [(FormatterVersion(*row[:3]), row[3]) for row in rows]
+
+    def stored_versions(self, case_texts: list[str]) -> dict[str, list[FormatterVersion]]:
+        """{case text: versions it has entries under} for each of `case_texts`."""
+        with self._lock:
+            return {
+                case_text: [
+                    FormatterVersion(*row) for row in self._conn.execute(
+                        "SELECT prompt_hash, model, schema_version FROM scenarios WHERE text_hash = ?", (text_hash(case_text),)
+                    )
+                ]
+                for case_text in case_texts
+            }
+
+    def select(self, case_numbers: list[int] | None = None, match: str | None = None, outdated: bool = False) -> list[dict]:
+        """
+        Entries of any version that pass every given filter: one of `case_numbers`, `match` in the
+        case text (case-insensitive), or (`outdated`) a version other than the store's.
+        Each is {"cache_key", "case_number", "version", "text"}; no filters selects everything.
+        """
+        clauses, params = [], []
+        if case_numbers:
+            clauses.append(f"case_number IN ({', '.join('?' * len(case_numbers))})")
+            params.extend(case_numbers)
+        if outdated:
+            clauses.append(f"NOT ({_VERSION_MATCHES})")
+            params.extend(self.version)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT cache_key, case_number, prompt_hash, model, schema_version, scenario FROM scenarios{where} "
+                "ORDER BY case_number",
+                params,
+            ).fetchall()
+        entries = []
+        for key, case_number, prompt, model, schema_version, scenario in rows:
+            text = json.loads(scenario).get("original_text", "")
+            if match and match.lower() not in text.lower():
+                continue
+            entries.append({"cache_key": key, "case_number": case_number,
+                            "version": FormatterVersion(prompt, model, schema_version), "text": text})
+        return entries
+
+    def import_jsonl(self, path: str) -> int:
+        """Adds the scenarios of a case_scenarios_cache.jsonl file under this version; returns how many."""
+        scenarios = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    scenario = json.loads(line)
+                    if "original_text" in scenario:
+                        scenarios.append(scenario)
+        self.put_many(scenarios)
+        return len(scenarios)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def scenario_store(version: FormatterVersion, path: str | None = None, legacy_path: str = LEGACY_CACHE_FILE) -> ScenarioStore:
+    """Opens the scenario store (default `$ONEDAY_CACHE_DIR/scenarios.sqlite`), importing the legacy JSONL cache into an empty one."""
+    store = ScenarioStore(path or cache_path(DEFAULT_SCENARIO_STORE_FILE), version)
+    if os.path.exists(legacy_path) and not len(store):
+        imported = store.import_jsonl(legacy_path)
+        print(f"Imported {imported} cached scenarios from {legacy_path} into {store.path}")
+    return store
@@ -0,0 +1,154 @@
+"""
+Harness utilities for OneDay agent simulation tests.
+Shared plumbing used by the test module, conftest hooks and reporting scripts.
+
+Names are imported from their modules on first use, so importing a light module
+(e.g. harness.storage from doc_extraction) doesn't load litellm, numpy and the rest.
+"""
+
+import importlib
+
+# Modules named like the function they export are bound up front: importing the
+# submodule later would otherwise shadow the function with the module
+from harness.run_history import RunHistory, new_run_id, run_history
+from harness.trace_store import TraceStore, trace_store
+
+_EXPORTS = {
+    "harness.accounting": (
+        "LLM_ROLES",
+        "CallAccounting",
+        "RoleTaggedCall",
+        "install_call_accounting",
+        "installed_call_accounting",
+        "llm_role",
+        "settle_case_accounting",
+        "uninstall_call_accounting",
+        "usage_by_role",
+    ),
+    "harness.budget": (
+        "RunBudget",
+        "parse_duration",
+    ),
+    "harness.cassette": (
+        "CASSETTE_MODES",
+        "Cassette",
+        "CassetteMiss",
+        "default_cassette_path",
+        "install_cassette",
+        "installed_cassette",
+        "uninstall_cassette",
+    ),
+    "harness.case_stats": (
+        "count_case_stat",
+        "current_case_stats",
+        "start_case_stats",
+    ),
+    "harness.concurrency": (
+        "AdaptiveLimit",
+        "OffloadedCall",
+        "ScenarioPool",
+    ),
+    "harness.guideline_index": (
+        "GuidelineIndex",
+        "parse_sections",
+    ),
+    "harness.langwatch": (
+        "TraceFetcher",
+        "add_trace_usage",
+        "empty_usage",
+        "usage_from_traces",
+    ),
+    "harness.latency": (
+        "LatencyHistogram",
+        "merge_histograms",
+    ),
+    "harness.metrics": (
+        "MetricTable",
+        "summarize",
+    ),
+    "harness.pricing": (
+        "ModelRates",
+        "PricingTable",
+        "pricing_table",
+    ),
+    "harness.profiling": (
+        "StackSampler",
+        "finish_case_profile",
+        "install_profiling",
+        "merge_breakdowns",
+        "span",
+        "start_case_profile",
+        "uninstall_profiling",
+    ),
+    "harness.prompts": (
+        "PromptRegistry",
+        "cached_system_message",
+        "prompt_cache_params",
+        "prompt_hash",
+    ),
+    "harness.ratelimit": (
+        "RateLimiter",
+        "install_rate_limiter",
+        "installed_rate_limiter",
+        "parse_rate_limits",
+        "rate_limiter",
+        "uninstall_rate_limiter",
+    ),
+    "harness.response_cache": (
+        "ResponseCache",
+        "agent_response_cache",
+        "response_cache_key",
+    ),
+    "harness.results_log": (
+        "ResultsLog",
+        "compact_results_log",
+        "partial_results",
+        "read_results_log",
+    ),
+    "harness.run_history": (
+        "RunHistory",
+        "new_run_id",
+        "run_history",
+    ),
+    "harness.storage": (
+        "cache_dir",
+        "connect_sqlite",
+    ),
+    "harness.streaming": (
+        "StreamMetrics",
+        "astream_completion",
+        "stream_completion",
+    ),
+    "harness.trace_store": (
+        "TraceStore",
+        "trace_store",
+    ),
+    "harness.turn": (
+        "apost_turn_simulation",
+        "close_turn_async_client",
+        "post_turn_simulation",
+        "set_turn_base_url",
+        "turn_base_url",
+    ),
+    "harness.usage": (
+        "add_response_usage",
+        "cached_tokens",
+        "new_usage",
+    ),
+}
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name: str):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,240 @@
+"""
+In-process token, cost and latency accounting for every litellm call.
+
+A litellm callback (`CallAccounting`) sees each completion as it finishes, so
+usage is known without fetching LangWatch traces afterwards. Calls are tagged
+with the role that made them (agent, user_sim, judge, doc_formatter) through
+`llm_role`, and their totals are added to the case's counters (see
+harness.case_stats) under per-role keys:
+
+    {role}_llm_calls  {role}_llm_failures  {role}_llm_ms
+    {role}_prompt_tokens  {role}_cached_prompt_tokens  {role}_completion_tokens  {role}_cost
+    unpriced:{model}      calls to a model with no known price (not in any cost)
+
+Every successful call's duration also goes into a process-wide latency
+histogram per (role, model) (see harness.latency); the conftest merges the
+workers' histograms on the controller.
+
+The role and case are captured when litellm starts the call, in the caller's
+context; success and failure callbacks may run later on litellm's logging
+thread or as event-loop tasks, so a case awaits `settle_case_accounting` before
+reporting its counters.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import litellm
+from litellm.integrations.custom_logger import CustomLogger
+
+from harness.case_stats import current_case_stats
+from harness.latency import LatencyHistogram
+from harness.pricing import pricing_table
+from harness.profiling import span
+from harness.usage import cached_tokens
+
+LLM_ROLES = ("agent", "user_sim", "judge", "doc_formatter")
+USAGE_FIELDS = ("prompt_tokens", "cached_prompt_tokens", "completion_tokens", "cost", "llm_ms")
+# Upper bound on waiting for callbacks of calls that already returned
+SETTLE_TIMEOUT_S = 5.0
+# Call ids already accounted, so a call reported twice is only counted once
+_SEEN_CALL_IDS = 4096
+
+_role: contextvars.ContextVar[str] = contextvars.ContextVar("llm_role", default="other")
+
+_installed: "CallAccounting | None" = None
+
+
+def current_llm_role() -> str:
+    return _role.get()
+
+
+@contextlib.contextmanager
+def llm_role(role: str):
+    """Tags litellm calls made inside the block (and tasks/threads started from it) with `role`."""
+    token = _role.set(role)
+    try:
+        yield
+    finally:
+        _role.reset(token)
+
+
+class RoleTaggedCall:
+    """Mixin for scenario agents: their `call` runs under `llm_role(self.llm_role)`.
+
+    Put it before OffloadedCall in the bases so the role is in the context the
+    offloaded thread copies.
+    """
+
+    llm_role = "other"
+
+    async def call(self, *args, **kwargs):
+        with llm_role(self.llm_role), span(self.llm_role):
+            return await super().call(*args, **kwargs)  # type: ignore[misc]
+
+
+def _role_usage(stats: dict, role: str) -> dict:
+    return {field: stats.get(f"{role}_{field}", 0) for field in USAGE_FIELDS}
+
+
+def usage_by_role(stats: dict) -> dict[str, dict]:
+    """Per-role usage from a case's counters (or props), for roles that made calls."""
+    roles = {key.rsplit("_llm_", 1)[0] for key in stats if key.endswith(("_llm_calls", "_llm_failures"))}
+    return {role: _role_usage(stats, role) for role in sorted(roles)}
+
+
+class CallAccounting(CustomLogger):
+    """litellm callback that adds each call's usage to the calling case's counters."""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._inflight: dict[str, tuple[dict | None, str]] = {}
+        self._seen: OrderedDict[str, None] = OrderedDict()
+        # Process-wide totals per role, including calls made outside any case (doc formatter)
+        self.totals: dict[str, dict] = defaultdict(lambda: dict.fromkeys(("llm_calls", "llm_failures", *USAGE_FIELDS), 0))
+        # Per-call durations, keyed "role|model"
+        self.latency: dict[str, LatencyHistogram] = {}
+
+    def _call_id(self, kwargs: dict) -> str | None:
+        return kwargs.get("litellm_call_id") or (kwargs.get("litellm_params") or {}).get("litellm_call_id")
+
+    def _take(self, kwargs: dict) -> tuple[dict | None, str] | None:
+        """The (case counters, role) of a finished call, or None if it was already counted."""
+        call_id = self._call_id(kwargs)
+        with self._lock:
+            if call_id is not None:
+                if call_id in self._seen:
+                    return None
+                self._seen[call_id] = None
+                while len(self._seen) > _SEEN_CALL_IDS:
+                    self._seen.popitem(last=False)
+                entry = self._inflight.pop(call_id, None)
+                if entry is not None:
+                    return entry
+        # No start event seen (e.g. a call that failed before reaching the provider)
+        return current_case_stats(), current_llm_role()
+
+    def _add(self, stats: dict | None, role: str, values: dict) -> None:
+        with self._lock:
+            targets = [(self.totals[role], "")]
+            if stats is not None:
+                targets.append((stats, f"{role}_"))
+            for target, prefix in targets:
+                for field, value in values.items():
+                    target[prefix + field] = target.get(prefix + field, 0) + value
+
+    def record_latency(self, role: str, model: str, ms: float) -> None:
+        with self._lock:
+            self.latency.setdefault(f"{role}|{model}", LatencyHistogram()).record(ms)
+
+    def latency_snapshot(self) -> dict[str, dict]:
+        """Serializable copy of the latency histograms (see harness.latency.merge_histograms)."""
+        with self._lock:
+            return {key: histogram.to_dict() for key, histogram in self.latency.items()}
+
+    def pending(self, stats: dict) -> int:
+        with self._lock:
+            return sum(1 for case, _ in self._inflight.values() if case is stats)
+
+    def forget(self, stats: dict) -> None:
+        """Drops a case's calls that never reported back (e.g. an abandoned stream)."""
+        with self._lock:
+            self._inflight = {call_id: entry for call_id, entry in self._inflight.items() if entry[0] is not stats}
+
+    # litellm callback hooks
+
+    def log_pre_api_call(self, model, messages, kwargs):
+        call_id = self._call_id(kwargs)
+        if call_id is not None:
+            with self._lock:
+                self._inflight[call_id] = (current_case_stats(), current_llm_role())
+
+    def log_success_event(self, kwargs, response_obj, start_time, end_time):
+        entry = self._take(kwargs)
+        if entry is None:
+            return
+        usage = getattr(response_obj, "usage", None)
+        values = {
+            "llm_calls": 1,
+            "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
+            "cached_prompt_tokens": cached_tokens(usage),
+            "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
+            "llm_ms": _elapsed_ms(start_time, end_time),
+        }
+        model = str(kwargs.get("model") or getattr(response_obj, "model", None) or "")
+        self.record_latency(entry[1], model, values["llm_ms"])
+        # litellm prices the call itself when it can; otherwise try our table, and report misses
+        cost = kwargs.get("response_cost")
+        if cost is None:
+            cost = pricing_table().cost(model, values["prompt_tokens"], values["completion_tokens"], values["cached_prompt_tokens"])
+            if cost is None and entry[0] is not None:
+                with self._lock:
+                    entry[0][f"unpriced:{model}"] = entry[0].get(f"unpriced:{model}", 0) + 1
+        values["cost"] = cost or 0.0
+        self._add(*entry, values)
+
+    def log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        entry = self._take(kwargs)
+        if entry is None:
+            return
+        self._add(*entry, {"llm_failures": 1, "llm_ms": _elapsed_ms(start_time, end_time)})
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        self.log_success_event(kwargs, response_obj, start_time, end_time)
+
+    async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        self.log_failure_event(kwargs, response_obj, start_time, end_time)
+
+
+def _elapsed_ms(start_time, end_time) -> float:
+    try:
+        return max((end_time - start_time).total_seconds() * 1000, 0.0)
+    except (TypeError, AttributeError):
+        return 0.0
+
+
+def install_call_accounting() -> CallAccounting:
+    """Registers the accounting callback with litellm for this process."""
+    global _installed
+    uninstall_call_accounting()
+    _installed = CallAccounting()
+    litellm.callbacks.append(_installed)  # type: ignore[attr-defined]
+    return _installed
+
+
+def uninstall_call_accounting() -> None:
+    global _installed
+    if _installed is None:
+        return
+    # litellm promotes registered callbacks into its per-event lists on first use
+    for name in ("callbacks", "success_callback", "failure_callback", "_async_success_callback", "_async_failure_callback"):
+        callbacks = getattr(litellm, name, [])
+        while _installed in callbacks:
+            callbacks.remove(_installed)
+    _installed = None
+
+
+def installed_call_accounting() -> CallAccounting | None:
+    return _installed
+
+
+def record_llm_latency(role: str, model: str, ms: float) -> None:
+    """Adds a call that doesn't go through litellm (e.g. a Turn.io agent turn) to the latency histograms."""
+    if _installed is not None:
+        _installed.record_latency(role, model, ms)
+
+
+async def settle_case_accounting(stats: dict, timeout: float = SETTLE_TIMEOUT_S) -> None:
+    """Waits (briefly) until every started call of the case has been accounted."""
+    if _installed is None:
+        return
+    deadline = time.monotonic() + timeout
+    # Callbacks run on litellm's logging thread or as tasks on this loop, so poll rather than block
+    while _installed.pending(stats) and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    _installed.forget(stats)
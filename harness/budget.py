@@ -0,0 +1,132 @@
+"""
+Run budgets: stop starting new cases once a run is projected to cost too much or take too long.
+
+The controller feeds every finished case into a RunBudget. Once MIN_CASES_TO_PROJECT
+cases have finished, the run's total is projected from the running averages
+(spend per case, wall time per case at the current throughput) over the cases still
+to run. When the projection (or what has already been spent / elapsed) exceeds the
+budget, the budget stops: cases already running finish, everything not yet started is
+skipped with the reason. xdist workers see the stop through a small file the
+controller writes, passed to them in workerinput.
+"""
+
+import os
+import re
+import time
+
+# Finished cases needed before averages are trusted for a projection
+MIN_CASES_TO_PROJECT = 3
+
+_DURATION = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smh]?)\s*$")
+_UNIT_SECONDS = {"": 1, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: str) -> float:
+    """Seconds in "900", "900s", "15m" or "1.5h"."""
+    match = _DURATION.match(value.lower())
+    if not match:
+        raise ValueError(f"Invalid duration {value!r} (expected e.g. 900, 15m or 1.5h)")
+    return float(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+
+
+def _fmt_duration(seconds: float) -> str:
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f}h"
+    if seconds >= 60:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds:.0f}s"
+
+
+class RunBudget:
+    """Cost and wall-time budget for one run, enforced by projection."""
+
+    def __init__(self, max_cost: float | None = None, max_wall_time_s: float | None = None,
+                 stop_file: str | None = None, min_cases: int = MIN_CASES_TO_PROJECT):
+        self.max_cost = max_cost
+        self.max_wall_time_s = max_wall_time_s
+        self.stop_file = stop_file
+        self.min_cases = min_cases
+        self.started = time.monotonic()
+        self.spent = 0.0
+        self.finished = 0
+        self.reason: str | None = None
+        self.stopped_after: int | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_cost is not None or self.max_wall_time_s is not None
+
+    def add_cost(self, cost: float | None) -> None:
+        """Spend outside the cases themselves (e.g. scenario formatting)."""
+        self.spent += cost or 0.0
+
+    def record(self, cost: float | None, total_cases: int) -> str | None:
+        """Accounts a finished case; returns the stop reason if the budget is now exceeded."""
+        self.finished += 1
+        self.spent += cost or 0.0
+        if self.reason is None and self.enabled:
+            reason = self._exceeded(max(total_cases - self.finished, 0))
+            if reason:
+                self.stop(reason)
+        return self.reason
+
+    def projection(self, remaining: int) -> dict:
+        """Projected total cost and wall time if `remaining` more cases run at the current averages."""
+        elapsed = time.monotonic() - self.started
+        if not self.finished:
+            return {"cost": self.spent, "wall_time_s": elapsed}
+        return {
+            "cost": self.spent + self.spent / self.finished * remaining,
+            "wall_time_s": elapsed + elapsed / self.finished * remaining,
+        }
+
+    def _exceeded(self, remaining: int) -> str | None:
+        elapsed = time.monotonic() - self.started
+        if self.max_cost is not None and self.spent >= self.max_cost:
+            return f"spent ${self.spent:.2f} of --max-cost ${self.max_cost:.2f}"
+        if self.max_wall_time_s is not None and elapsed >= self.max_wall_time_s:
+            return f"ran {_fmt_duration(elapsed)} of --max-wall-time {_fmt_duration(self.max_wall_time_s)}"
+        if self.finished < self.min_cases or not remaining:
+            return None
+        projected = self.projection(remaining)
+        if self.max_cost is not None and projected["cost"] > self.max_cost:
+            return (f"projected cost ${projected['cost']:.2f} exceeds --max-cost ${self.max_cost:.2f} "
+                    f"(${self.spent:.2f} spent on {self.finished} cases, {remaining} left)")
+        if self.max_wall_time_s is not None and projected["wall_time_s"] > self.max_wall_time_s:
+            return (f"projected wall time {_fmt_duration(projected['wall_time_s'])} exceeds "
+                    f"--max-wall-time {_fmt_duration(self.max_wall_time_s)} "
+                    f"({_fmt_duration(elapsed)} for {self.finished} cases, {remaining} left)")
+        return None
+
+    def stop(self, reason: str) -> None:
+        """Stops the run: no new cases start, on this process or (via the stop file) any worker."""
+        self.reason = f"Budget exceeded: {reason}"
+        self.stopped_after = self.finished
+        if self.stop_file:
+            with open(self.stop_file, "w", encoding="utf-8") as f:
+                f.write(self.reason)
+
+    def stop_reason(self) -> str | None:
+        """Why the run stopped, or None while cases may still start."""
+        if self.reason is None and self.stop_file and os.path.exists(self.stop_file):
+            with open(self.stop_file, encoding="utf-8") as f:
+                self.reason = f.read() or "Budget exceeded"
+        return self.reason
+
+    def summary(self) -> dict | None:
+        """Limits, spend and stop reason for the results JSON, or None without a budget."""
+        if not self.enabled:
+            return None
+        return {
+            "max_cost": self.max_cost,
+            "max_wall_time_s": self.max_wall_time_s,
+            "spent": round(self.spent, 6),
+            "wall_time_s": round(time.monotonic() - self.started, 1),
+            "finished_cases": self.finished,
+            "stopped": self.reason,
+            "stopped_after": self.stopped_after,
+        }
+
+    def remove_stop_file(self) -> None:
+        if self.stop_file and os.path.exists(self.stop_file):
+            os.remove(self.stop_file)
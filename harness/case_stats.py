@@ -0,0 +1,31 @@
+"""
+Per-case counters collected by the harness layers (cassette hits, retries, ...).
+
+`start_case_stats()` binds a fresh counter dict to the current context; calls made
+while the case runs add to it via `count_case_stat`, including calls offloaded to
+threads (OffloadedCall copies the context). The test reports the counters as
+user_properties.
+"""
+
+import contextvars
+from collections import defaultdict
+
+_case_stats: contextvars.ContextVar[dict | None] = contextvars.ContextVar("case_stats", default=None)
+
+
+def start_case_stats() -> dict:
+    """Starts counting for the current case; returns the live counters."""
+    stats: dict = defaultdict(int)
+    _case_stats.set(stats)
+    return stats
+
+
+def current_case_stats() -> dict | None:
+    """The counters of the case running in this context, if any."""
+    return _case_stats.get()
+
+
+def count_case_stat(name: str, amount: float = 1) -> None:
+    stats = _case_stats.get()
+    if stats is not None:
+        stats[name] += amount
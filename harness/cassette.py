@@ -0,0 +1,168 @@
+"""
+Record/replay cassettes for litellm calls.
+
+While a cassette is installed, every `litellm.completion` / `litellm.acompletion`
+call goes through it: the agent, the scenario library's user simulator and judge,
+and the doc formatter. Calls are keyed by a hash of model + messages + params,
+and responses are stored zlib-compressed in a SQLite file indexed by that key.
+
+Modes:
+    record          always call the provider and (re)write the entry
+    replay          serve from the cassette only; a miss raises CassetteMiss
+    record-missing  serve hits from the cassette, call and record misses
+"""
+
+import hashlib
+import json
+import threading
+import time
+import zlib
+
+import litellm
+
+from harness.case_stats import count_case_stat
+from harness.interceptors import ORDER_CASSETTE, add_interceptor, remove_interceptor
+from harness.storage import cache_path, connect_sqlite
+
+CASSETTE_MODES = ("record", "replay", "record-missing")
+DEFAULT_CASSETTE_FILE = "cassettes.sqlite"
+
+# Call options that don't change the response (credentials, tracing, retry knobs)
+VOLATILE_PARAMS = frozenset({
+    "api_key", "metadata", "timeout", "num_retries", "extra_headers",
+    "litellm_logging_obj", "litellm_call_id", "litellm_trace_id",
+})
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    created REAL NOT NULL,
+    response BLOB NOT NULL
+)
+"""
+
+_installed: "Cassette | None" = None
+
+
+class CassetteMiss(RuntimeError):
+    """Raised in replay mode when a call has no recorded response."""
+
+
+def _jsonable(value):
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
+
+
+def cassette_key(kwargs: dict) -> str:
+    """Stable hash of the call's model, messages and response-affecting params."""
+    keyed = {k: v for k, v in kwargs.items() if k not in VOLATILE_PARAMS and v is not None}
+    canonical = json.dumps(keyed, sort_keys=True, separators=(",", ":"), default=_jsonable)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def default_cassette_path() -> str:
+    return cache_path(DEFAULT_CASSETTE_FILE)
+
+
+class Cassette:
+    """A SQLite-backed store of litellm responses, shared by all workers of a run."""
+
+    def __init__(self, path: str, mode: str = "record-missing"):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}; expected one of {', '.join(CASSETTE_MODES)}")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.execute(_SCHEMA)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> litellm.ModelResponse | None:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return litellm.ModelResponse(**json.loads(zlib.decompress(row[0])))
+
+    def put(self, key: str, model: str, response) -> None:
+        blob = zlib.compress(json.dumps(response.model_dump(), default=_jsonable).encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, created, response) VALUES (?, ?, ?, ?)",
+                (key, str(model), time.time(), blob),
+            )
+            self.recorded += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _lookup(self, kwargs: dict) -> tuple[str, litellm.ModelResponse | None]:
+        if kwargs.get("stream"):
+            if self.mode == "replay":
+                raise CassetteMiss(f"Streaming call to {kwargs.get('model')} cannot be replayed from a cassette")
+            return "", None
+        key = cassette_key(kwargs)
+        cached = self.get(key) if self.mode != "record" else None
+        outcome = "hits" if cached is not None else "misses"
+        setattr(self, outcome, getattr(self, outcome) + 1)
+        count_case_stat(f"cassette_{outcome}")
+        if cached is not None:
+            return key, cached
+        if self.mode == "replay":
+            raise CassetteMiss(
+                f"No cassette entry for {kwargs.get('model')} call (key {key[:12]}) in {self.path}; "
+                f"re-run with --cassette record-missing to record it"
+            )
+        return key, None
+
+    def completion(self, call, **kwargs):
+        key, cached = self._lookup(kwargs)
+        if cached is not None:
+            return cached
+        response = call(**kwargs)
+        if key:
+            self.put(key, kwargs.get("model", ""), response)
+        return response
+
+    async def acompletion(self, call, **kwargs):
+        key, cached = self._lookup(kwargs)
+        if cached is not None:
+            return cached
+        response = await call(**kwargs)
+        if key:
+            self.put(key, kwargs.get("model", ""), response)
+        return response
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+
+def install_cassette(path: str, mode: str) -> Cassette:
+    """Routes all litellm completion calls in this process through a cassette."""
+    global _installed
+    uninstall_cassette()
+    _installed = Cassette(path, mode)
+    add_interceptor(_installed, ORDER_CASSETTE)
+    return _installed
+
+
+def uninstall_cassette() -> None:
+    global _installed
+    if _installed is None:
+        return
+    remove_interceptor(_installed)
+    _installed.close()
+    _installed = None
+
+
+def installed_cassette() -> Cassette | None:
+    return _installed
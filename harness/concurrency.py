@@ -0,0 +1,179 @@
+"""
+In-worker concurrent scenario execution.
+
+Each pytest item still reports on its own, but the first item of a batch schedules
+every scenario in that batch on the worker's event loop. At most `limit` of them
+run at once; each item then awaits its own outcome. Once `stop_reason` returns a
+reason (the run's budget is spent), scenarios that haven't started yet are skipped. A batch is every item in the
+same xdist group (conftest assigns one group per worker), or the whole session
+when running without xdist.
+
+The scenario library's user simulator and judge make blocking litellm calls, so
+`OffloadedCall` moves those onto a thread pool sized to the concurrency limit.
+
+`AdaptiveLimit` bounds a sliding window of independent requests (doc formatting)
+whose best width isn't known up front: additive increase while latency stays
+flat, multiplicative decrease when the provider throttles.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable
+
+import pytest
+
+_offload_executor: ThreadPoolExecutor | None = None
+_offload_workers = 0
+
+
+def _batch_key(item: pytest.Item) -> str | None:
+    marker = item.get_closest_marker("xdist_group")
+    if marker is None:
+        return None
+    return str(marker.args[0] if marker.args else marker.kwargs.get("name", "default"))
+
+
+class ScenarioPool:
+    """Runs up to `limit` scenario coroutines at once on the running event loop."""
+
+    def __init__(self, limit: int, case_kwargs: Callable[[pytest.Item], dict], stop_reason: Callable[[], str | None] | None = None):
+        self.limit = limit
+        self.case_kwargs = case_kwargs
+        self.stop_reason = stop_reason
+        self._semaphore = asyncio.Semaphore(limit)
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._scheduled: set[str] = set()
+
+        global _offload_executor, _offload_workers
+        if _offload_executor is None or _offload_workers < limit:
+            if _offload_executor is not None:
+                # Calls already on the smaller pool finish there; it just takes no new work
+                _offload_executor.shutdown(wait=False)
+            _offload_executor = ThreadPoolExecutor(max_workers=limit, thread_name_prefix="oneday-offload")
+            _offload_workers = limit
+
+    def _batch(self, item: pytest.Item) -> list[pytest.Item]:
+        key = _batch_key(item)
+        return [
+            other for other in item.session.items
+            if _batch_key(other) == key and "test_scenario" in getattr(getattr(other, "callspec", None), "params", {})
+        ]
+
+    async def _guarded(self, runner: Callable[..., Awaitable[Any]], kwargs: dict) -> Any:
+        async with self._semaphore:
+            reason = self.stop_reason() if self.stop_reason else None
+            if reason:
+                return {"skipped": reason}
+            return await runner(**kwargs)
+
+    def _submit(self, item: pytest.Item, runner: Callable[..., Awaitable[Any]]) -> None:
+        if item.nodeid in self._scheduled:
+            return
+        self._scheduled.add(item.nodeid)
+        self._tasks[item.nodeid] = asyncio.ensure_future(self._guarded(runner, self.case_kwargs(item)))
+
+    async def run(self, item: pytest.Item, runner: Callable[..., Awaitable[Any]]) -> Any:
+        """
+        Schedules the item's whole batch (once), then waits for this item's outcome.
+        The outcome is `{"skipped": reason}` for a scenario that was stopped before it started.
+        """
+        for other in self._batch(item):
+            self._submit(other, runner)
+        self._submit(item, runner)
+        return await self._tasks.pop(item.nodeid)
+
+    async def aclose(self) -> None:
+        """Cancels scenarios that were scheduled but whose items never ran (e.g. -x stop)."""
+        pending = list(self._tasks.values())
+        self._tasks.clear()
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit for a sliding window of requests, adjusted AIMD-style.
+
+    Each completed request reports its latency: once a full window (`limit` requests)
+    completes without throttling and with the latency average within `latency_slack` of
+    the best seen so far, the limit grows by one. A throttled request (429, or retries
+    while waiting on the provider) halves it, once per burst: requests that started before
+    the last cut were sized by the old limit, so their results are ignored. Slots are taken
+    with `async with limit.slot() as epoch`, and `epoch` is passed back to `record`.
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 50, latency_slack: float = 1.5):
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.limit = min(max(initial, minimum), self.maximum)
+        self.latency_slack = latency_slack
+        self.in_flight = 0
+        self.peak = self.limit
+        self.throttled = 0
+        self._condition: asyncio.Condition | None = None
+        self._window: list[float] = []
+        self._best_latency_s: float | None = None
+        # Bumped on every cut; slots hand it out so results can be matched to the limit they ran under
+        self._epoch = 0
+
+    def _cond(self) -> asyncio.Condition:
+        # Created lazily so the limit can be built outside the loop it's used on
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        condition = self._cond()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        try:
+            yield self._epoch
+        finally:
+            async with condition:
+                self.in_flight -= 1
+                condition.notify_all()
+
+    def record(self, latency_s: float, throttled: bool = False, epoch: int | None = None) -> None:
+        """
+        Feeds back one finished request; adjusts the limit for the requests that start next.
+        `epoch` is what its slot yielded (None: it started under the current limit).
+        Waiters re-check the limit whenever a slot is released.
+        """
+        if throttled:
+            self.throttled += 1
+        if epoch is not None and epoch != self._epoch:
+            return
+        if throttled:
+            self.limit = max(self.minimum, self.limit // 2)
+            self._epoch += 1
+            self._window.clear()
+            return
+        self._window.append(latency_s)
+        if len(self._window) < self.limit:
+            return
+        average = sum(self._window) / len(self._window)
+        self._window.clear()
+        if self._best_latency_s is None or average < self._best_latency_s:
+            self._best_latency_s = average
+        if average <= self._best_latency_s * self.latency_slack and self.limit < self.maximum:
+            self.limit += 1
+            self.peak = max(self.peak, self.limit)
+
+
+class OffloadedCall:
+    """
+    Mixin for scenario agents whose `call` blocks the event loop.
+    Runs the wrapped call on its own loop in a worker thread, keeping context vars.
+    """
+
+    async def call(self, input):  # type: ignore[override]
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        coro = super().call(input)  # type: ignore[misc]
+        return await loop.run_in_executor(_offload_executor, functools.partial(ctx.run, asyncio.run, coro))
@@ -0,0 +1,140 @@
+"""
+Section index over oneday_guidelines.md with a local BM25 retriever.
+
+The guidelines are split on `##` headings into topic sections (Malaria, Typhoid,
+Heart failure, ...); `###` sub-headings stay inside their topic and are weighted
+as heading text. Retrieval returns the top-k topics for a query plus the
+always-on danger-sign sections, in document order.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import TypedDict
+
+# Sections that are always sent to the agent in retrieval mode
+ALWAYS_ON_PATTERNS = ("danger signs",)
+# Front matter that carries no clinical content
+SKIP_HEADINGS = ("table of contents", "a treatment handbook")
+
+HEADING_WEIGHT = 3
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_HEADING = re.compile(r"^(#{2,3})\s+(.*)$")
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have he her his if in is it its of on or "
+    "she that the their them then there these they this to was were what when which who will with "
+    "you your patient".split()
+)
+
+
+class Section(TypedDict):
+    """One `##` topic of the guidelines."""
+    index: int
+    heading: str
+    subheadings: list[str]
+    text: str
+
+
+def _clean_heading(heading: str) -> str:
+    return heading.replace("\\", "").strip().rstrip(":")
+
+
+def parse_sections(markdown: str) -> list[Section]:
+    """Splits the guidelines into `##` topic sections, keeping each section's raw markdown."""
+    sections: list[Section] = []
+    current: Section | None = None
+    for line in markdown.splitlines():
+        match = _HEADING.match(line)
+        if match and match.group(1) == "##":
+            current = {"index": len(sections), "heading": _clean_heading(match.group(2)), "subheadings": [], "text": line}
+            sections.append(current)
+            continue
+        if current is None:
+            continue
+        if match:
+            current["subheadings"].append(_clean_heading(match.group(2)))
+        current["text"] += "\n" + line
+
+    sections = [
+        s for s in sections
+        if not any(s["heading"].lower().startswith(skip) for skip in SKIP_HEADINGS)
+    ]
+    for i, section in enumerate(sections):
+        section["index"] = i
+        section["text"] = section["text"].strip().removesuffix("---").strip()
+    return sections
+
+
+def _stem(token: str) -> str:
+    # Plural folding is enough for this vocabulary ("signs" -> "sign", "ulcers" -> "ulcer")
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    return [_stem(t) for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS and len(t) > 1]
+
+
+class GuidelineIndex:
+    """BM25 index over guideline sections; headings count HEADING_WEIGHT times."""
+
+    def __init__(self, sections: list[Section]):
+        self.sections = sections
+        self._term_freqs: list[Counter] = []
+        for section in sections:
+            heading_tokens = tokenize(" ".join([section["heading"], *section["subheadings"]]))
+            tf = Counter(tokenize(section["text"]))
+            for token in heading_tokens:
+                tf[token] += HEADING_WEIGHT - 1
+            self._term_freqs.append(tf)
+        self._lengths = [sum(tf.values()) for tf in self._term_freqs]
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        doc_freqs: Counter = Counter()
+        for tf in self._term_freqs:
+            doc_freqs.update(tf.keys())
+        n = len(sections)
+        self._idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in doc_freqs.items()
+        }
+        self.always_on = [
+            s["index"] for s in sections
+            if any(p in s["heading"].lower() for p in ALWAYS_ON_PATTERNS)
+        ]
+
+    @classmethod
+    def from_markdown(cls, markdown: str) -> "GuidelineIndex":
+        return cls(parse_sections(markdown))
+
+    def scores(self, query: str) -> list[float]:
+        terms = tokenize(query)
+        scores = [0.0] * len(self.sections)
+        for i, tf in enumerate(self._term_freqs):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[i] / self._avg_length)
+            score = 0.0
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self._idf[term] * freq * (BM25_K1 + 1) / (freq + norm)
+            scores[i] = score
+        return scores
+
+    def search(self, query: str, k: int = 4) -> list[tuple[float, Section]]:
+        """Top-k sections by BM25 score (sections with no matching term are never returned)."""
+        scores = self.scores(query)
+        ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return [(scores[i], self.sections[i]) for i in ranked[:k] if scores[i] > 0]
+
+    def retrieve(self, query: str, k: int = 4) -> list[Section]:
+        """Top-k sections plus the always-on sections, in document order."""
+        chosen = set(self.always_on)
+        chosen.update(section["index"] for _, section in self.search(query, k))
+        return [self.sections[i] for i in sorted(chosen)]
+
+    def guidelines_for(self, query: str, k: int = 4) -> str:
+        """Guidelines text restricted to the retrieved sections."""
+        return "\n\n---\n\n".join(section["text"] for section in self.retrieve(query, k))
@@ -0,0 +1,65 @@
+"""
+Interception point for every litellm completion call in the process.
+
+Layers such as the cassette and the rate limiter register an interceptor with
+`completion(call, **kwargs)` / `acompletion(call, **kwargs)` methods, where `call`
+is the next layer down (ultimately the real litellm function). Interceptors are
+ordered outermost first: a cassette hit never reaches the rate limiter.
+
+While any interceptor is installed, `litellm.completion` and `litellm.acompletion`
+are replaced, so the agent, the scenario library's user simulator and judge, and
+the doc formatter all go through the chain.
+"""
+
+import functools
+import sys
+
+import litellm
+
+_originals = {"completion": litellm.completion, "acompletion": litellm.acompletion}
+_interceptors: list[tuple[int, object]] = []
+
+# Outermost layers have the lowest order
+ORDER_CASSETTE = 10
+ORDER_RATE_LIMIT = 20
+# Innermost: --profile times the real litellm call only
+ORDER_PROFILE = 30
+
+
+def _completion(**kwargs):
+    call = _originals["completion"]
+    for _, interceptor in reversed(_interceptors):
+        call = functools.partial(interceptor.completion, call)  # type: ignore[attr-defined]
+    return call(**kwargs)
+
+
+async def _acompletion(**kwargs):
+    call = _originals["acompletion"]
+    for _, interceptor in reversed(_interceptors):
+        call = functools.partial(interceptor.acompletion, call)  # type: ignore[attr-defined]
+    return await call(**kwargs)
+
+
+_patched = {"completion": _completion, "acompletion": _acompletion}
+
+
+def _rebind(old: dict, new: dict) -> None:
+    # Older scenario releases bind `completion` at import time; repoint those too
+    for name, module in list(sys.modules.items()):
+        if name == "litellm" or name.startswith("scenario"):
+            for attr in ("completion", "acompletion"):
+                if getattr(module, attr, None) is old[attr]:
+                    setattr(module, attr, new[attr])
+
+
+def add_interceptor(interceptor, order: int) -> None:
+    if not _interceptors:
+        _rebind(_originals, _patched)
+    _interceptors.append((order, interceptor))
+    _interceptors.sort(key=lambda entry: entry[0])
+
+
+def remove_interceptor(interceptor) -> None:
+    _interceptors[:] = [entry for entry in _interceptors if entry[1] is not interceptor]
+    if not _interceptors:
+        _rebind(_patched, _originals)
@@ -0,0 +1,177 @@
+"""
+LangWatch trace fetching and usage extraction for the results summary.
+
+`TraceFetcher` downloads traces in the background on its own event loop, over one
+pooled httpx client, with bounded concurrency and per-request timeouts. The
+controller submits a case's trace ids as soon as the case reports and collects
+everything once at session end, so the test loop never waits on LangWatch.
+Traces that are not ingested yet (404) or throttled are retried with backoff.
+With a `TraceStore`, stored traces are served locally and finished downloads
+are saved there (see harness.trace_store).
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+
+import httpx
+
+from harness.pricing import pricing_table
+from harness.ratelimit import RETRYABLE_STATUS, backoff_s, retry_after_s
+from harness.trace_store import TraceStore
+
+LANGWATCH_ENDPOINT = "https://app.langwatch.ai"
+TRACE_FETCH_CONCURRENCY = 16
+TRACE_FETCH_RETRIES = 3
+TRACE_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+# Upper bound on how long session finish waits for outstanding downloads
+TRACE_COLLECT_TIMEOUT_S = 180.0
+
+
+def empty_usage() -> dict:
+    return {
+        "prompt_tokens": 0,
+        "cached_prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cost": 0.0,
+        "agent_llm_ms": 0,
+        "judge_llm_ms": 0,
+        "user_sim_llm_ms": 0,
+        # Calls per model name with no known price (their cost is not in "cost")
+        "unpriced_models": {},
+    }
+
+
+def add_trace_usage(totals: dict, trace: dict) -> None:
+    """Adds a trace's LLM token usage, cost and per-agent LLM timing to `totals` (see empty_usage)."""
+    spans_by_id = {s["span_id"]: s for s in trace.get("spans", [])}
+
+    for span in trace.get("spans", []):
+        if span.get("type") != "llm":
+            continue
+        metrics = span.get("metrics") or {}
+        model = span.get("model", "")
+        prompt_tokens = metrics.get("prompt_tokens") or 0
+        completion_tokens = metrics.get("completion_tokens") or 0
+        # Only reported for providers/integrations that expose prompt-cache reads
+        cached_prompt_tokens = metrics.get("cache_read_input_tokens") or 0
+        totals["prompt_tokens"] += prompt_tokens
+        totals["cached_prompt_tokens"] += cached_prompt_tokens
+        totals["completion_tokens"] += completion_tokens
+        cost = pricing_table().cost(model, prompt_tokens, completion_tokens, cached_prompt_tokens)
+        if cost is None:
+            totals["unpriced_models"][model] = totals["unpriced_models"].get(model, 0) + 1
+        else:
+            totals["cost"] += cost
+
+        # Per-agent LLM timing via parent span name
+        ts = span.get("timestamps") or {}
+        started = ts.get("started_at")
+        finished = ts.get("finished_at")
+        if started and finished:
+            duration_ms = finished - started
+            parent_id = span.get("parent_id")
+            parent_name = (spans_by_id.get(parent_id) or {}).get("name", "") if parent_id else ""
+            if "UserSimulator" in parent_name:
+                totals["user_sim_llm_ms"] += duration_ms
+            elif "Judge" in parent_name:
+                totals["judge_llm_ms"] += duration_ms
+            else:
+                totals["agent_llm_ms"] += duration_ms
+
+
+def usage_from_traces(traces: list[dict | None]) -> dict:
+    """Total token usage, cost, and per-agent LLM timing over fetched traces (missing ones skipped)."""
+    totals = empty_usage()
+    for trace in traces:
+        if trace:
+            add_trace_usage(totals, trace)
+    return totals
+
+
+class TraceFetcher:
+    """Background, concurrent LangWatch trace downloader."""
+
+    def __init__(self, api_key: str, endpoint: str | None = None, concurrency: int = TRACE_FETCH_CONCURRENCY, store: TraceStore | None = None):
+        self.api_key = api_key
+        self.endpoint = (endpoint or os.getenv("LANGWATCH_ENDPOINT") or LANGWATCH_ENDPOINT).rstrip("/")
+        self.concurrency = concurrency
+        self.store = store
+        self.store_hits = 0
+        self._futures: dict[str, concurrent.futures.Future] = {}
+        self._client: httpx.AsyncClient | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="langwatch-traces", daemon=True)
+        self._thread.start()
+
+    async def _fetch(self, trace_id: str, set_id: str | None = None) -> dict | None:
+        trace = await self._download(trace_id)
+        if trace is not None and self.store is not None:
+            self.store.put(trace_id, trace, set_id)
+        return trace
+
+    async def _download(self, trace_id: str) -> dict | None:
+        # Client and semaphore belong to the fetcher's loop; created on first use there
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+                timeout=TRACE_TIMEOUT,
+                headers={"X-Auth-Token": self.api_key},
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        assert self._semaphore is not None
+        for attempt in range(TRACE_FETCH_RETRIES + 1):
+            retry_after = None
+            async with self._semaphore:
+                try:
+                    response = await self._client.get(f"{self.endpoint}/api/traces/{trace_id}")
+                except httpx.HTTPError:
+                    response = None
+                if response is not None:
+                    if response.status_code == 200:
+                        return response.json()
+                    # 404: the trace may not be ingested yet
+                    if response.status_code != 404 and response.status_code not in RETRYABLE_STATUS:
+                        return None
+                    retry_after = retry_after_s(response)
+            if attempt < TRACE_FETCH_RETRIES:
+                await asyncio.sleep(backoff_s(attempt + 1, retry_after))
+        return None
+
+    def submit(self, trace_ids: list[str], set_id: str | None = None) -> None:
+        """Starts downloading trace ids that aren't already scheduled or stored; returns immediately."""
+        for trace_id in trace_ids:
+            if trace_id in self._futures:
+                continue
+            stored = self.store.get(trace_id) if self.store is not None else None
+            if stored is not None:
+                self.store_hits += 1
+                future: concurrent.futures.Future = concurrent.futures.Future()
+                future.set_result(stored)
+                self._futures[trace_id] = future
+            else:
+                self._futures[trace_id] = asyncio.run_coroutine_threadsafe(self._fetch(trace_id, set_id), self._loop)
+
+    def collect(self, timeout: float = TRACE_COLLECT_TIMEOUT_S) -> dict[str, dict | None]:
+        """Waits (up to `timeout`) for every submitted download; failed or unfinished ones map to None."""
+        concurrent.futures.wait(list(self._futures.values()), timeout=timeout)
+        traces: dict[str, dict | None] = {}
+        for trace_id, future in self._futures.items():
+            if future.done() and not future.cancelled() and future.exception() is None:
+                traces[trace_id] = future.result()
+            else:
+                future.cancel()
+                traces[trace_id] = None
+        return traces
+
+    def close(self) -> None:
+        async def _shutdown():
+            if self._client is not None:
+                await self._client.aclose()
+
+        asyncio.run_coroutine_threadsafe(_shutdown(), self._loop).result(timeout=10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+        self._loop.close()
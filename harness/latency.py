@@ -0,0 +1,106 @@
+"""
+Mergeable latency histograms for per-call LLM timings.
+
+Values go into logarithmic buckets whose width is a fixed fraction of their
+value (DDSketch-style), so any quantile is within RELATIVE_ERROR of the true one
+while the histogram stays small however many calls it holds. Two histograms
+merge by adding bucket counts, which is how each xdist worker's histograms are
+combined on the controller. Count, min and max are exact.
+"""
+
+import math
+
+# Quantiles are accurate to within this fraction of the true value
+RELATIVE_ERROR = 0.01
+_GAMMA = (1 + RELATIVE_ERROR) / (1 - RELATIVE_ERROR)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram of non-negative values (milliseconds)."""
+
+    def __init__(self):
+        self.buckets: dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+        self.total = 0.0
+        self.min: float | None = None
+        self.max: float | None = None
+
+    def record(self, value: float) -> None:
+        value = max(value, 0.0)
+        if value == 0.0:
+            self.zero += 1
+        else:
+            index = math.ceil(math.log(value) / _LOG_GAMMA)
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero += other.zero
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Bucket midpoint, kept inside the exact observed range
+                value = 2 * _GAMMA ** index / (_GAMMA + 1)
+                return min(max(value, self.min or 0.0), self.max or value)
+        return self.max
+
+    def summary(self) -> dict | None:
+        """count/mean/p50/p90/p99/max, or None when empty."""
+        if not self.count:
+            return None
+        return {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "buckets": sorted(self.buckets.items()),
+            "zero": self.zero,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.buckets = {int(index): int(count) for index, count in data.get("buckets", [])}
+        histogram.zero = data.get("zero", 0)
+        histogram.count = data.get("count", 0)
+        histogram.total = data.get("total", 0.0)
+        histogram.min = data.get("min")
+        histogram.max = data.get("max")
+        return histogram
+
+
+def merge_histograms(into: dict[str, LatencyHistogram], snapshot: dict[str, dict]) -> None:
+    """Merges serialized histograms (to_dict form, by key) into `into`."""
+    for key, data in snapshot.items():
+        into.setdefault(key, LatencyHistogram()).merge(LatencyHistogram.from_dict(data))
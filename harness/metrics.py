@@ -0,0 +1,121 @@
+"""
+Columnar aggregation of per-case metrics.
+
+Result rows are turned into one float matrix (a column per metric, NaN where a case
+has no value) plus a group code per row. Every group is then summarised with
+vectorised NumPy reductions over all its metric columns at once: count, sum, mean,
+sample standard deviation, min/max, linearly interpolated percentiles and a
+Student-t confidence interval for the mean. This is what the end-of-run summary, the
+results JSON, the HTML report and the run history trends all report, and it stays
+fast over thousands of runs × hundreds of cases.
+
+    table = MetricTable.from_rows(rows, ["total_time", "agent_time"], group_by=["variant"])
+    table.aggregate()[("standard",)]["agent_time"]["p90"]
+"""
+
+import warnings
+from typing import Iterable, Sequence
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+
+# Two-sided 95% Student-t critical values for 1..30 degrees of freedom
+_T95 = np.array([
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+])
+
+
+def _t_critical(df: np.ndarray) -> np.ndarray:
+    """95% t critical value per degrees of freedom (NaN below 1)."""
+    df = np.asarray(df, dtype=float)
+    table = _T95[np.clip(df, 1, len(_T95)).astype(int) - 1]
+    # Beyond the table, the first-order Cornish-Fisher expansion around z=1.96
+    t = np.where(df <= len(_T95), table, 1.96 + 2.37 / np.maximum(df, 1))
+    return np.where(df >= 1, t, np.nan)
+
+
+def _summarize_block(block: np.ndarray) -> list[dict | None]:
+    """Summary per column of a (rows × metrics) block; None for a column with no values."""
+    if not block.shape[0]:
+        return [None] * block.shape[1]
+    counts = np.count_nonzero(~np.isnan(block), axis=0)
+    with warnings.catch_warnings(), np.errstate(all="ignore"):
+        # All-NaN columns and single values are expected; they're reported as None / 0 below
+        warnings.simplefilter("ignore", RuntimeWarning)
+        sums = np.nansum(block, axis=0)
+        means = sums / counts
+        stdevs = np.nan_to_num(np.nanstd(block, axis=0, ddof=1))
+        mins = np.nanmin(block, axis=0)
+        maxs = np.nanmax(block, axis=0)
+        percentiles = np.nanpercentile(block, PERCENTILES, axis=0)
+        half_widths = np.nan_to_num(_t_critical(counts - 1) * stdevs / np.sqrt(counts))
+    summaries: list[dict | None] = []
+    for column, count in enumerate(counts.tolist()):
+        if not count:
+            summaries.append(None)
+            continue
+        summary = {
+            "count": count,
+            "sum": float(sums[column]),
+            "avg": float(means[column]),
+            "stdev": float(stdevs[column]),
+            "min": float(mins[column]),
+            "max": float(maxs[column]),
+        }
+        for p, values in zip(PERCENTILES, percentiles):
+            summary[f"p{p}"] = float(values[column])
+        summary["ci95_low"] = float(means[column] - half_widths[column])
+        summary["ci95_high"] = float(means[column] + half_widths[column])
+        summaries.append(summary)
+    return summaries
+
+
+class MetricTable:
+    """Per-case metric columns (float64, NaN where missing) with a group key per row."""
+
+    def __init__(self, metrics: Sequence[str], data: np.ndarray, group_keys: list[tuple], codes: np.ndarray):
+        self.metrics = list(metrics)
+        self.data = data
+        self.group_keys = group_keys
+        self.codes = codes
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict], metrics: Sequence[str], group_by: Sequence[str] = (),
+                  keys: Iterable[tuple] | None = None) -> "MetricTable":
+        """
+        Builds the columns in one pass over `rows`; None and missing values become NaN, bools 0/1.
+        Rows are grouped by their `group_by` fields, or by `keys` (one tuple per row) when given.
+        """
+        rows = rows if isinstance(rows, list) else list(rows)
+        data = np.array([[row.get(metric) for metric in metrics] for row in rows], dtype=float).reshape(len(rows), len(metrics))
+        if keys is None:
+            keys = (tuple(row.get(field) for field in group_by) for row in rows)
+        index: dict[tuple, int] = {}
+        codes = np.fromiter((index.setdefault(key, len(index)) for key in keys), dtype=np.intp, count=len(rows))
+        return cls(metrics, data, list(index), codes)
+
+    def column(self, metric: str) -> np.ndarray:
+        return self.data[:, self.metrics.index(metric)]
+
+    def aggregate(self) -> dict[tuple, dict[str, dict | None]]:
+        """{group key: {metric: summary or None}} for every group, in first-seen order."""
+        if not self.group_keys:
+            return {}
+        order = np.argsort(self.codes, kind="stable")
+        ends = np.cumsum(np.bincount(self.codes, minlength=len(self.group_keys)))
+        data = self.data[order]
+        result = {}
+        start = 0
+        for key, end in zip(self.group_keys, ends.tolist()):
+            result[key] = dict(zip(self.metrics, _summarize_block(data[start:end])))
+            start = end
+        return result
+
+
+def summarize(values: Iterable[float | None]) -> dict | None:
+    """Summary (count, sum, avg, stdev, min, max, p50/p90/p99, ci95) of one list of values; None if empty."""
+    column = np.array(list(values), dtype=float).reshape(-1, 1)
+    return _summarize_block(column)[0]
@@ -0,0 +1,83 @@
+"""
+Per-model token pricing, resolved once per model name.
+
+Costing a span used to mean building a throwaway litellm response and calling
+`litellm.completion_cost`, with failures silently priced at $0. Here each
+distinct model name is looked up in litellm's price map once (with and without
+its provider prefix) and its input / cached-input / output per-token rates are
+memoized, so costing is a multiply. Models with no known price are counted in
+`unpriced` instead of disappearing into the totals.
+"""
+
+import threading
+from collections import Counter
+from typing import NamedTuple
+
+import litellm
+
+_shared: "PricingTable | None" = None
+
+
+class ModelRates(NamedTuple):
+    input: float
+    cached_input: float
+    output: float
+
+
+def _candidates(model: str) -> list[str]:
+    names = [model]
+    if "/" in model:
+        names.append(model.split("/", 1)[1])
+    return names
+
+
+class PricingTable:
+    """Memoized model name -> ModelRates lookup over litellm's price map."""
+
+    def __init__(self, model_cost: dict | None = None):
+        self._model_cost = model_cost if model_cost is not None else litellm.model_cost  # type: ignore[attr-defined]
+        self._rates: dict[str, ModelRates | None] = {}
+        self._lock = threading.Lock()
+        # Calls per model name that had no price
+        self.unpriced: Counter[str] = Counter()
+
+    def _resolve(self, model: str) -> ModelRates | None:
+        for name in _candidates(model):
+            entry = self._model_cost.get(name)
+            if entry is None:
+                continue
+            input_rate = entry.get("input_cost_per_token") or 0.0
+            output_rate = entry.get("output_cost_per_token") or 0.0
+            if not input_rate and not output_rate:
+                continue
+            cached_rate = entry.get("cache_read_input_token_cost")
+            return ModelRates(input_rate, input_rate if cached_rate is None else cached_rate, output_rate)
+        return None
+
+    def rates(self, model: str) -> ModelRates | None:
+        try:
+            return self._rates[model]
+        except KeyError:
+            pass
+        resolved = self._resolve(model)
+        with self._lock:
+            self._rates[model] = resolved
+        return resolved
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int, cached_prompt_tokens: int = 0) -> float | None:
+        """USD cost of one call, or None (and the model counted as unpriced) when it has no price."""
+        rates = self.rates(model)
+        if rates is None:
+            with self._lock:
+                self.unpriced[model or "(unknown)"] += 1
+            return None
+        cached = min(cached_prompt_tokens, prompt_tokens)
+        return (prompt_tokens - cached) * rates.input + cached * rates.cached_input + completion_tokens * rates.output
+
+
+def pricing_table() -> PricingTable:
+    """The process-wide pricing table."""
+    global _shared
+    if _shared is None:
+        _shared = PricingTable()
+    return _shared
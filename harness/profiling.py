@@ -0,0 +1,305 @@
+"""
+Local wall-time profiling of the harness hot paths (--profile), independent of LangWatch.
+
+`span(name)` times a block and files it under the spans open around it in the
+same context (a contextvar path, so async tasks and OffloadedCall threads nest
+correctly). Spans only record while a case profile is active; otherwise `span`
+returns a shared no-op, so the wrapped hot paths cost one contextvar read.
+
+Wrapped paths: prompt building, the agent adapter, the user simulator and judge
+turns (RoleTaggedCall), `scenario.run`, every real litellm call (an innermost
+interceptor) and Turn.io HTTP calls. Time spent waiting on the network is marked
+as such: Turn.io requests, and for litellm calls the provider wait reported by a
+litellm callback (from litellm's API-call start to the response), so the rest of
+a "litellm" span is litellm's own overhead.
+
+Each case's profile is written as collapsed stacks ("case;scenario.run;judge;litellm 1234",
+self time in microseconds), the input format of flamegraph.pl and speedscope,
+and summarised as self time per span name for the run's "harness overhead vs
+network wait" table. `StackSampler` is an optional sampling hook that records
+the stacks of one thread at a fixed interval, for time no span covers.
+"""
+
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+import litellm
+from litellm.integrations.custom_logger import CustomLogger
+
+from harness.interceptors import ORDER_PROFILE, add_interceptor, remove_interceptor
+
+LLM_API_SPAN = "llm api"
+TURN_HTTP_SPAN = "turn http"
+
+_profile: contextvars.ContextVar["CaseProfile | None"] = contextvars.ContextVar("case_profile", default=None)
+_path: contextvars.ContextVar[tuple[str, ...]] = contextvars.ContextVar("profile_path", default=())
+
+_directory: str | None = None
+_logger: "_NetworkWaitLogger | None" = None
+_interceptor: "_LitellmSpan | None" = None
+
+
+class CaseProfile:
+    """Wall time per span path for one case."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.wall_s: float | None = None
+        self.totals: dict[tuple[str, ...], float] = defaultdict(float)
+        self.network: set[tuple[str, ...]] = set()
+        self._lock = threading.Lock()
+
+    def add(self, path: tuple[str, ...], seconds: float, network: bool = False) -> None:
+        with self._lock:
+            self.totals[path] += seconds
+            if network:
+                self.network.add(path)
+
+    def finish(self) -> None:
+        self.wall_s = time.perf_counter() - self.started
+
+    def self_times(self) -> dict[tuple[str, ...], float]:
+        """Time in each span not covered by its child spans; the case itself is the empty path."""
+        with self._lock:
+            totals = dict(self.totals)
+        wall = self.wall_s if self.wall_s is not None else time.perf_counter() - self.started
+        children: dict[tuple[str, ...], float] = defaultdict(float)
+        for path, seconds in totals.items():
+            children[path[:-1]] += seconds
+        self_times = {(): max(wall - children[()], 0.0)}
+        for path, seconds in totals.items():
+            # Overlapping children (e.g. a callback reported after its span closed) can't go below zero
+            self_times[path] = max(seconds - children.get(path, 0.0), 0.0)
+        return self_times
+
+    def folded(self) -> str:
+        """Collapsed stacks with self time in microseconds, one line per span path."""
+        lines = []
+        for path, seconds in sorted(self.self_times().items()):
+            micros = round(seconds * 1_000_000)
+            if micros:
+                lines.append(f"{';'.join((self.name, *path))} {micros}")
+        return "\n".join(lines) + "\n"
+
+    def breakdown(self) -> dict:
+        """Wall, network and per-span-name self time (ms) for the case's result row."""
+        self_ms: Counter[str] = Counter()
+        network_ms = 0.0
+        for path, seconds in self.self_times().items():
+            self_ms[path[-1] if path else "case"] += seconds * 1000
+            if path in self.network:
+                network_ms += seconds * 1000
+        wall_ms = (self.wall_s or 0.0) * 1000
+        return {
+            "wall_ms": round(wall_ms, 1),
+            "network_ms": round(network_ms, 1),
+            "overhead_ms": round(max(wall_ms - network_ms, 0.0), 1),
+            "self_ms": {name: round(ms, 1) for name, ms in self_ms.most_common()},
+        }
+
+
+class _Span:
+    __slots__ = ("profile", "name", "network", "path", "token", "started")
+
+    def __init__(self, profile: CaseProfile, name: str, network: bool):
+        self.profile = profile
+        self.name = name
+        self.network = network
+
+    def __enter__(self):
+        self.path = _path.get() + (self.name,)
+        self.token = _path.set(self.path)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.add(self.path, time.perf_counter() - self.started, self.network)
+        _path.reset(self.token)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, network: bool = False):
+    """Context manager timing a block as `name` in the current case profile (no-op without one)."""
+    profile = _profile.get()
+    if profile is None:
+        return _NO_SPAN
+    return _Span(profile, name, network)
+
+
+def start_case_profile(name: str) -> CaseProfile | None:
+    """Starts profiling the case running in this context; None unless profiling is enabled."""
+    if _directory is None:
+        return None
+    profile = CaseProfile(name)
+    _profile.set(profile)
+    _path.set(())
+    return profile
+
+
+def finish_case_profile(profile: CaseProfile, filename: str) -> dict:
+    """Stops the case's profile, writes its collapsed stacks and returns its breakdown."""
+    profile.finish()
+    if _directory is not None:
+        with open(os.path.join(_directory, f"{filename}.folded"), "w", encoding="utf-8") as f:
+            f.write(profile.folded())
+    return profile.breakdown()
+
+
+class _LitellmSpan:
+    """Innermost litellm interceptor: times the real litellm call."""
+
+    def completion(self, call, **kwargs):
+        with span("litellm"):
+            return call(**kwargs)
+
+    async def acompletion(self, call, **kwargs):
+        with span("litellm"):
+            return await call(**kwargs)
+
+
+class _NetworkWaitLogger(CustomLogger):
+    """Adds each litellm call's provider wait (API-call start to response) to the calling case's profile.
+
+    Sync success callbacks run on litellm's own threads, so the case and span path are
+    captured when the call starts, keyed by litellm call id (as CallAccounting does).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._inflight: dict[str, tuple[CaseProfile, tuple[str, ...]]] = {}
+
+    @staticmethod
+    def _call_id(kwargs: dict) -> str | None:
+        return kwargs.get("litellm_call_id") or (kwargs.get("litellm_params") or {}).get("litellm_call_id")
+
+    def log_pre_api_call(self, model, messages, kwargs):
+        profile = _profile.get()
+        call_id = self._call_id(kwargs)
+        if profile is not None and call_id is not None:
+            with self._lock:
+                self._inflight[call_id] = (profile, _path.get())
+
+    def _record(self, kwargs, end_time) -> None:
+        call_id = self._call_id(kwargs)
+        with self._lock:
+            # Popped once, so a call reported by both the sync and async hooks counts once
+            entry = self._inflight.pop(call_id, None) if call_id is not None else None
+        if entry is None:
+            return
+        try:
+            seconds = (end_time - kwargs["api_call_start_time"]).total_seconds()
+        except (KeyError, TypeError, AttributeError):
+            return
+        profile, path = entry
+        profile.add(path + (LLM_API_SPAN,), max(seconds, 0.0), network=True)
+
+    def log_success_event(self, kwargs, response_obj, start_time, end_time):
+        self._record(kwargs, end_time)
+
+    def log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        self._record(kwargs, end_time)
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        self._record(kwargs, end_time)
+
+    async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        self._record(kwargs, end_time)
+
+
+def install_profiling(directory: str) -> None:
+    """Enables case profiles for this process; collapsed stacks are written to `directory`."""
+    global _directory, _logger, _interceptor
+    uninstall_profiling()
+    os.makedirs(directory, exist_ok=True)
+    _directory = directory
+    _interceptor = _LitellmSpan()
+    add_interceptor(_interceptor, ORDER_PROFILE)
+    _logger = _NetworkWaitLogger()
+    # Ahead of the accounting callback, so a settled case has its network wait recorded too
+    litellm.callbacks.insert(0, _logger)  # type: ignore[attr-defined]
+
+
+def uninstall_profiling() -> None:
+    global _directory, _logger, _interceptor
+    if _interceptor is not None:
+        remove_interceptor(_interceptor)
+    if _logger is not None:
+        for name in ("callbacks", "success_callback", "failure_callback", "_async_success_callback", "_async_failure_callback"):
+            callbacks = getattr(litellm, name, [])
+            while _logger in callbacks:
+                callbacks.remove(_logger)
+    _directory = _logger = _interceptor = None
+
+
+def profiling_directory() -> str | None:
+    return _directory
+
+
+def merge_breakdowns(breakdowns: list[dict]) -> dict | None:
+    """Run-wide totals of case breakdowns: wall, network and overhead ms plus self ms per span name."""
+    if not breakdowns:
+        return None
+    self_ms: Counter[str] = Counter()
+    for breakdown in breakdowns:
+        self_ms.update(breakdown.get("self_ms") or {})
+    return {
+        "cases": len(breakdowns),
+        "wall_ms": round(sum(b.get("wall_ms") or 0 for b in breakdowns), 1),
+        "network_ms": round(sum(b.get("network_ms") or 0 for b in breakdowns), 1),
+        "overhead_ms": round(sum(b.get("overhead_ms") or 0 for b in breakdowns), 1),
+        "self_ms": {name: round(ms, 1) for name, ms in self_ms.most_common()},
+    }
+
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval_s` into collapsed-stack counts."""
+
+    def __init__(self, interval_s: float, thread_id: int | None = None):
+        self.interval_s = interval_s
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="oneday-stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self, path: str | None = None) -> None:
+        """Stops sampling; writes the collapsed stacks (sample counts) to `path` if given."""
+        self._stop.set()
+        self._thread.join()
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in self.samples.most_common():
+                    f.write(f"{stack} {count}\n")
@@ -0,0 +1,117 @@
+"""
+Memoized, hash-versioned prompt registry.
+
+The guidelines file is read once per process and only re-read when its mtime or
+size changes. Prompts built from it are cached per guidelines content hash, so an
+edit to the guidelines invalidates every derived prompt without a restart.
+"""
+
+import hashlib
+import os
+import threading
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+
+def prompt_hash(text: str) -> str:
+    """Short, stable content hash used to version prompts in results."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+class PromptRegistry:
+    """Loads a guidelines file once and memoizes prompts built from it."""
+
+    def __init__(self, guidelines_path: str):
+        self.guidelines_path = guidelines_path
+        self._lock = threading.Lock()
+        self._stat_key: tuple[int, int] | None = None
+        self._guidelines = ""
+        self._version = ""
+        self._prompts: dict[tuple[str, str], tuple[str, str]] = {}
+        self._derived: dict[tuple[str, str], object] = {}
+
+    def _refresh(self) -> None:
+        """Re-read the guidelines file if its mtime or size changed since the last load."""
+        st = os.stat(self.guidelines_path)
+        stat_key = (st.st_mtime_ns, st.st_size)
+        if stat_key == self._stat_key:
+            return
+        with self._lock:
+            if stat_key == self._stat_key:
+                return
+            with open(self.guidelines_path, "r", encoding="utf-8") as f:
+                guidelines = f.read()
+            version = prompt_hash(guidelines)
+            if version != self._version:
+                # Content actually changed (not just touched): drop derived prompts
+                self._prompts.clear()
+                self._derived.clear()
+            self._guidelines = guidelines
+            self._version = version
+            self._stat_key = stat_key
+
+    def guidelines(self) -> str:
+        """Returns the current guidelines text."""
+        self._refresh()
+        return self._guidelines
+
+    @property
+    def version(self) -> str:
+        """Content hash of the currently loaded guidelines."""
+        self._refresh()
+        return self._version
+
+    def _entry(self, name: str, builder: Callable[[str], str]) -> tuple[str, str]:
+        self._refresh()
+        key = (name, self._version)
+        entry = self._prompts.get(key)
+        if entry is None:
+            prompt = builder(self._guidelines)
+            entry = (prompt, prompt_hash(prompt))
+            self._prompts[key] = entry
+        return entry
+
+    def build(self, name: str, builder: Callable[[str], str]) -> str:
+        """
+        Returns the prompt registered under `name`, building it with
+        `builder(guidelines)` only once per guidelines version.
+        """
+        return self._entry(name, builder)[0]
+
+    def build_hash(self, name: str, builder: Callable[[str], str]) -> str:
+        """Content hash of the prompt registered under `name`."""
+        return self._entry(name, builder)[1]
+
+    def derived(self, name: str, factory: Callable[[str], T]) -> T:
+        """Like `build`, for non-string objects derived from the guidelines (e.g. a search index)."""
+        self._refresh()
+        key = (name, self._version)
+        if key not in self._derived:
+            self._derived[key] = factory(self._guidelines)
+        return self._derived[key]  # type: ignore[return-value]
+
+
+def cached_system_message(content: str, model: str) -> dict:
+    """
+    System message laid out for provider prompt caching.
+
+    Anthropic only caches up to an explicit `cache_control` breakpoint, so the prompt
+    is sent as a content block carrying one. OpenAI and Gemini cache a repeated
+    prefix automatically; keeping the system prompt first and byte-identical is
+    all they need, so the message is left as plain text.
+    """
+    if model.startswith("anthropic/"):
+        return {
+            "role": "system",
+            "content": [{"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}],
+        }
+    return {"role": "system", "content": content}
+
+
+def prompt_cache_params(model: str, version: str) -> dict:
+    """Extra completion params that improve prefix cache hit rates for the given provider."""
+    if model.startswith("openai/"):
+        # Routes requests sharing this prefix to the same cache shard
+        return {"prompt_cache_key": f"oneday-{version}"}
+    return {}
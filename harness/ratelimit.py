@@ -0,0 +1,273 @@
+"""
+Host-wide rate limiting and retry/backoff for provider and Turn.io calls.
+
+Each provider gets a requests-per-minute and optional tokens-per-minute token
+bucket, stored in one SQLite file under ONEDAY_CACHE_DIR so every xdist worker
+(and every concurrent run) on the machine draws from the same budget. A call
+reserves its cost up front and sleeps until the bucket covers it; TPM reservations
+use a size estimate and are settled with the real usage afterwards.
+
+Transient failures (429, 5xx, connection errors, timeouts) are retried with
+full-jitter exponential backoff, waiting at least as long as any `Retry-After`.
+Calls that aren't safe to repeat pass a narrower `retryable` check (e.g.
+`is_unsent` errors only; see harness.turn).
+Time spent waiting on buckets or backoff is reported per case as `throttled_s`,
+and retries as `retries` (see harness.case_stats).
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+
+import httpx
+import litellm
+import requests
+import urllib3
+
+from harness.case_stats import count_case_stat
+from harness.interceptors import ORDER_RATE_LIMIT, add_interceptor, remove_interceptor
+from harness.storage import cache_path, connect_sqlite
+
+DEFAULT_RATE_LIMIT_FILE = "ratelimit.sqlite"
+DEFAULT_MAX_RETRIES = 4
+BACKOFF_BASE_S = 1.0
+BACKOFF_CAP_S = 60.0
+# Buckets hold this many seconds of budget, so short bursts pass without waiting
+BURST_SECONDS = 10
+# Rough prompt size estimate before the call; settled with real usage afterwards
+CHARS_PER_TOKEN = 4
+
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504, 529})
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+_installed: "RateLimiter | None" = None
+_default: "RateLimiter | None" = None
+
+
+def parse_rate_limits(specs: list[str]) -> dict[str, tuple[int, int | None]]:
+    """Parses `provider=RPM[:TPM]` specs, e.g. ["openai=500:200000", "turn=120"]."""
+    limits: dict[str, tuple[int, int | None]] = {}
+    for spec in specs:
+        provider, _, values = spec.partition("=")
+        rpm, _, tpm = values.partition(":")
+        try:
+            limits[provider.strip().lower()] = (int(rpm), int(tpm) if tpm else None)
+        except ValueError:
+            raise ValueError(f"Invalid rate limit {spec!r}; expected PROVIDER=RPM[:TPM], e.g. openai=500:200000") from None
+        if not provider.strip() or int(rpm) <= 0 or (tpm and int(tpm) <= 0):
+            raise ValueError(f"Invalid rate limit {spec!r}; provider must be named and limits must be positive")
+    return limits
+
+
+def provider_for(model: str) -> str:
+    """Provider bucket name for a litellm model id ("openai/gpt-5" -> "openai", "gpt-5" -> "openai")."""
+    if "/" in model:
+        return model.split("/", 1)[0].lower()
+    try:
+        return litellm.get_llm_provider(model)[1]
+    except Exception:
+        return "default"
+
+
+def estimate_tokens(kwargs: dict) -> int:
+    messages = json.dumps(kwargs.get("messages") or [], default=str)
+    return len(messages) // CHARS_PER_TOKEN + int(kwargs.get("max_tokens") or kwargs.get("max_completion_tokens") or 0)
+
+
+def retry_after_s(error: BaseException) -> float | None:
+    """Seconds requested by a Retry-After header on the error's response, if any."""
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (litellm.RateLimitError, litellm.APIConnectionError, litellm.Timeout, litellm.ServiceUnavailableError, litellm.InternalServerError)):
+        return True
+    if isinstance(error, (httpx.TransportError, requests.ConnectionError, requests.Timeout)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS
+
+
+def is_unsent(error: BaseException) -> bool:
+    """Connect-phase errors: the request never reached the server, so sending it again can't duplicate it."""
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, requests.ConnectTimeout)):
+        return True
+    if isinstance(error, requests.ConnectionError):
+        # requests wraps urllib3's MaxRetryError; only a failed connect means nothing was sent
+        reason = getattr(error.args[0] if error.args else None, "reason", None)
+        return isinstance(reason, urllib3.exceptions.NewConnectionError)
+    return False
+
+
+def backoff_s(attempt: int, retry_after: float | None = None) -> float:
+    """Full-jitter exponential backoff, never shorter than Retry-After."""
+    delay = random.uniform(0, min(BACKOFF_CAP_S, BACKOFF_BASE_S * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
+
+
+class RateLimiter:
+    """Shared token buckets plus the retry policy for one process."""
+
+    def __init__(self, limits: dict[str, tuple[int, int | None]], path: str, max_retries: int = DEFAULT_MAX_RETRIES):
+        self.limits = limits
+        self.path = path
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path) if limits else None
+        if self._conn is not None:
+            self._conn.execute(_SCHEMA)
+
+    def _reserve(self, name: str, per_minute: int, cost: float) -> float:
+        """Takes `cost` from a bucket (possibly into debt); returns seconds to wait for it."""
+        rate = per_minute / 60
+        capacity = max(rate * BURST_SECONDS, 1.0)
+        now = time.time()
+        with self._lock:
+            assert self._conn is not None
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                tokens -= cost
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                    (name, tokens, now),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return max(0.0, -tokens / rate)
+
+    def acquire(self, provider: str, tokens: int = 0) -> float:
+        """Reserves one request (and `tokens` of TPM) for `provider`; returns seconds to wait."""
+        limit = self.limits.get(provider)
+        if limit is None:
+            return 0.0
+        rpm, tpm = limit
+        wait = self._reserve(f"{provider}:rpm", rpm, 1)
+        if tpm and tokens:
+            wait = max(wait, self._reserve(f"{provider}:tpm", tpm, tokens))
+        return wait
+
+    def settle(self, provider: str, estimated: int, actual: int | None) -> None:
+        """Corrects a TPM reservation once the real token usage is known."""
+        limit = self.limits.get(provider)
+        if limit is None or not limit[1] or actual is None or actual == estimated:
+            return
+        self._reserve(f"{provider}:tpm", limit[1], actual - estimated)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+
+    def _throttle_wait(self, wait: float) -> float:
+        if wait > 0:
+            count_case_stat("throttled_s", wait)
+        return wait
+
+    def _retry_wait(self, attempt: int, error: BaseException, retryable=is_retryable) -> float | None:
+        """Backoff before the next attempt, or None when the error should propagate."""
+        if attempt >= self.max_retries or not retryable(error):
+            return None
+        delay = backoff_s(attempt, retry_after_s(error))
+        count_case_stat("retries")
+        count_case_stat("throttled_s", delay)
+        return delay
+
+    def call(self, provider: str, fn, tokens: int = 0, retryable=is_retryable):
+        """Runs a blocking call under the provider's limits, retrying errors that pass `retryable`."""
+        attempt = 0
+        while True:
+            time.sleep(self._throttle_wait(self.acquire(provider, tokens)))
+            try:
+                return fn()
+            except Exception as error:
+                delay = self._retry_wait(attempt, error, retryable)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+    async def acall(self, provider: str, fn, tokens: int = 0, retryable=is_retryable):
+        """Async `call`; `fn` returns an awaitable."""
+        attempt = 0
+        while True:
+            await asyncio.sleep(self._throttle_wait(self.acquire(provider, tokens)))
+            try:
+                return await fn()
+            except Exception as error:
+                delay = self._retry_wait(attempt, error, retryable)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    # litellm interceptor (see harness.interceptors)
+
+    def completion(self, call, **kwargs):
+        provider = provider_for(str(kwargs.get("model", "")))
+        tokens = estimate_tokens(kwargs)
+        response = self.call(provider, lambda: call(**kwargs), tokens)
+        self.settle(provider, tokens, _total_tokens(response))
+        return response
+
+    async def acompletion(self, call, **kwargs):
+        provider = provider_for(str(kwargs.get("model", "")))
+        tokens = estimate_tokens(kwargs)
+        response = await self.acall(provider, lambda: call(**kwargs), tokens)
+        self.settle(provider, tokens, _total_tokens(response))
+        return response
+
+
+def _total_tokens(response) -> int | None:
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
+
+def install_rate_limiter(limits: dict[str, tuple[int, int | None]], max_retries: int = DEFAULT_MAX_RETRIES, path: str | None = None) -> RateLimiter:
+    """Applies limits and retries to every litellm call (and Turn.io calls) in this process."""
+    global _installed
+    uninstall_rate_limiter()
+    _installed = RateLimiter(limits, path or cache_path(DEFAULT_RATE_LIMIT_FILE), max_retries)
+    add_interceptor(_installed, ORDER_RATE_LIMIT)
+    return _installed
+
+
+def uninstall_rate_limiter() -> None:
+    global _installed
+    if _installed is None:
+        return
+    remove_interceptor(_installed)
+    _installed.close()
+    _installed = None
+
+
+def installed_rate_limiter() -> RateLimiter | None:
+    return _installed
+
+
+def rate_limiter() -> RateLimiter:
+    """The installed limiter, or a retry-only default outside a configured test run."""
+    global _default
+    if _installed is not None:
+        return _installed
+    if _default is None:
+        _default = RateLimiter({}, "", DEFAULT_MAX_RETRIES)
+    return _default
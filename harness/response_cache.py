@@ -0,0 +1,141 @@
+"""
+Content-addressed cache for the OneDay agent's own litellm responses.
+
+Keyed by (model id, system-prompt hash, conversation hash, params): identical
+conversation prefixes, such as the greeting reply to "Hello", are answered without
+calling the provider. Two tiers:
+
+- an in-process LRU of serialized responses
+- a size-bounded SQLite file under ONEDAY_CACHE_DIR shared by all workers and runs;
+  the least recently used entries are evicted once it grows past its byte budget
+
+Hits and misses are counted per case (agent_cache_hits / agent_cache_misses).
+"""
+
+import hashlib
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import litellm
+
+from harness.case_stats import count_case_stat
+from harness.prompts import prompt_hash
+from harness.storage import cache_path, connect_sqlite
+
+DEFAULT_RESPONSE_CACHE_FILE = "agent_responses.sqlite"
+DEFAULT_MEMORY_ENTRIES = 512
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL,
+    response BLOB NOT NULL
+)
+"""
+_INDEX = "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+
+_shared: "ResponseCache | None" = None
+
+
+def _digest(value) -> str:
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), default=lambda o: o.model_dump() if hasattr(o, "model_dump") else str(o))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def response_cache_key(request: dict) -> str:
+    """Key for a completion request: model, system prompt hash, conversation hash, params."""
+    messages = list(request.get("messages") or [])
+    system = messages.pop(0) if messages and isinstance(messages[0], dict) and messages[0].get("role") == "system" else None
+    system_content = system.get("content") if system else ""
+    params = {k: v for k, v in request.items() if k not in ("model", "messages")}
+    parts = [
+        str(request.get("model", "")),
+        prompt_hash(system_content if isinstance(system_content, str) else json.dumps(system_content, sort_keys=True)),
+        _digest(messages),
+        _digest(params),
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + bounded SQLite) store of litellm responses."""
+
+    def __init__(self, path: str, memory_entries: int = DEFAULT_MEMORY_ENTRIES, max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.execute(_SCHEMA)
+        self._conn.execute(_INDEX)
+
+    def _remember(self, key: str, blob: bytes) -> None:
+        self._memory[key] = blob
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> litellm.ModelResponse | None:
+        with self._lock:
+            blob = self._memory.get(key)
+            if blob is not None:
+                self._memory.move_to_end(key)
+            else:
+                row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    blob = row[0]
+                    self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+                    self._remember(key, blob)
+            if blob is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        count_case_stat("agent_cache_misses" if blob is None else "agent_cache_hits")
+        if blob is None:
+            return None
+        return litellm.ModelResponse(**json.loads(zlib.decompress(blob)))
+
+    def put(self, key: str, response) -> None:
+        blob = zlib.compress(json.dumps(response.model_dump(), default=str).encode("utf-8"))
+        with self._lock:
+            self._remember(key, blob)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, size, accessed, response) VALUES (?, ?, ?, ?)",
+                (key, len(blob), time.time(), blob),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        # Drop least recently used entries until back under budget
+        excess = total - self.max_disk_bytes
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def agent_response_cache() -> ResponseCache:
+    """The process-wide agent response cache, opened on first use."""
+    global _shared
+    if _shared is None:
+        _shared = ResponseCache(cache_path(DEFAULT_RESPONSE_CACHE_FILE))
+    return _shared
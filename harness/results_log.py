@@ -0,0 +1,121 @@
+"""
+Append-only JSONL log of finished cases, written while the run is in progress.
+
+The controller appends one record per case as soon as it reports, so a killed
+run keeps everything that finished and external tools can tail progress live.
+Every record is flushed to the OS immediately; fsyncs are batched (every
+FSYNC_EVERY records or FSYNC_INTERVAL_S seconds, and on close) so durability
+against power loss doesn't cost a disk sync per case.
+
+    {"type": "run", "model": ..., "timestamp": ...}              first line
+    {"type": "case", "variant": ..., "key": nodeid, "row": {...}}  one per case
+
+A case may be logged again once its usage is filled in; the last record for a
+key wins. `compact_results_log` folds a log into per-variant rows (the final
+results JSON is built from it) and `partial_results` turns an unfinished log
+into the results-file shape run_all_models.load_results understands.
+"""
+
+import json
+import os
+import threading
+import time
+
+FSYNC_EVERY = 10
+FSYNC_INTERVAL_S = 2.0
+
+# Per-variant totals that partial results can recompute from the rows alone
+_SUMMED_FIELDS = {
+    "total_prompt_tokens": "prompt_tokens",
+    "total_cached_prompt_tokens": "cached_prompt_tokens",
+    "total_uncached_prompt_tokens": "uncached_prompt_tokens",
+    "total_completion_tokens": "completion_tokens",
+    "total_cost": "cost",
+    "total_agent_llm_ms": "agent_llm_ms",
+    "total_judge_llm_ms": "judge_llm_ms",
+    "total_user_sim_llm_ms": "user_sim_llm_ms",
+}
+
+
+class ResultsLog:
+    """Crash-safe JSONL writer with batched fsync."""
+
+    def __init__(self, path: str, fsync_every: int = FSYNC_EVERY, fsync_interval_s: float = FSYNC_INTERVAL_S):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval_s = fsync_interval_s
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, default=str, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval_s:
+                self._sync()
+
+    def _sync(self) -> None:
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            self._sync()
+            self._file.close()
+
+
+def read_results_log(path: str) -> list[dict]:
+    """Records of a log; a line torn by a crash mid-write is skipped."""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def compact_results_log(records: list[dict]) -> dict:
+    """{"run": header record, "variants": {variant: rows sorted by case}}, keeping each case's last record."""
+    run: dict = {}
+    latest: dict[tuple[str, str], dict] = {}
+    for record in records:
+        if record.get("type") == "run":
+            run = record
+        elif record.get("type") == "case":
+            latest[(record["variant"], record["key"])] = record
+    variants: dict[str, list[dict]] = {}
+    for (variant, _), record in latest.items():
+        variants.setdefault(variant, []).append(record["row"])
+    for rows in variants.values():
+        rows.sort(key=lambda row: row.get("case", 0))
+    return {"run": run, "variants": variants}
+
+
+def partial_results(path: str) -> dict | None:
+    """Results-file shaped dict for an unfinished run's log, or None if no case finished."""
+    compacted = compact_results_log(read_results_log(path))
+    if not compacted["variants"]:
+        return None
+    run = compacted["run"]
+    variants = {}
+    for variant, rows in compacted["variants"].items():
+        summary: dict = {"cases": rows}
+        for total, field in _SUMMED_FIELDS.items():
+            summary[total] = sum(row.get(field) or 0 for row in rows)
+        variants[variant] = summary
+    return {
+        "model": run.get("model") or os.path.splitext(os.path.basename(path))[0],
+        "timestamp": run.get("timestamp"),
+        "partial": True,
+        "variants": variants,
+    }
@@ -0,0 +1,231 @@
+"""
+Historical database of finished runs.
+
+Every run's per-case results (outcome, timings in milliseconds, token usage, cost)
+are kept in one SQLite file under ONEDAY_CACHE_DIR, so pass rate and latency can be
+compared across models, prompt versions and dates long after the run's results JSON
+and HTML report are gone. Cases are indexed on (model, variant, case, started_at)
+and on prompt hash; query_runs.py is the command-line front end.
+
+Runs are recorded from the results-JSON shape (see conftest.pytest_sessionfinish),
+so result files from earlier runs can be imported the same way. Recording a run id
+again replaces it; new runs get a unique id (`new_run_id`), and their readable
+label (`oneday-<model>-<MonDD-HHMMZ>`) is stored separately.
+"""
+
+import json
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from harness.storage import cache_path, connect_sqlite
+
+DEFAULT_RUN_HISTORY_FILE = "run_history.sqlite"
+
+# Case metrics that can be queried, all stored as integers/floats per case
+CASE_METRICS = (
+    "total_ms", "agent_ms", "agent_llm_ms", "judge_llm_ms", "user_sim_llm_ms",
+    "prompt_tokens", "cached_prompt_tokens", "completion_tokens", "cost", "retries", "throttled_s",
+)
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS runs (
+        run_id TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        started_at TEXT NOT NULL,
+        label TEXT,
+        prompt_hashes TEXT,
+        cassette TEXT,
+        partial INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS cases (
+        run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+        model TEXT NOT NULL,
+        variant TEXT NOT NULL,
+        case_num INTEGER NOT NULL,
+        started_at TEXT NOT NULL,
+        prompt_hash TEXT,
+        passed INTEGER NOT NULL,
+        failed INTEGER NOT NULL,
+        skipped INTEGER NOT NULL,
+        total_ms INTEGER,
+        agent_ms INTEGER,
+        agent_llm_ms INTEGER,
+        judge_llm_ms INTEGER,
+        user_sim_llm_ms INTEGER,
+        prompt_tokens INTEGER,
+        cached_prompt_tokens INTEGER,
+        completion_tokens INTEGER,
+        cost REAL,
+        retries INTEGER,
+        throttled_s REAL,
+        trace_id TEXT,
+        PRIMARY KEY (run_id, variant, case_num)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS runs_model_started ON runs (model, started_at)",
+    "CREATE INDEX IF NOT EXISTS runs_started ON runs (started_at)",
+    "CREATE INDEX IF NOT EXISTS cases_model_variant_case_started ON cases (model, variant, case_num, started_at)",
+    "CREATE INDEX IF NOT EXISTS cases_case_started ON cases (case_num, started_at)",
+    "CREATE INDEX IF NOT EXISTS cases_prompt_hash ON cases (prompt_hash, started_at)",
+)
+
+
+def _ms(seconds: float | None) -> int | None:
+    return None if seconds is None else round(seconds * 1000)
+
+
+def new_run_id(started_at: str) -> str:
+    """Unique id for a new run: its ISO start time plus a random suffix."""
+    return f"{started_at}-{uuid.uuid4().hex[:8]}"
+
+
+def run_id_for(results: dict) -> str:
+    """A results file's run id; older files without one get it from their model and timestamp."""
+    return results.get("run_id") or f"oneday-{results.get('model', 'unknown')}-{results.get('timestamp', 'unknown')}"
+
+
+class RunHistory:
+    """Indexed SQLite history of runs and their per-case results."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+
+    def record_run(self, results: dict, started_at: str | None = None) -> str:
+        """Stores a run given in the results-JSON shape; returns its run id."""
+        run_id = run_id_for(results)
+        started_at = results.get("started_at") or started_at or datetime.now(timezone.utc).isoformat(timespec="seconds")
+        model = results.get("model", "unknown")
+        rows = []
+        for variant, summary in results.get("variants", {}).items():
+            for case in summary.get("cases", []):
+                rows.append((
+                    run_id, model, variant, case.get("case", 0), started_at, case.get("prompt_hash"),
+                    int(bool(case.get("passed"))), int(bool(case.get("failed"))), int(bool(case.get("skipped"))),
+                    _ms(case.get("total_time")), _ms(case.get("agent_time")),
+                    case.get("agent_llm_ms"), case.get("judge_llm_ms"), case.get("user_sim_llm_ms"),
+                    case.get("prompt_tokens"), case.get("cached_prompt_tokens"), case.get("completion_tokens"),
+                    case.get("cost"), case.get("retries"), case.get("throttled_s"), case.get("trace_id"),
+                ))
+        cassette = results.get("cassette")
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+                self._conn.execute(
+                    "INSERT INTO runs (run_id, model, started_at, label, prompt_hashes, cassette, partial) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, model, started_at, results.get("label") or results.get("timestamp"), json.dumps(results.get("prompt_hashes") or []),
+                     cassette.get("mode") if isinstance(cassette, dict) else cassette, int(bool(results.get("partial")))),
+                )
+                self._conn.executemany(f"INSERT INTO cases VALUES ({', '.join('?' * 21)})", rows)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return run_id
+
+    def _recent_runs(self, model: str | None, last: int) -> list[tuple[str, str, str]]:
+        """(run_id, model, started_at) of the `last` most recent runs, oldest first."""
+        sql = "SELECT run_id, model, started_at FROM runs"
+        params: list = []
+        if model:
+            sql += " WHERE model = ?"
+            params.append(model)
+        sql += " ORDER BY started_at DESC LIMIT ?"
+        params.append(last)
+        with self._lock:
+            return list(reversed(self._conn.execute(sql, params).fetchall()))
+
+    def trend(self, model: str | None = None, variant: str | None = None, last: int = 20) -> list[dict]:
+        """Pass rate and latency (ms) per run and variant for the `last` most recent runs, oldest first."""
+        runs = self._recent_runs(model, last)
+        if not runs:
+            return []
+        placeholders = ", ".join("?" * len(runs))
+        sql = (f"SELECT run_id, variant, passed, skipped, total_ms, agent_ms, cost, prompt_hash "
+               f"FROM cases WHERE run_id IN ({placeholders})")
+        params: list = [run_id for run_id, _, _ in runs]
+        if variant:
+            sql += " AND variant = ?"
+            params.append(variant)
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            columns = [description[0] for description in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        for row in rows:
+            row["ran"] = not row["skipped"]
+        # Imported here so harness/__init__, which binds run_history eagerly, stays free of numpy
+        from harness.metrics import MetricTable
+
+        stats = MetricTable.from_rows(rows, ("passed", "ran", "total_ms", "agent_ms", "cost"), group_by=("run_id", "variant")).aggregate()
+        prompt_hashes: dict[tuple, set] = {}
+        for row in rows:
+            if row["prompt_hash"]:
+                prompt_hashes.setdefault((row["run_id"], row["variant"]), set()).add(row["prompt_hash"])
+
+        by_run: dict[str, dict[str, dict]] = {}
+        for (run_id, run_variant), metrics in stats.items():
+            by_run.setdefault(run_id, {})[run_variant] = metrics
+
+        trend = []
+        for run_id, run_model, started_at in runs:
+            for run_variant, metrics in sorted(by_run.get(run_id, {}).items()):
+                ran = metrics["ran"]["sum"]
+                passed = int(metrics["passed"]["sum"])
+                total_ms, agent_ms = metrics["total_ms"] or {}, metrics["agent_ms"] or {}
+                trend.append({
+                    "run_id": run_id,
+                    "model": run_model,
+                    "started_at": started_at,
+                    "variant": run_variant,
+                    "cases": metrics["passed"]["count"],
+                    "passed": passed,
+                    "pass_rate": passed / ran if ran else None,
+                    "total_ms_p50": total_ms.get("p50"),
+                    "total_ms_p90": total_ms.get("p90"),
+                    "total_ms_ci95": [total_ms["ci95_low"], total_ms["ci95_high"]] if total_ms else None,
+                    "agent_ms_p50": agent_ms.get("p50"),
+                    "agent_ms_p90": agent_ms.get("p90"),
+                    "cost": metrics["cost"]["sum"] if metrics["cost"] else 0.0,
+                    "prompt_hashes": sorted(prompt_hashes.get((run_id, run_variant), ())),
+                })
+        return trend
+
+    def case_history(self, case: int, metric: str = "agent_ms", variant: str | None = None,
+                     model: str | None = None, last: int = 20) -> list[dict]:
+        """One case's `metric` in each of the `last` most recent runs that ran it, oldest first."""
+        if metric not in CASE_METRICS:
+            raise ValueError(f"Unknown metric {metric!r} (expected one of {', '.join(CASE_METRICS)})")
+        sql = f"SELECT run_id, model, variant, started_at, passed, {metric} FROM cases WHERE case_num = ?"
+        params: list = [case]
+        if model:
+            sql += " AND model = ?"
+            params.append(model)
+        if variant:
+            sql += " AND variant = ?"
+            params.append(variant)
+        sql += f" AND {metric} IS NOT NULL ORDER BY started_at DESC LIMIT ?"
+        params.append(last)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {"run_id": run_id, "model": run_model, "variant": run_variant, "started_at": started_at, "passed": bool(passed), metric: value}
+            for run_id, run_model, run_variant, started_at, passed, value in reversed(rows)
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def run_history(path: str | None = None) -> RunHistory:
+    """Opens the run history (default `$ONEDAY_CACHE_DIR/run_history.sqlite`)."""
+    return RunHistory(path or cache_path(DEFAULT_RUN_HISTORY_FILE))
@@ -0,0 +1,36 @@
+"""
+Local on-disk state shared by the harness caches.
+
+Everything lives under ONEDAY_CACHE_DIR (default `.oneday_cache/` in the project).
+Stores are SQLite in WAL mode so several xdist workers can read and write the same
+file at once.
+"""
+
+import os
+import sqlite3
+
+DEFAULT_CACHE_DIR = ".oneday_cache"
+SQLITE_BUSY_TIMEOUT_MS = 30_000
+
+
+def cache_dir() -> str:
+    """Directory for harness caches, created on first use."""
+    path = os.environ.get("ONEDAY_CACHE_DIR") or DEFAULT_CACHE_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def cache_path(filename: str) -> str:
+    return os.path.join(cache_dir(), filename)
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """Opens a store that is safe to share between processes (WAL, busy timeout)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    return conn
@@ -0,0 +1,73 @@
+"""
+Streaming completion helpers that measure what a WhatsApp user feels.
+
+Each call consumes the provider stream, assembles the final response with
+`litellm.stream_chunk_builder`, and returns per-turn timings:
+
+    ttft_s        request start -> first content (or tool-call) delta
+    generation_s  request start -> last chunk
+    tokens_per_s  completion tokens over the decode phase (first -> last chunk)
+"""
+
+import time
+from typing import TypedDict
+
+import litellm
+
+
+class StreamMetrics(TypedDict):
+    ttft_s: float
+    generation_s: float
+    tokens_per_s: float | None
+
+
+def _has_output(chunk) -> bool:
+    choices = getattr(chunk, "choices", None) or []
+    if not choices:
+        return False
+    delta = getattr(choices[0], "delta", None)
+    return bool(getattr(delta, "content", None) or getattr(delta, "tool_calls", None))
+
+
+def _stream_request(request: dict) -> dict:
+    return {**request, "stream": True, "stream_options": {"include_usage": True}}
+
+
+def _finish(chunks: list, request: dict, started: float, first: float | None, last: float) -> tuple[litellm.ModelResponse, StreamMetrics]:
+    response = litellm.stream_chunk_builder(chunks, messages=request.get("messages"))
+    if response is None:
+        raise RuntimeError(f"Empty stream from {request.get('model')}")
+    first = first if first is not None else last
+    usage = getattr(response, "usage", None)
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    decode_s = last - first
+    metrics: StreamMetrics = {
+        "ttft_s": first - started,
+        "generation_s": last - started,
+        "tokens_per_s": completion_tokens / decode_s if completion_tokens and decode_s > 0 else None,
+    }
+    return response, metrics  # type: ignore[return-value]
+
+
+def stream_completion(request: dict) -> tuple[litellm.ModelResponse, StreamMetrics]:
+    """Blocking streamed completion; returns the assembled response and its timings."""
+    started = time.perf_counter()
+    first = None
+    chunks = []
+    for chunk in litellm.completion(**_stream_request(request)):
+        if first is None and _has_output(chunk):
+            first = time.perf_counter()
+        chunks.append(chunk)
+    return _finish(chunks, request, started, first, time.perf_counter())
+
+
+async def astream_completion(request: dict) -> tuple[litellm.ModelResponse, StreamMetrics]:
+    """Async streamed completion; returns the assembled response and its timings."""
+    started = time.perf_counter()
+    first = None
+    chunks = []
+    async for chunk in await litellm.acompletion(**_stream_request(request)):  # type: ignore[union-attr]
+        if first is None and _has_output(chunk):
+            first = time.perf_counter()
+        chunks.append(chunk)
+    return _finish(chunks, request, started, first, time.perf_counter())
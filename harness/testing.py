@@ -0,0 +1,52 @@
+"""
+Support for the harness unit tests.
+
+`pytest` collects the unit tests alongside the evaluation cases (testpaths = ["."]),
+so a test that installs its own cassette, rate limiter, profiling or call accounting
+must not leave the session without the ones its options installed.
+`isolated_llm_hooks` sets the session's hooks aside for the test and puts them back
+exactly as they were, without closing them.
+"""
+
+import contextlib
+
+import litellm
+
+from harness import accounting, cassette, interceptors, profiling, ratelimit
+
+# litellm copies registered callbacks into its per-event lists on first use
+CALLBACK_LISTS = ("callbacks", "success_callback", "failure_callback", "_async_success_callback", "_async_failure_callback")
+# Module state of each hook's install_*/uninstall_* pair
+_HOOK_GLOBALS = (
+    (accounting, ("_installed",)),
+    (cassette, ("_installed",)),
+    (profiling, ("_directory", "_logger", "_interceptor")),
+    (ratelimit, ("_installed",)),
+)
+
+
+@contextlib.contextmanager
+def isolated_llm_hooks():
+    """Runs the block with no harness interceptors or callbacks installed; restores the session's afterwards."""
+    saved_globals = [(module, name, getattr(module, name)) for module, names in _HOOK_GLOBALS for name in names]
+    saved_interceptors = list(interceptors._interceptors)
+    saved_callbacks = {name: list(getattr(litellm, name, [])) for name in CALLBACK_LISTS}
+    session_callbacks = [hook for hook in (accounting._installed, profiling._logger) if hook is not None]
+
+    for _, interceptor in saved_interceptors:
+        interceptors.remove_interceptor(interceptor)
+    for name, callbacks in saved_callbacks.items():
+        getattr(litellm, name, [])[:] = [callback for callback in callbacks if callback not in session_callbacks]
+    for module, name, _ in saved_globals:
+        setattr(module, name, None)
+    try:
+        yield
+    finally:
+        for _, interceptor in list(interceptors._interceptors):
+            interceptors.remove_interceptor(interceptor)
+        for order, interceptor in saved_interceptors:
+            interceptors.add_interceptor(interceptor, order)
+        for name, callbacks in saved_callbacks.items():
+            getattr(litellm, name, [])[:] = callbacks
+        for module, name, value in saved_globals:
+            setattr(module, name, value)
@@ -0,0 +1,146 @@
+"""
+Local store of downloaded LangWatch traces.
+
+Finished traces never change, so each one is downloaded once: `TraceFetcher`
+reads this store before going to the network and saves every finished trace it
+fetches. Traces are kept zlib-compressed in one SQLite file under
+ONEDAY_CACHE_DIR, indexed by trace id and scenario set id, and evicted by age and
+then least-recently-read once the file passes its byte budget.
+
+prefetch_traces.py fills the store for a whole run ahead of time.
+"""
+
+import json
+import threading
+import time
+import zlib
+
+from harness.storage import cache_path, connect_sqlite
+
+DEFAULT_TRACE_STORE_FILE = "traces.sqlite"
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS traces (
+    trace_id TEXT PRIMARY KEY,
+    set_id TEXT,
+    fetched REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL,
+    trace BLOB NOT NULL
+)
+"""
+_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS traces_set_id ON traces (set_id)",
+    "CREATE INDEX IF NOT EXISTS traces_accessed ON traces (accessed)",
+    "CREATE INDEX IF NOT EXISTS traces_fetched ON traces (fetched)",
+)
+
+_shared: "TraceStore | None" = None
+
+
+def is_finished(trace: dict) -> bool:
+    """Whether every timed span of the trace has finished (only finished traces are stored)."""
+    spans = trace.get("spans")
+    if not spans:
+        return False
+    return all(timestamps.get("finished_at") for span in spans if (timestamps := span.get("timestamps")))
+
+
+class TraceStore:
+    """Compressed, size- and age-bounded SQLite store of trace JSON."""
+
+    def __init__(self, path: str, max_age_days: float = DEFAULT_MAX_AGE_DAYS, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.execute(_SCHEMA)
+        for index in _INDEXES:
+            self._conn.execute(index)
+
+    def get(self, trace_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT trace FROM traces WHERE trace_id = ?", (trace_id,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE traces SET accessed = ? WHERE trace_id = ?", (time.time(), trace_id))
+        return json.loads(zlib.decompress(row[0]))
+
+    def get_many(self, trace_ids: list[str]) -> dict[str, dict]:
+        """Stored traces among `trace_ids`; missing ones are left out."""
+        return {trace_id: trace for trace_id in trace_ids if (trace := self.get(trace_id)) is not None}
+
+    def put(self, trace_id: str, trace: dict, set_id: str | None = None) -> bool:
+        """Stores a finished trace; returns False (and stores nothing) for one still in progress."""
+        if not is_finished(trace):
+            return False
+        blob = zlib.compress(json.dumps(trace, separators=(",", ":")).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO traces (trace_id, set_id, fetched, accessed, size, trace) "
+                "VALUES (?, COALESCE(?, (SELECT set_id FROM traces WHERE trace_id = ?)), ?, ?, ?, ?)",
+                (trace_id, set_id, trace_id, now, now, len(blob), blob),
+            )
+        return True
+
+    def trace_ids(self, set_id: str) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT trace_id FROM traces WHERE set_id = ? ORDER BY fetched", (set_id,))]
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, size, sets = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COUNT(DISTINCT set_id) FROM traces"
+            ).fetchone()
+        return {"traces": count, "bytes": size, "sets": sets}
+
+    def evict(self) -> int:
+        """Drops traces older than max_age_days, then least recently read ones over max_bytes."""
+        with self._lock:
+            cutoff = time.time() - self.max_age_days * 86400
+            removed = self._conn.execute("DELETE FROM traces WHERE fetched < ?", (cutoff,)).rowcount
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM traces").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                freed = 0
+                victims = []
+                for trace_id, size in self._conn.execute("SELECT trace_id, size FROM traces ORDER BY accessed"):
+                    victims.append((trace_id,))
+                    freed += size
+                    if freed >= excess:
+                        break
+                self._conn.executemany("DELETE FROM traces WHERE trace_id = ?", victims)
+                removed += len(victims)
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def trace_store() -> TraceStore:
+    """The process-wide trace store, opened (and trimmed) on first use."""
+    global _shared
+    if _shared is None:
+        _shared = TraceStore(cache_path(DEFAULT_TRACE_STORE_FILE))
+        _shared.evict()
+    return _shared
+
+
+def result_trace_ids(paths: list[str], set_id: str | None = None) -> dict[str, str | None]:
+    """{trace id: set id} for every case in the given result files (optionally one set only)."""
+    trace_ids: dict[str, str | None] = {}
+    for path in paths:
+        with open(path) as f:
+            data = json.load(f)
+        for variant in data.get("variants", {}).values():
+            for case in variant.get("cases", []):
+                if set_id is not None and case.get("set_id") != set_id:
+                    continue
+                for trace_id in case.get("trace_ids") or []:
+                    trace_ids[trace_id] = case.get("set_id")
+    return trace_ids
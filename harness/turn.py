@@ -0,0 +1,187 @@
+"""
+Turn.io journey simulation client.
+
+Builds simulation requests, interprets responses, and keeps pooled HTTP clients
+so keep-alive connections are reused across turns and scenarios. Both a blocking
+(requests) and an async (httpx) path are provided; they share the same contract.
+"""
+
+import asyncio
+import os
+import weakref
+
+import httpx
+import requests
+
+from harness.accounting import record_llm_latency
+from harness.profiling import TURN_HTTP_SPAN, span
+from harness.ratelimit import is_unsent, rate_limiter
+
+TURN_BASE_URL = "https://whatsapp.turn.io"
+TURN_END_MESSAGE = {"role": "assistant", "content": "<END>"}
+TURN_UNEXPECTED_INPUT = "unexpectedly received user input"
+# The only status resent to the stateful simulation endpoint (see is_turn_retryable)
+TURN_RETRYABLE_STATUS = 429
+
+# Connection pool sizing for the async client; one pool per event loop.
+TURN_MAX_CONNECTIONS = 100
+TURN_MAX_KEEPALIVE = 20
+TURN_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+
+_base_url: str | None = None
+_sync_session: requests.Session | None = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def set_turn_base_url(url: str | None) -> None:
+    """Points the client at another Turn.io-compatible server (e.g. the local stand-in)."""
+    global _base_url
+    _base_url = url.rstrip("/") if url else None
+
+
+def turn_base_url() -> str:
+    """--turn-base-url if set, else $TURN_BASE_URL, else the live Turn.io API."""
+    return _base_url or os.getenv("TURN_BASE_URL") or TURN_BASE_URL
+
+
+def turn_simulation_url(turn_uuid: str | None) -> str:
+    """Returns the simulation endpoint for a journey."""
+    return f"{turn_base_url().rstrip('/')}/v1/journeys/{turn_uuid}/simulation"
+
+
+def turn_headers() -> dict[str, str]:
+    return {
+        "Authorization": f"Bearer {os.getenv('TURN_API_KEY')}",
+        "Content-Type": "application/json",
+    }
+
+
+def turn_payload(simulation_id: str, user_input: str) -> dict:
+    return {
+        "simulation_id": f"{simulation_id}",
+        "revision": "staging",
+        "contact": {
+            "name": "Test User",
+            "language": "eng",
+        },
+        "input": user_input,
+    }
+
+
+class TurnHTTPError(RuntimeError):
+    """Turn API error response; a 429 is retried by the rate limiter first."""
+
+    def __init__(self, status_code: int, text: str, headers=None):
+        super().__init__(f"Turn API error {status_code}: {text[:500]}")
+        self.status_code = status_code
+        self.headers = headers
+
+
+def _is_journey_end(status_code: int, text: str) -> bool:
+    # Turn.io returns 500 when the journey has already ended and receives
+    # an unexpected user message (e.g. the UserSimulator sends one more
+    # turn after the agent emitted <END>). Treat this as a graceful
+    # conversation end rather than a hard failure.
+    return status_code == 500 and TURN_UNEXPECTED_INPUT in text
+
+
+def _raise_if_retryable(status_code: int, text: str, headers) -> None:
+    if status_code == TURN_RETRYABLE_STATUS:
+        raise TurnHTTPError(status_code, text, headers)
+
+
+def is_turn_retryable(error: BaseException) -> bool:
+    """
+    A simulation POST advances the conversation of its simulation_id, so it's only resent when the
+    server certainly didn't process it: a 429, or a connection that was never made. Read timeouts
+    and 5xx responses may come after the turn was applied, and resending would repeat the nurse's message.
+    """
+    return getattr(error, "status_code", None) == TURN_RETRYABLE_STATUS or is_unsent(error)
+
+
+def turn_reply(status_code: int, text: str, body: dict | None):
+    """
+    Interprets a Turn.io simulation response.
+    Returns the agent message, or an <END> message when the journey has finished.
+    """
+    if status_code >= 400:
+        if _is_journey_end(status_code, text):
+            return dict(TURN_END_MESSAGE)
+        raise TurnHTTPError(status_code, text)
+    body = body or {}
+    message = body["message"]
+    state = body.get("state")
+
+    # Turn journey ended or returned empty — treat as conversation end
+    if state == "end" or not message:
+        return dict(TURN_END_MESSAGE)
+    return message
+
+
+def get_turn_session() -> requests.Session:
+    """Shared blocking session (connection pooling for the sync fallback path)."""
+    global _sync_session
+    if _sync_session is None:
+        _sync_session = requests.Session()
+    return _sync_session
+
+
+def get_turn_async_client() -> httpx.AsyncClient:
+    """Shared async client for the running event loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=TURN_MAX_CONNECTIONS,
+                max_keepalive_connections=TURN_MAX_KEEPALIVE,
+            ),
+            timeout=TURN_TIMEOUT,
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def close_turn_async_client() -> None:
+    """Closes the async client bound to the running event loop, if any."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def post_turn_simulation(turn_uuid: str | None, simulation_id: str, user_input: str):
+    """Blocking Turn.io simulation call (rate limited; 429s and failed connects retried)."""
+    def send():
+        with span(TURN_HTTP_SPAN, network=True):
+            response = get_turn_session().post(
+                turn_simulation_url(turn_uuid),
+                headers=turn_headers(),
+                json=turn_payload(simulation_id, user_input),
+            )
+        _raise_if_retryable(response.status_code, response.text, response.headers)
+        return response
+
+    response = rate_limiter().call("turn", send, retryable=is_turn_retryable)
+    if response.ok:
+        record_llm_latency("agent", "turn", response.elapsed.total_seconds() * 1000)
+    body = response.json() if response.ok else None
+    return turn_reply(response.status_code, response.text, body)
+
+
+async def apost_turn_simulation(turn_uuid: str | None, simulation_id: str, user_input: str):
+    """Async Turn.io simulation call over the pooled client (rate limited; 429s and failed connects retried)."""
+    async def send():
+        with span(TURN_HTTP_SPAN, network=True):
+            response = await get_turn_async_client().post(
+                turn_simulation_url(turn_uuid),
+                headers=turn_headers(),
+                json=turn_payload(simulation_id, user_input),
+            )
+        _raise_if_retryable(response.status_code, response.text, response.headers)
+        return response
+
+    response = await rate_limiter().acall("turn", send, retryable=is_turn_retryable)
+    if response.status_code < 400:
+        record_llm_latency("agent", "turn", response.elapsed.total_seconds() * 1000)
+    body = response.json() if response.status_code < 400 else None
+    return turn_reply(response.status_code, response.text, body)
@@ -0,0 +1,217 @@
+"""
+Local stand-in for the Turn.io journey simulation API.
+
+Speaks the same contract as `POST /v1/journeys/{uuid}/simulation`: the request
+carries `simulation_id` and `input`; the reply is `{"message": ..., "state": ...}`,
+with `state == "end"` once the journey finishes. Any further input to an ended
+simulation gets the same 500 "unexpectedly received user input" Turn.io returns.
+
+Replies come from a canned script (a JSON list of messages, or a mapping of
+journey UUID to list) or from a litellm model, with configurable injected latency.
+Point the tests at it with `--turn-base-url`:
+
+    python -m harness.turn_standin --port 8765 --latency-ms 800 --jitter-ms 400
+    uv run pytest -n 4 --concurrency 50 --turn-uuid local --turn-base-url http://127.0.0.1:8765
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+DEFAULT_SCRIPT = [
+    "Hello, I'm the OneDay assistant. Please describe the patient: age, main complaint and how long it has lasted.",
+    "Thank you. Does the patient have any danger signs, such as convulsions, inability to drink, or lethargy?",
+    "Do you have a malaria test result, and what are the temperature and breathing rate?",
+    "Based on what you've told me, follow the OneDay guideline for this presentation and refer if any danger sign appears.",
+]
+END_TAG = "<END>"
+UNEXPECTED_INPUT_ERROR = "journey unexpectedly received user input"
+
+_PATH = re.compile(r"^/v1/journeys/(?P<uuid>[^/]+)/simulation/?$")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512  # load tests open hundreds of connections at once
+
+
+class _Simulation:
+    def __init__(self):
+        self.history: list[dict] = []
+        self.turns = 0
+        self.ended = False
+        self.lock = threading.Lock()
+
+
+def scripted_replies(script: list[str] | dict[str, list[str]]) -> Callable[[str, "_Simulation"], str | None]:
+    """Reply source that walks a canned script; returns None (journey end) when it runs out."""
+    def reply(journey_uuid: str, simulation: _Simulation) -> str | None:
+        if isinstance(script, dict):
+            lines = script.get(journey_uuid) or script.get("default") or DEFAULT_SCRIPT
+        else:
+            lines = script
+        return lines[simulation.turns] if simulation.turns < len(lines) else None
+    return reply
+
+
+def model_replies(model: str, system_prompt: str, max_turns: int) -> Callable[[str, "_Simulation"], str | None]:
+    """Reply source backed by a litellm model; the journey ends on <END> or after max_turns."""
+    import litellm
+
+    def reply(journey_uuid: str, simulation: _Simulation) -> str | None:
+        if simulation.turns >= max_turns:
+            return None
+        response = litellm.completion(
+            model=model,
+            messages=[{"role": "system", "content": system_prompt}, *simulation.history],
+        )
+        content = response.choices[0].message.content or ""  # type: ignore[union-attr]
+        return None if END_TAG in content or not content.strip() else content
+    return reply
+
+
+class TurnStandIn:
+    """Threaded HTTP server implementing the simulation endpoint."""
+
+    def __init__(self, reply: Callable[[str, _Simulation], str | None] | None = None, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0, jitter_ms: float = 0):
+        self.reply = reply or scripted_replies(DEFAULT_SCRIPT)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.requests = 0
+        self._simulations: dict[str, _Simulation] = {}
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler())
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _simulation(self, simulation_id: str) -> _Simulation:
+        with self._lock:
+            self.requests += 1
+            return self._simulations.setdefault(simulation_id, _Simulation())
+
+    def _delay(self) -> None:
+        delay_ms = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def handle(self, journey_uuid: str, payload: dict) -> tuple[int, dict | str]:
+        """Applies one user input to its simulation; returns (status, JSON body or error text)."""
+        simulation_id = payload.get("simulation_id")
+        if not simulation_id or "input" not in payload:
+            return 400, "simulation_id and input are required"
+        simulation = self._simulation(str(simulation_id))
+        with simulation.lock:
+            if simulation.ended:
+                return 500, f"Simulation error: {UNEXPECTED_INPUT_ERROR}"
+            simulation.history.append({"role": "user", "content": str(payload["input"])})
+            self._delay()
+            message = self.reply(journey_uuid, simulation)
+            simulation.turns += 1
+            if message is None:
+                simulation.ended = True
+                return 200, {"message": "", "state": "end"}
+            simulation.history.append({"role": "assistant", "content": message})
+            return 200, {"message": message, "state": "waiting"}
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the pooled clients expect
+
+            def do_POST(self):
+                match = _PATH.match(self.path)
+                if match is None:
+                    return self._send(404, "not found")
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except (ValueError, json.JSONDecodeError):
+                    return self._send(400, "invalid JSON body")
+                status, body = standin.handle(match.group("uuid"), payload)
+                self._send(status, body)
+
+            def _send(self, status: int, body):
+                data = (json.dumps(body) if isinstance(body, dict) else body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json" if isinstance(body, dict) else "text/plain")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "TurnStandIn":
+        """Serves on a background thread; returns self so callers can read base_url."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="turn-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serves on the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def _default_system_prompt() -> str:
+    from test_oneday_evaluation import oneday_system_prompt
+    return oneday_system_prompt()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Turn.io journey simulation stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--script", default=None, metavar="PATH", help="JSON list of replies, or {journey_uuid: [replies]} (default: built-in script)")
+    parser.add_argument("--model", default=None, help="litellm model id to generate replies instead of a script (e.g. openai/gpt-5-mini)")
+    parser.add_argument("--system-prompt-file", default=None, metavar="PATH", help="System prompt for --model (default: the OneDay agent prompt)")
+    parser.add_argument("--max-turns", type=int, default=10, help="End model-backed journeys after this many replies (default: 10)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Injected latency per reply in ms")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Extra uniform random latency per reply, up to this many ms")
+    args = parser.parse_args()
+
+    if args.model:
+        if args.system_prompt_file:
+            with open(args.system_prompt_file, encoding="utf-8") as f:
+                system_prompt = f.read()
+        else:
+            system_prompt = _default_system_prompt()
+        reply = model_replies(args.model, system_prompt, args.max_turns)
+        source = f"model {args.model}"
+    elif args.script:
+        with open(args.script, encoding="utf-8") as f:
+            reply = scripted_replies(json.load(f))
+        source = f"script {args.script}"
+    else:
+        reply = scripted_replies(DEFAULT_SCRIPT)
+        source = "built-in script"
+
+    standin = TurnStandIn(reply, host=args.host, port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    print(f"Turn.io stand-in on {standin.base_url} ({source}, latency {args.latency_ms:.0f}±{args.jitter_ms:.0f}ms)")
+    standin.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""
+Token usage helpers shared by the agent adapter and the conftest summary.
+"""
+
+
+def new_usage() -> dict:
+    return {"prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0}
+
+
+def cached_tokens(usage) -> int:
+    """Prompt tokens served from the provider's prompt cache (litellm normalises all providers here)."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return int(getattr(details, "cached_tokens", None) or 0)
+
+
+def add_response_usage(totals: dict, response) -> None:
+    """Adds a litellm response's token usage to `totals` (see new_usage)."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    totals["prompt_tokens"] += usage.prompt_tokens or 0
+    totals["completion_tokens"] += usage.completion_tokens or 0
+    totals["cached_prompt_tokens"] += cached_tokens(usage)
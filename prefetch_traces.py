@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Download a run's LangWatch traces into the local trace store ahead of time.
+
+Reads trace ids from result JSON files (ONEDAY_RESULTS_DIR output), optionally
+only those of one scenario set, and downloads every trace not already stored in
+parallel. Later usage computation and analysis read the store instead of the API.
+
+Usage:
+    python prefetch_traces.py results/                       # every case in the results
+    python prefetch_traces.py results/ --set oneday-gpt-5-mini-Dec03-1430Z-standard
+    python prefetch_traces.py --stats
+    python prefetch_traces.py --evict --max-age-days 7 --max-mb 256
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+from harness.langwatch import TraceFetcher
+from harness.storage import cache_path
+from harness.trace_store import DEFAULT_MAX_AGE_DAYS, DEFAULT_MAX_BYTES, DEFAULT_TRACE_STORE_FILE, TraceStore, result_trace_ids
+
+
+def _result_files(paths: list[str]) -> list[str]:
+    files = []
+    for path in paths:
+        if Path(path).is_dir():
+            files.extend(str(p) for p in sorted(Path(path).glob("*.json")))
+        else:
+            files.append(path)
+    return files
+
+
+def prefetch(store: TraceStore, results: list[str], set_id: str | None, concurrency: int) -> int:
+    """Downloads the traces of the given results into `store`; returns a process exit code."""
+    api_key = os.getenv("LANGWATCH_API_KEY")
+    if not api_key:
+        print("LANGWATCH_API_KEY is not set", file=sys.stderr)
+        return 1
+    trace_ids = result_trace_ids(_result_files(results), set_id)
+    if not trace_ids:
+        print("No trace ids found in the given results", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    fetcher = TraceFetcher(api_key, concurrency=concurrency, store=store)
+    by_set: dict[str | None, list[str]] = {}
+    for trace_id, trace_set in trace_ids.items():
+        by_set.setdefault(trace_set, []).append(trace_id)
+    for trace_set, ids in by_set.items():
+        fetcher.submit(ids, set_id=trace_set)
+    traces = fetcher.collect()
+    fetcher.close()
+
+    found = sum(1 for trace in traces.values() if trace)
+    print(f"{found}/{len(trace_ids)} traces fetched ({fetcher.store_hits} already stored) "
+          f"in {time.perf_counter() - started:.1f}s")
+    return 0 if found == len(trace_ids) else 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefetch LangWatch traces into the local trace store")
+    parser.add_argument("results", nargs="*", help="Result JSON files or directories")
+    parser.add_argument("--set", default=None, metavar="SET_ID", help="Only traces of this scenario set (the run's testrun uid)")
+    parser.add_argument("--concurrency", type=int, default=16, metavar="N", help="Parallel downloads (default: 16)")
+    parser.add_argument("--stats", action="store_true", help="Only print what the store holds")
+    parser.add_argument("--evict", action="store_true", help="Apply the age/size eviction policy")
+    parser.add_argument("--max-age-days", type=float, default=DEFAULT_MAX_AGE_DAYS, help=f"Eviction age (default: {DEFAULT_MAX_AGE_DAYS})")
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024), help="Eviction size budget in MB (default: 512)")
+    args = parser.parse_args()
+
+    if not (args.results or args.stats or args.evict):
+        parser.error("give result files/directories to prefetch, or --stats / --evict")
+
+    store = TraceStore(cache_path(DEFAULT_TRACE_STORE_FILE), args.max_age_days, int(args.max_mb * 1024 * 1024))
+    exit_code = 0
+    if args.evict:
+        print(f"Evicted {store.evict()} traces")
+    if args.results:
+        exit_code = prefetch(store, args.results, args.set, args.concurrency)
+    stats = store.stats()
+    print(f"Trace store: {stats['traces']} traces from {stats['sets']} sets, "
+          f"{stats['bytes'] / (1024 * 1024):.1f} MB  ({store.path})")
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
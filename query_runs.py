@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Query the run history: pass-rate and latency trends across models and dates.
+
+Every finished pytest run is recorded in $ONEDAY_CACHE_DIR/run_history.sqlite;
+result JSON files from older runs can be imported. Times are in milliseconds.
+
+Usage:
+    python query_runs.py trend                                   # last 20 runs, all models
+    python query_runs.py trend --model gpt-5-mini --variant standard --last 50
+    python query_runs.py case 14 --metric agent_ms --last 20     # per-run values plus p50/p90
+    python query_runs.py import results/*.json
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from harness.metrics import summarize
+from harness.run_history import CASE_METRICS, run_history
+
+
+def _fmt(value, unit: str = "ms") -> str:
+    if value is None:
+        return "-"
+    return f"{value:,.0f}{unit}"
+
+
+def show_trend(args) -> int:
+    history = run_history(args.db)
+    trend = history.trend(model=args.model, variant=args.variant, last=args.last)
+    if args.json:
+        print(json.dumps(trend, indent=2))
+        return 0
+    if not trend:
+        print("No runs recorded", file=sys.stderr)
+        return 1
+    print(f"{'started':<26}{'model':<24}{'variant':<16}{'passed':>9}{'rate':>7}"
+          f"{'total p50':>12}{'total p90':>12}{'agent p50':>12}{'agent p90':>12}{'cost':>10}  prompt")
+    for row in trend:
+        rate = f"{row['pass_rate'] * 100:.0f}%" if row["pass_rate"] is not None else "-"
+        print(f"{row['started_at']:<26}{row['model']:<24}{row['variant']:<16}"
+              f"{row['passed']:>4}/{row['cases']:<4}{rate:>7}"
+              f"{_fmt(row['total_ms_p50']):>12}{_fmt(row['total_ms_p90']):>12}"
+              f"{_fmt(row['agent_ms_p50']):>12}{_fmt(row['agent_ms_p90']):>12}"
+              f"{'$' + format(row['cost'], '.4f'):>10}  {', '.join(row['prompt_hashes'])}")
+    return 0
+
+
+def show_case(args) -> int:
+    history = run_history(args.db)
+    try:
+        rows = history.case_history(args.case, metric=args.metric, variant=args.variant, model=args.model, last=args.last)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    summary = {"case": args.case, "metric": args.metric, "runs": len(rows),
+               **(summarize(row[args.metric] for row in rows) or {})}
+    if args.json:
+        print(json.dumps({"summary": summary, "runs": rows}, indent=2))
+        return 0
+    if not rows:
+        print(f"No recorded {args.metric} for case {args.case}", file=sys.stderr)
+        return 1
+    unit = "ms" if args.metric.endswith("_ms") else ""
+    for row in rows:
+        status = "PASS" if row["passed"] else "FAIL"
+        print(f"  {row['started_at']:<26}{row['model']:<24}{row['variant']:<16}{status:<6}{_fmt(row[args.metric], unit):>12}")
+    print(f"Case {args.case} {args.metric} over the last {len(rows)} runs: "
+          f"avg={_fmt(summary['avg'], unit)} (95% CI {_fmt(summary['ci95_low'], unit)}-{_fmt(summary['ci95_high'], unit)})  "
+          f"p50={_fmt(summary['p50'], unit)}  p90={_fmt(summary['p90'], unit)}  max={_fmt(summary['max'], unit)}")
+    return 0
+
+
+def import_results(args) -> int:
+    history = run_history(args.db)
+    for path in args.files:
+        with open(path) as f:
+            results = json.load(f)
+        started_at = results.get("started_at")
+        if not started_at:
+            # Older result files only carry a year-less label; fall back to the file's mtime
+            started_at = datetime.fromtimestamp(Path(path).stat().st_mtime, timezone.utc).isoformat(timespec="seconds")
+        run_id = history.record_run(results, started_at=started_at)
+        print(f"Imported {path} as {run_id}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query pass-rate and latency trends in the run history")
+    parser.add_argument("--db", default=None, metavar="PATH", help="Run history file (default: $ONEDAY_CACHE_DIR/run_history.sqlite)")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    trend = commands.add_parser("trend", help="Pass rate and p50/p90 times per run")
+    trend.add_argument("--model", default=None, help="Only this model (run label)")
+    trend.add_argument("--variant", choices=["standard", "diagnosis_only"], default=None)
+    trend.add_argument("--last", type=int, default=20, metavar="N", help="Most recent N runs (default: 20)")
+    trend.set_defaults(handler=show_trend)
+
+    case = commands.add_parser("case", help="One case's metric across recent runs")
+    case.add_argument("case", type=int, help="Case number")
+    case.add_argument("--metric", choices=CASE_METRICS, default="agent_ms", help="Metric to show (default: agent_ms)")
+    case.add_argument("--model", default=None, help="Only this model (run label)")
+    case.add_argument("--variant", choices=["standard", "diagnosis_only"], default=None)
+    case.add_argument("--last", type=int, default=20, metavar="N", help="Most recent N runs of the case (default: 20)")
+    case.set_defaults(handler=show_case)
+
+    importer = commands.add_parser("import", help="Add results JSON files from earlier runs")
+    importer.add_argument("files", nargs="+", help="Result JSON files (ONEDAY_RESULTS_DIR output)")
+    importer.set_defaults(handler=import_results)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
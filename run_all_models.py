@@ -21,6 +21,8 @@ import webbrowser
 from datetime import datetime, timezone
 from pathlib import Path
 
+from harness import MetricTable, partial_results
+
 ALL_MODELS = [
     # "claude-opus-4-6",
     # "claude-sonnet-4-6",
@@ -33,7 +35,16 @@ ALL_MODELS = [
 PROJECT_ROOT = Path(__file__).parent
 
 
-def run_model_tests(model: str, results_dir: str, variant: str | None = None) -> int:
+def _budget_args(max_cost: float | None, max_wall_time: str | None) -> list[str]:
+    args = []
+    if max_cost is not None:
+        args += ["--max-cost", str(max_cost)]
+    if max_wall_time:
+        args += ["--max-wall-time", max_wall_time]
+    return args
+
+
+def run_model_tests(model: str, results_dir: str, variant: str | None = None, budget_args: list[str] | None = None) -> int:
     """Run pytest for a single model and return the exit code."""
     cmd = [
         sys.executable, "-m", "pytest",
@@ -43,6 +54,7 @@ def run_model_tests(model: str, results_dir: str, variant: str | None = None) ->
     ]
     if variant:
         cmd += ["-k", variant]
+    cmd += budget_args or []
 
     env = {**os.environ, "ONEDAY_RESULTS_DIR": results_dir}
 
@@ -59,7 +71,7 @@ def run_model_tests(model: str, results_dir: str, variant: str | None = None) ->
     return proc.returncode
 
 
-def run_turn_tests(turn_uuid: str, results_dir: str, max_cases: int | None = None, variant: str = "diagnosis_only") -> int:
+def run_turn_tests(turn_uuid: str, results_dir: str, max_cases: int | None = None, variant: str = "diagnosis_only", budget_args: list[str] | None = None) -> int:
     """Run pytest for a single Turn.io journey UUID and return the exit code."""
     cmd = [
         sys.executable, "-m", "pytest",
@@ -70,6 +82,7 @@ def run_turn_tests(turn_uuid: str, results_dir: str, max_cases: int | None = Non
     ]
     if max_cases is not None:
         cmd += ["--max-cases", str(max_cases)]
+    cmd += budget_args or []
 
     env = {**os.environ, "ONEDAY_RESULTS_DIR": results_dir}
 
@@ -87,9 +100,17 @@ def run_turn_tests(turn_uuid: str, results_dir: str, max_cases: int | None = Non
 
 
 def load_results(results_dir: str) -> dict:
-    """Load all JSON result files from the results directory."""
+    """Load all JSON result files from the results directory.
+
+    Runs that never finished (killed, crashed) only left their JSONL case log;
+    those are loaded as partial results. A finished run's JSON takes precedence.
+    """
     results = {}
     results_path = Path(results_dir)
+    for log_file in sorted(results_path.glob("*.jsonl")):
+        data = partial_results(str(log_file))
+        if data:
+            results[data["model"]] = data
     for json_file in sorted(results_path.glob("*.json")):
         with open(json_file) as f:
             data = json.load(f)
@@ -111,15 +132,24 @@ def generate_html_report(all_results: dict, output_path: str) -> str:
                 all_cases.add(case["case"])
     all_cases = sorted(all_cases)
 
+    # One columnar aggregation over every model's cases, grouped by (model, variant)
+    rows, keys = [], []
+    for model, data in all_results.items():
+        for variant, vdata in data.get("variants", {}).items():
+            rows.extend(vdata.get("cases", []))
+            keys.extend([(model, variant)] * len(vdata.get("cases", [])))
+    stats = MetricTable.from_rows(rows, ("passed", "failed", "total_time", "agent_time"), keys=keys).aggregate()
+
     for model, data in all_results.items():
         for variant in ["standard", "diagnosis_only"]:
             vdata = data.get("variants", {}).get(variant)
-            if not vdata:
+            if not vdata or (model, variant) not in stats:
                 continue
+            case_stats = stats[(model, variant)]
+            passed = int(case_stats["passed"]["sum"]) if case_stats["passed"] else 0
+            failed = int(case_stats["failed"]["sum"]) if case_stats["failed"] else 0
+            total = len(vdata["cases"])
             cases = vdata["cases"]
-            passed = sum(1 for c in cases if c["passed"])
-            failed = sum(1 for c in cases if c["failed"])
-            total = len(cases)
             model_summaries.append({
                 "model": model,
                 "variant": variant,
@@ -127,14 +157,17 @@ def generate_html_report(all_results: dict, output_path: str) -> str:
                 "failed": failed,
                 "total": total,
                 "pass_rate": round(passed / total * 100, 1) if total > 0 else 0,
-                "total_time_stats": vdata.get("total_time_stats"),
-                "agent_time_stats": vdata.get("agent_time_stats"),
+                # Results files that only kept the summary stats (no per-case times) still show them
+                "total_time_stats": case_stats["total_time"] or vdata.get("total_time_stats"),
+                "agent_time_stats": case_stats["agent_time"] or vdata.get("agent_time_stats"),
                 "total_prompt_tokens": vdata.get("total_prompt_tokens", 0),
+                "total_cached_prompt_tokens": vdata.get("total_cached_prompt_tokens", 0),
                 "total_completion_tokens": vdata.get("total_completion_tokens", 0),
                 "total_cost": vdata.get("total_cost", 0),
                 "total_agent_llm_ms": vdata.get("total_agent_llm_ms", 0),
                 "total_judge_llm_ms": vdata.get("total_judge_llm_ms", 0),
                 "total_user_sim_llm_ms": vdata.get("total_user_sim_llm_ms", 0),
+                "unpriced_models": vdata.get("unpriced_models") or {},
                 "cases": {c["case"]: c for c in cases},
             })
 
@@ -179,12 +212,16 @@ def _fmt_tokens(val: int | None) -> str:
 def _stat_row(label: str, stats: dict | None) -> str:
     if not stats:
         return ""
+    ci = f"{stats['ci95_low']:.1f}&ndash;{stats['ci95_high']:.1f}s" if "ci95_low" in stats else "-"
+    p50 = f"{stats['p50']:.1f}s" if "p50" in stats else "-"
     return f"""<tr>
         <td>&nbsp;&nbsp;{label}</td>
         <td>{stats['avg']:.1f}s</td>
+        <td>{ci}</td>
         <td>{stats['min']:.1f}s</td>
-        <td>{stats['max']:.1f}s</td>
+        <td>{p50}</td>
         <td>{stats['p90']:.1f}s</td>
+        <td>{stats['max']:.1f}s</td>
         <td>{stats['stdev']:.1f}s</td>
     </tr>"""
 
@@ -200,6 +237,37 @@ MODEL_DISPLAY_NAMES = {
 }
 
 
+def _fmt_ms(val: float | None) -> str:
+    return "-" if val is None else f"{val / 1000:.2f}s"
+
+
+def _latency_section(all_results: dict) -> str:
+    """Per-call LLM latency percentiles per run, role and LLM model (empty when no run has them)."""
+    rows = ""
+    for model, data in all_results.items():
+        display = MODEL_DISPLAY_NAMES.get(model, model)
+        for role, stats in (data.get("llm_latency_ms") or {}).items():
+            models = stats["models"]
+            entries = list(models.items()) if len(models) == 1 else [("all", stats["all"]), *models.items()]
+            for llm_model, s in entries:
+                if not s:
+                    continue
+                rows += f"""<tr>
+                <td>{display}</td><td>{role}</td><td>{llm_model}</td><td>{s['count']}</td>
+                <td>{_fmt_ms(s['p50'])}</td><td>{_fmt_ms(s['p90'])}</td><td>{_fmt_ms(s['p99'])}</td><td>{_fmt_ms(s['max'])}</td>
+            </tr>"""
+    if not rows:
+        return ""
+    return f"""
+        <h2>LLM Call Latency</h2>
+        <p class="meta">Individual LLM call durations across all variants, per agent role and LLM model.</p>
+        <table>
+            <thead><tr><th>Run</th><th>Role</th><th>LLM model</th><th>Calls</th><th>P50</th><th>P90</th><th>P99</th><th>Max</th></tr></thead>
+            <tbody>{rows}</tbody>
+        </table>
+        """
+
+
 def _build_html(timestamp: str, model_summaries: list, all_cases: list, all_results: dict) -> str:
     # --- Summary list per model ---
     summary_section = ""
@@ -222,6 +290,8 @@ def _build_html(timestamp: str, model_summaries: list, all_cases: list, all_resu
                 total_tokens += s["total_prompt_tokens"] + s["total_completion_tokens"]
 
         pass_rate = round(total_passed / total_cases * 100, 1) if total_cases > 0 else 0
+        if all_results[model].get("partial"):
+            display += " <small>(partial run)</small>"
         summary_section += f"<li><strong>{display}</strong> &mdash; {pass_rate}% pass rate ({total_passed}/{total_cases}), {_fmt_tokens(total_tokens)} tokens, {_fmt_cost(total_cost)} cost</li>\n"
 
     # --- Per-variant sections ---
@@ -255,7 +325,7 @@ def _build_html(timestamp: str, model_summaries: list, all_cases: list, all_resu
         timing_rows = ""
         for s in summaries_for_variant:
             display = MODEL_DISPLAY_NAMES.get(s["model"], s["model"])
-            timing_rows += f'<tr><td colspan="6"><strong>{display}</strong></td></tr>'
+            timing_rows += f'<tr><td colspan="8"><strong>{display}</strong></td></tr>'
             timing_rows += _stat_row("Total time", s["total_time_stats"])
             timing_rows += _stat_row("Agent time", s["agent_time_stats"])
 
@@ -281,12 +351,15 @@ def _build_html(timestamp: str, model_summaries: list, all_cases: list, all_resu
         for s in summaries_for_variant:
             display = MODEL_DISPLAY_NAMES.get(s["model"], s["model"])
             total_tok = s["total_prompt_tokens"] + s["total_completion_tokens"]
+            unpriced = ", ".join(f"{name} ({calls} calls)" for name, calls in s["unpriced_models"].items())
+            unpriced_note = f'<br><small title="No known price; not included in cost">unpriced: {unpriced}</small>' if unpriced else ""
             cost_rows += f"""<tr>
                 <td>{display}</td>
                 <td>{_fmt_tokens(s['total_prompt_tokens'])}</td>
+                <td>{_fmt_tokens(s['total_cached_prompt_tokens'])}</td>
                 <td>{_fmt_tokens(s['total_completion_tokens'])}</td>
                 <td>{_fmt_tokens(total_tok)}</td>
-                <td>{_fmt_cost(s['total_cost'])}</td>
+                <td>{_fmt_cost(s['total_cost'])}{unpriced_note}</td>
             </tr>"""
 
         variant_sections += f"""
@@ -301,7 +374,7 @@ def _build_html(timestamp: str, model_summaries: list, all_cases: list, all_resu
 
         <h3>Timing</h3>
         <table>
-            <thead><tr><th></th><th>Avg</th><th>Min</th><th>Max</th><th>P90</th><th>Stdev</th></tr></thead>
+            <thead><tr><th></th><th>Avg</th><th>95% CI</th><th>Min</th><th>P50</th><th>P90</th><th>Max</th><th>Stdev</th></tr></thead>
             <tbody>{timing_rows}</tbody>
         </table>
 
@@ -314,11 +387,13 @@ def _build_html(timestamp: str, model_summaries: list, all_cases: list, all_resu
 
         <h3>Tokens &amp; Cost</h3>
         <table>
-            <thead><tr><th>Model</th><th>Prompt</th><th>Completion</th><th>Total</th><th>Cost</th></tr></thead>
+            <thead><tr><th>Model</th><th>Prompt</th><th>Cached</th><th>Completion</th><th>Total</th><th>Cost</th></tr></thead>
             <tbody>{cost_rows}</tbody>
         </table>
         """
 
+    latency_section = _latency_section(all_results)
+
     return f"""<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -352,6 +427,8 @@ def _build_html(timestamp: str, model_summaries: list, all_cases: list, all_resu
 
 {variant_sections}
 
+{latency_section}
+
 <hr>
 <p class="meta">View full traces on <a href="https://app.langwatch.ai">LangWatch</a></p>
 </body>
@@ -395,6 +472,19 @@ def main():
         metavar="N",
         help="Only run the first N test cases (by case number, 1-based). Turn journey runs only.",
     )
+    parser.add_argument(
+        "--max-cost",
+        type=float,
+        default=None,
+        metavar="USD",
+        help="Per-model budget: stop starting new cases once a model's run is projected to cost more than USD",
+    )
+    parser.add_argument(
+        "--max-wall-time",
+        default=None,
+        metavar="DURATION",
+        help="Per-model budget: stop starting new cases once a model's run is projected to take longer (e.g. 900, 15m, 1.5h)",
+    )
     parser.add_argument(
         "--no-open",
         action="store_true",
@@ -403,6 +493,7 @@ def main():
     args = parser.parse_args()
 
     results_dir = tempfile.mkdtemp(prefix="oneday_results_")
+    budget_args = _budget_args(args.max_cost, args.max_wall_time)
 
     exit_codes = {}
     if args.turn_uuids:
@@ -411,13 +502,13 @@ def main():
         print(f"Results dir: {results_dir}")
         turn_variant = args.variant or "diagnosis_only"
         for uuid in args.turn_uuids:
-            exit_codes[uuid] = run_turn_tests(uuid, results_dir, args.max_cases, variant=turn_variant)
+            exit_codes[uuid] = run_turn_tests(uuid, results_dir, args.max_cases, variant=turn_variant, budget_args=budget_args)
     else:
         print(f"OneDay Cross-Model Evaluation")
         print(f"Models: {', '.join(args.models)}")
         print(f"Results dir: {results_dir}")
         for model in args.models:
-            exit_codes[model] = run_model_tests(model, results_dir, args.variant)
+            exit_codes[model] = run_model_tests(model, results_dir, args.variant, budget_args)
 
     all_results = load_results(results_dir)
 
@@ -446,6 +537,9 @@ def main():
             passed = sum(1 for c in cases if c["passed"])
             total = len(cases)
             print(f"  {display} ({variant}): {passed}/{total} passed")
+        budget = data.get("budget") or {}
+        if budget.get("stopped"):
+            print(f"  {display}: {budget['stopped']} — stopped after {budget['stopped_after']} cases")
 
     if not args.no_open:
         webbrowser.open(f"file://{os.path.abspath(output_path)}")
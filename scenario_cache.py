@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Inspect and selectively invalidate the formatted scenario cache.
+
+Cached scenarios are keyed by case text and formatter version (prompt hash, model,
+schema version; see doc_extraction.scenario_store). `report` compares the current
+doc against the cache and shows how many cases the next run would reformat, and
+why; `invalidate` removes chosen entries so they're reformatted. Invalidation
+supports --dry-run, which only reports what would be removed.
+
+Usage:
+    python scenario_cache.py report                              # dry run of the next doc_to_scenarios
+    python scenario_cache.py invalidate --case 3 --case 12       # reformat cases 3 and 12
+    python scenario_cache.py invalidate --match "malaria" --dry-run
+    python scenario_cache.py invalidate --outdated               # drop entries of other prompts/models/schemas
+    python scenario_cache.py invalidate --all
+"""
+
+import argparse
+import json
+import sys
+from collections import Counter
+
+from doc_extraction.doc_extraction import load_document, set_scenario_source
+from doc_extraction.doc_to_scenarios import clear_scenario_snapshot, formatter_version
+from doc_extraction.scenario_store import scenario_store
+
+# Why an uncached doc case would be reformatted, in report order
+REASONS = ("new text", "prompt changed", "model changed", "schema changed")
+
+
+def reformat_reason(current, stored_versions) -> str | None:
+    """None if the case is cached for `current`; else why it isn't (see REASONS)."""
+    if current in stored_versions:
+        return None
+    if not stored_versions:
+        return "new text"
+    # The closest stored version explains the miss; report its most significant change
+    changes = min((version.changes_from(current) for version in stored_versions), key=len)
+    return f"{changes[0]} changed"
+
+
+def show_report(args) -> int:
+    set_scenario_source(args.source)
+    cases = load_document()["cases"]
+    current = formatter_version()
+    store = scenario_store(current, args.db)
+    stored = store.stored_versions([case_text for _, case_text in cases])
+    reasons = {case_num: reformat_reason(current, stored[case_text]) for case_num, case_text in cases}
+    versions = store.versions()
+    store.close()
+
+    to_reformat = {case_num: reason for case_num, reason in reasons.items() if reason}
+    counts = Counter(to_reformat.values())
+    if args.json:
+        print(json.dumps({
+            "formatter": current._asdict(),
+            "cases": len(cases),
+            "cached": len(cases) - len(to_reformat),
+            "reformat": {reason: sorted(n for n, r in to_reformat.items() if r == reason) for reason in REASONS if counts[reason]},
+            "stored_versions": [{**version._asdict(), "entries": count} for version, count in versions],
+        }, indent=2))
+        return 0
+    print(f"Formatter: {current.describe()}")
+    print(f"Doc cases: {len(cases)}  cached: {len(cases) - len(to_reformat)}  would be reformatted: {len(to_reformat)}")
+    for reason in REASONS:
+        if counts[reason]:
+            numbers = sorted(n for n, r in to_reformat.items() if r == reason)
+            print(f"  {reason:<16}{counts[reason]:>5}  cases {', '.join(map(str, numbers))}")
+    if counts["new text"]:
+        print("  (with --reuse-near-duplicates, lightly edited cases may reuse their previous scenario instead)")
+    print("Stored entries by formatter version:")
+    for version, count in versions:
+        print(f"  {version.describe():<60}{count:>6}{'  (current)' if version == current else ''}")
+    return 0
+
+
+def invalidate(args) -> int:
+    if not (args.case or args.match or args.outdated or args.all):
+        print("Choose entries to invalidate: --case, --match, --outdated or --all", file=sys.stderr)
+        return 2
+    current = formatter_version()
+    store = scenario_store(current, args.db)
+    entries = store.select(case_numbers=args.case, match=args.match, outdated=args.outdated)
+    removed = 0 if args.dry_run else store.delete_keys([entry["cache_key"] for entry in entries])
+    store.close()
+    # The last run's scenario set would otherwise still be reused for an unchanged doc
+    if removed:
+        clear_scenario_snapshot()
+
+    # Only entries of the current formatter are read by the next run
+    reformatted = sorted({e["case_number"] for e in entries if e["version"] == current and e["case_number"] is not None})
+    if args.json:
+        print(json.dumps({"dry_run": args.dry_run, "matched": len(entries), "removed": removed, "reformatted_cases": reformatted}, indent=2))
+        return 0
+    if args.dry_run:
+        print(f"Would remove {len(entries)} cached scenarios")
+    else:
+        print(f"Removed {removed} cached scenarios")
+    for version, count in Counter(entry["version"] for entry in entries).most_common():
+        print(f"  {version.describe():<60}{count:>6}{'  (current)' if version == current else ''}")
+    if reformatted:
+        print(f"{len(reformatted)} cases {'would' if args.dry_run else 'will'} be reformatted on the next run: {', '.join(map(str, reformatted))}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report on and invalidate cached formatted scenarios")
+    parser.add_argument("--db", default=None, metavar="PATH", help="Scenario store (default: $ONEDAY_CACHE_DIR/scenarios.sqlite)")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser("report", help="How many doc cases the next run would reformat, and why")
+    report.add_argument("--source", default=None, help="Google Doc URL/ID or file://PATH (default: $DOC_ID)")
+    report.set_defaults(handler=show_report)
+
+    invalidator = commands.add_parser("invalidate", help="Remove cached scenarios so they're reformatted; filters combine")
+    invalidator.add_argument("--case", type=int, action="append", metavar="N", help="Case number (repeatable)")
+    invalidator.add_argument("--match", default=None, metavar="TEXT", help="Case text contains TEXT (case-insensitive)")
+    invalidator.add_argument("--outdated", action="store_true", help="Entries of other prompt/model/schema versions")
+    invalidator.add_argument("--all", action="store_true", help="Every entry")
+    invalidator.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+    invalidator.set_defaults(handler=invalidate)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import asyncio
+
+import litellm
+import pytest
+
+from harness.accounting import (
+    install_call_accounting,
+    installed_call_accounting,
+    llm_role,
+    settle_case_accounting,
+    uninstall_call_accounting,
+    usage_by_role,
+)
+from harness.case_stats import start_case_stats
+from harness.testing import isolated_llm_hooks
+
+REQUEST = {
+    "model": "gpt-4o",
+    "messages": [{"role": "user", "content": "Hello"}],
+    "mock_response": "Hello nurse, please describe the patient.",
+}
+
+
+@pytest.fixture
+def accounting():
+    # Without the session's cassette, rate limiter, profiling and accounting, which are restored afterwards
+    with isolated_llm_hooks():
+        installed = install_call_accounting()
+        yield installed
+        uninstall_call_accounting()
+
+
+def test_calls_are_accounted_per_role(accounting):
+    async def case():
+        stats = start_case_stats()
+        with llm_role("agent"):
+            await litellm.acompletion(**REQUEST)
+        with llm_role("judge"):
+            await asyncio.to_thread(litellm.completion, **REQUEST)
+            await asyncio.to_thread(litellm.completion, **REQUEST)
+        await settle_case_accounting(stats)
+        return stats
+
+    stats = asyncio.run(case())
+
+    usage = usage_by_role(stats)
+    assert set(usage) == {"agent", "judge"}
+    assert stats["agent_llm_calls"] == 1
+    assert stats["judge_llm_calls"] == 2
+    assert usage["judge"]["prompt_tokens"] == 2 * usage["agent"]["prompt_tokens"] > 0
+    assert usage["agent"]["cost"] > 0
+    assert accounting.totals["judge"]["llm_calls"] == 2
+    assert accounting.latency["judge|gpt-4o"].count == 2
+
+
+def test_failures_are_counted_without_usage(accounting):
+    async def case():
+        stats = start_case_stats()
+        with llm_role("user_sim"), pytest.raises(Exception):
+            await litellm.acompletion(**{**REQUEST, "mock_response": Exception("boom")})
+        await settle_case_accounting(stats)
+        return stats
+
+    stats = asyncio.run(case())
+
+    assert stats["user_sim_llm_failures"] == 1
+    assert stats.get("user_sim_prompt_tokens", 0) == 0
+
+
+def test_usage_by_role_ignores_other_counters():
+    assert usage_by_role({"cassette_hits": 3, "retries": 1}) == {}
+
+
+def test_session_accounting_is_restored_after_a_unit_test():
+    with isolated_llm_hooks():
+        session = install_call_accounting()
+        with isolated_llm_hooks():
+            assert installed_call_accounting() is None
+            install_call_accounting()
+            uninstall_call_accounting()
+        assert installed_call_accounting() is session
+
+        async def case():
+            stats = start_case_stats()
+            with llm_role("judge"):
+                await litellm.acompletion(**REQUEST)
+            await settle_case_accounting(stats)
+            return stats
+
+        stats = asyncio.run(case())
+        uninstall_call_accounting()
+
+    assert stats["judge_llm_calls"] == 1
+    assert session.totals["judge"]["llm_calls"] == 1
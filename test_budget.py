@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import pytest
+
+import conftest
+from harness.budget import RunBudget, parse_duration
+
+
+def test_parse_duration():
+    assert parse_duration("900") == 900
+    assert parse_duration("15m") == 900
+    assert parse_duration("1.5h") == 5400
+    with pytest.raises(ValueError):
+        parse_duration("soon")
+
+
+def test_cost_projection_stops_the_run(tmp_path):
+    stop_file = str(tmp_path / "stop")
+    budget = RunBudget(max_cost=1.0, stop_file=stop_file)
+
+    # Two cases are too few to project from, even though 100 more at $0.05 would overspend
+    assert budget.record(0.05, total_cases=102) is None
+    assert budget.record(0.05, total_cases=102) is None
+    reason = budget.record(0.05, total_cases=102)
+
+    assert reason.startswith("Budget exceeded: projected cost $5.10")
+    assert budget.stopped_after == 3
+    worker = RunBudget(stop_file=stop_file)
+    assert worker.stop_reason() == reason
+
+
+def test_within_budget_keeps_running():
+    budget = RunBudget(max_cost=1.0)
+    for _ in range(5):
+        assert budget.record(0.05, total_cases=10) is None
+    assert budget.summary()["spent"] == pytest.approx(0.25)
+    assert budget.summary()["stopped"] is None
+
+
+def test_spend_outside_cases_counts():
+    budget = RunBudget(max_cost=1.0)
+    budget.add_cost(0.99)
+    assert budget.record(0.02, total_cases=10).startswith("Budget exceeded: spent $1.01")
+
+
+def test_wall_time_projection(monkeypatch):
+    clock = iter([0.0, 60.0, 120.0, 180.0, 180.0, 180.0])
+    monkeypatch.setattr("harness.budget.time.monotonic", lambda: next(clock))
+    budget = RunBudget(max_wall_time_s=300)
+
+    assert budget.record(None, total_cases=10) is None
+    assert budget.record(None, total_cases=10) is None
+    assert "projected wall time 10m" in budget.record(None, total_cases=10)
+
+
+def test_no_budget_never_stops():
+    budget = RunBudget()
+    assert budget.record(100.0, total_cases=2) is None
+    assert budget.summary() is None
+
+
+def test_budget_projects_over_the_selected_evaluation_cases_only(monkeypatch):
+    monkeypatch.setattr(conftest, "_total_count", 0)
+    case = SimpleNamespace(callspec=SimpleNamespace(params={"test_scenario": {"case_number": 1}}))
+    unit_test = SimpleNamespace()
+    # session.items is what's left after -k/-m deselection
+    conftest.pytest_collection_finish(SimpleNamespace(items=[case, unit_test, case]))
+    assert conftest._total_count == 2
+
+    # Under xdist the controller only sees a worker's node ids
+    conftest.pytest_xdist_node_collection_finished(None, [
+        "test_oneday_evaluation.py::test_oneday_agent_standard[case_3]",
+        "test_oneday_evaluation.py::test_oneday_agent_diagnosis_only[case_12]@oneday-1",
+        "test_budget.py::test_parse_duration",
+        "test_doc_to_scenarios_cache.py::test_invalidated_entries_of_an_unchanged_doc_are_reformatted[store]",
+    ])
+    assert conftest._total_count == 2
@@ -0,0 +1,72 @@
+import asyncio
+
+import litellm
+import pytest
+
+from harness.case_stats import start_case_stats
+from harness.cassette import CassetteMiss, cassette_key, install_cassette, installed_cassette, uninstall_cassette
+from harness.testing import isolated_llm_hooks
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+
+@pytest.fixture(autouse=True)
+def _uninstall():
+    # The session's --cassette is set aside, and back in place for the evaluation cases afterwards
+    with isolated_llm_hooks():
+        yield
+        uninstall_cassette()
+
+
+def test_cassette_key_ignores_volatile_params():
+    base = cassette_key({"model": "gpt-5", "messages": MESSAGES})
+    assert cassette_key({"model": "gpt-5", "messages": MESSAGES, "metadata": {"trace": 1}, "api_key": "x"}) == base
+    assert cassette_key({"model": "gpt-5", "messages": MESSAGES, "temperature": 0.2}) != base
+    assert cassette_key({"model": "gpt-5-mini", "messages": MESSAGES}) != base
+
+
+def test_record_then_replay_offline(tmp_path):
+    path = str(tmp_path / "cassette.sqlite")
+
+    install_cassette(path, "record")
+    recorded = litellm.completion(model="gpt-4o", messages=MESSAGES, mock_response="Hi nurse")
+    uninstall_cassette()
+
+    cassette = install_cassette(path, "replay")
+    stats = start_case_stats()
+    replayed = litellm.completion(model="gpt-4o", messages=MESSAGES, mock_response="Hi nurse")
+    assert replayed.id == recorded.id
+    assert replayed.choices[0].message.content == "Hi nurse"
+    assert replayed.usage.prompt_tokens == recorded.usage.prompt_tokens
+    assert dict(stats) == {"cassette_hits": 1}
+    assert cassette.recorded == 0
+
+    with pytest.raises(CassetteMiss):
+        litellm.completion(model="gpt-4o", messages=[{"role": "user", "content": "Other"}], mock_response="x")
+    assert cassette.misses == 1
+
+
+def test_record_missing_records_async_calls_once(tmp_path):
+    cassette = install_cassette(str(tmp_path / "cassette.sqlite"), "record-missing")
+
+    async def call():
+        response = await litellm.acompletion(model="gpt-4o", messages=MESSAGES, mock_response="Hi nurse")
+        return response.choices[0].message.content
+
+    assert asyncio.run(call()) == "Hi nurse"
+    assert asyncio.run(call()) == "Hi nurse"
+    assert (cassette.hits, cassette.misses, cassette.recorded) == (1, 1, 1)
+    assert len(cassette) == 1
+
+
+def test_session_cassette_is_restored_after_a_unit_test(tmp_path):
+    # Stands in for an evaluation session's --cassette around a unit test like the ones above
+    session = install_cassette(str(tmp_path / "session.sqlite"), "record")
+    with isolated_llm_hooks():
+        assert installed_cassette() is None
+        install_cassette(str(tmp_path / "unit.sqlite"), "replay")
+        uninstall_cassette()
+
+    assert installed_cassette() is session
+    litellm.completion(model="gpt-4o", messages=MESSAGES, mock_response="Hi nurse")
+    assert session.recorded == 1
@@ -0,0 +1,216 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import conftest
+import harness.concurrency as concurrency
+from harness.concurrency import AdaptiveLimit, ScenarioPool
+
+
+class FakeItem:
+    """Just enough of a pytest item for ScenarioPool and the xdist_group assignment."""
+
+    def __init__(self, session, nodeid, group=None, scenario=True):
+        self.session = session
+        self.nodeid = nodeid
+        self.callspec = SimpleNamespace(params={"test_scenario": nodeid} if scenario else {})
+        self.markers = [pytest.mark.xdist_group(group).mark] if group else []
+
+    def get_closest_marker(self, name):
+        return next((marker for marker in self.markers if marker.name == name), None)
+
+    def add_marker(self, marker):
+        self.markers.append(marker.mark)
+
+
+def make_items(groups):
+    session = SimpleNamespace(items=[])
+    session.items = [FakeItem(session, f"case_{n}", group) for n, group in enumerate(groups)]
+    return session.items
+
+
+def test_first_item_schedules_its_whole_batch():
+    items = make_items(["a", "a", "b"])
+    started = []
+
+    async def runner(name):
+        started.append(name)
+        await asyncio.sleep(0)
+        return name
+
+    async def run():
+        pool = ScenarioPool(2, lambda item: {"name": item.nodeid})
+        first = await pool.run(items[0], runner)
+        # The other "a" item already ran; group "b" waits for its own item
+        await asyncio.sleep(0.01)
+        scheduled = list(started)
+        second = await pool.run(items[1], runner)
+        third = await pool.run(items[2], runner)
+        return first, scheduled, second, third
+
+    first, scheduled, second, third = asyncio.run(run())
+    assert (first, second, third) == ("case_0", "case_1", "case_2")
+    assert scheduled == ["case_0", "case_1"]
+    assert started == ["case_0", "case_1", "case_2"]
+
+
+def test_pool_runs_at_most_limit_scenarios_at_once():
+    items = make_items([None] * 6)
+    in_flight = peak = 0
+
+    async def runner(name):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return name
+
+    async def run():
+        pool = ScenarioPool(2, lambda item: {"name": item.nodeid})
+        return [await pool.run(item, runner) for item in items]
+
+    assert asyncio.run(run()) == [item.nodeid for item in items]
+    assert peak == 2
+
+
+def test_stopped_pool_skips_scenarios_that_have_not_started():
+    items = make_items([None] * 3)
+    reason = None
+
+    async def runner(name):
+        nonlocal reason
+        reason = "budget spent"
+        return name
+
+    async def run():
+        pool = ScenarioPool(1, lambda item: {"name": item.nodeid}, stop_reason=lambda: reason)
+        return [await pool.run(item, runner) for item in items]
+
+    assert asyncio.run(run()) == ["case_0", {"skipped": "budget spent"}, {"skipped": "budget spent"}]
+
+
+def test_aclose_cancels_scenarios_whose_items_never_ran():
+    items = make_items([None] * 3)
+    cancelled = []
+
+    async def runner(name):
+        try:
+            await asyncio.sleep(0 if name == "case_0" else 10)
+        except asyncio.CancelledError:
+            cancelled.append(name)
+            raise
+        return name
+
+    async def run():
+        pool = ScenarioPool(3, lambda item: {"name": item.nodeid})
+        assert await pool.run(items[0], runner) == "case_0"
+        await pool.aclose()
+
+    asyncio.run(run())
+    assert sorted(cancelled) == ["case_1", "case_2"]
+
+
+def test_growing_the_pool_shuts_down_the_old_executor(monkeypatch):
+    monkeypatch.setattr(concurrency, "_offload_executor", None)
+    monkeypatch.setattr(concurrency, "_offload_workers", 0)
+
+    ScenarioPool(2, dict)
+    small = concurrency._offload_executor
+    ScenarioPool(2, dict)
+    assert concurrency._offload_executor is small
+    ScenarioPool(4, dict)
+
+    assert concurrency._offload_executor is not small
+    with pytest.raises(RuntimeError):
+        small.submit(print)
+    concurrency._offload_executor.shutdown()
+
+
+def test_concurrent_workers_get_one_xdist_group_each():
+    items = make_items([None] * 5)
+    config = SimpleNamespace(getoption=lambda name: 3, workerinput={"workercount": "2"})
+
+    conftest.pytest_collection_modifyitems(config, items)
+
+    assert [item.get_closest_marker("xdist_group").args[0] for item in items] == [
+        "oneday-0", "oneday-1", "oneday-0", "oneday-1", "oneday-0",
+    ]
+
+
+def test_limit_grows_while_latency_is_flat():
+    limit = AdaptiveLimit(2, maximum=4)
+    for _ in range(2):
+        limit.record(1.0)
+    assert limit.limit == 3
+    for _ in range(3):
+        limit.record(1.1)
+    assert limit.limit == 4
+    for _ in range(4):
+        limit.record(1.0)
+    assert limit.limit == 4 == limit.peak
+
+
+def test_limit_holds_when_latency_rises():
+    limit = AdaptiveLimit(2)
+    limit.record(1.0)
+    limit.record(1.0)
+    for _ in range(3):
+        limit.record(5.0)
+    assert limit.limit == 3
+
+
+def test_throttling_halves_the_limit():
+    limit = AdaptiveLimit(10, minimum=2)
+    limit.record(1.0, throttled=True)
+    assert limit.limit == 5
+    limit.record(1.0, throttled=True)
+    limit.record(1.0, throttled=True)
+    assert limit.limit == 2
+    assert limit.throttled == 3
+
+
+def test_a_burst_of_throttled_requests_halves_the_limit_once():
+    limit = AdaptiveLimit(8)
+    epochs = []
+
+    async def request():
+        async with limit.slot() as epoch:
+            epochs.append(epoch)
+            await asyncio.sleep(0.01)
+            limit.record(1.0, throttled=True, epoch=epoch)
+
+    async def run():
+        await asyncio.gather(*(request() for _ in range(8)))
+
+    asyncio.run(run())
+    # All eight were in flight when the first 429 came back; only that one cuts the limit
+    assert epochs == [0] * 8
+    assert limit.limit == 4
+    assert limit.throttled == 8
+
+    # A request started under the new limit can cut it again, and stale results don't grow it
+    limit.record(1.0, throttled=True, epoch=1)
+    assert limit.limit == 2
+    for _ in range(4):
+        limit.record(1.0, epoch=1)
+    assert limit.limit == 2
+
+
+def test_slots_bound_requests_in_flight():
+    limit = AdaptiveLimit(3)
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        async with limit.slot():
+            peak = max(peak, limit.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(request() for _ in range(10)))
+
+    asyncio.run(run())
+    assert peak == 3
+    assert limit.in_flight == 0
@@ -0,0 +1,90 @@
+import subprocess
+import sys
+
+import pytest
+
+import doc_extraction.doc_extraction as doc_module
+
+DOC_TEXT = "OneDay cases\n\nCase 1\nA  boy with fever\x0b\nCase 2\nA woman with headache\n"
+
+
+class FakeResponse:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+
+@pytest.fixture
+def fetches(tmp_path, monkeypatch):
+    monkeypatch.setenv("ONEDAY_CACHE_DIR", str(tmp_path / "cache"))
+    requests_made = []
+    responses = []
+
+    def fake_get(url, headers=None):
+        requests_made.append(headers or {})
+        return responses.pop(0)
+
+    monkeypatch.setattr(doc_module.requests, "get", fake_get)
+    return requests_made, responses
+
+
+def test_not_modified_doc_reuses_the_stored_cases(fetches, monkeypatch):
+    requests_made, responses = fetches
+    responses.append(FakeResponse(200, DOC_TEXT, {"ETag": '"v1"', "Last-Modified": "Mon, 05 Oct 2026 10:00:00 GMT"}))
+    responses.append(FakeResponse(304))
+
+    first = doc_module.load_document("doc-id")
+    monkeypatch.setattr(doc_module, "split_cases", lambda text: pytest.fail("unchanged doc was split again"))
+    second = doc_module.load_document("doc-id")
+
+    assert first["cases"] == [(1, "a boy with fever"), (2, "a woman with headache")]
+    assert second["cases"] == first["cases"]
+    assert requests_made[1] == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 05 Oct 2026 10:00:00 GMT"}
+
+
+def test_same_content_without_validators_skips_splitting(fetches, monkeypatch):
+    _, responses = fetches
+    responses.append(FakeResponse(200, DOC_TEXT))
+    responses.append(FakeResponse(200, DOC_TEXT.replace("  ", " ")))
+
+    first = doc_module.load_document("doc-id")
+    monkeypatch.setattr(doc_module, "split_cases", lambda text: pytest.fail("unchanged doc was split again"))
+    second = doc_module.load_document("doc-id")
+
+    assert second["content_hash"] == first["content_hash"]
+    assert second["cases"] == first["cases"]
+
+
+def test_file_source_reads_a_local_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv("ONEDAY_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(doc_module.requests, "get", lambda *args, **kwargs: pytest.fail("file source went to the network"))
+    # The session's --scenario-source is restored afterwards
+    monkeypatch.setattr(doc_module, "_scenario_source", doc_module._scenario_source)
+    snapshot = tmp_path / "doc.txt"
+    snapshot.write_text(DOC_TEXT, encoding="utf-8")
+    doc_module.set_scenario_source(f"file://{snapshot}")
+
+    assert doc_module.extract_case_separated_docs() == [(1, "a boy with fever"), (2, "a woman with headache")]
+
+    # Unchanged file: neither cleaned nor split again
+    monkeypatch.setattr(doc_module, "clean_document_text", lambda text: pytest.fail("unchanged file was cleaned again"))
+    monkeypatch.setattr(doc_module, "split_cases", lambda text: pytest.fail("unchanged file was split again"))
+    assert doc_module.extract_case_separated_docs() == [(1, "a boy with fever"), (2, "a woman with headache")]
+
+    monkeypatch.undo()
+    monkeypatch.setenv("ONEDAY_CACHE_DIR", str(tmp_path / "cache"))
+    snapshot.write_text(DOC_TEXT + "Case 3\nAn infant not feeding\n", encoding="utf-8")
+    assert doc_module.load_document(f"file://{snapshot}")["cases"][-1] == (3, "an infant not feeding")
+
+
+def test_importing_doc_extraction_skips_the_heavy_harness_modules():
+    # A fresh interpreter: this test session has already imported litellm
+    code = "import sys, doc_extraction.doc_extraction; print(sorted({'litellm', 'numpy'} & set(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "[]"
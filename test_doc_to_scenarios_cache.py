@@ -1,18 +1,33 @@
+import argparse
 import asyncio
-import json
+import os
+
+import pytest
 
 import doc_extraction.doc_to_scenarios as scenario_module
+import scenario_cache
+from doc_extraction.near_duplicates import DEFAULT_THRESHOLD
+from doc_extraction.scenario_store import ScenarioStore, scenario_store
+from harness.storage import cache_path
+
+
+@pytest.fixture(autouse=True)
+def local_cache_dir(monkeypatch):
+    # Tests chdir into tmp_path; keep the scenario store there too
+    monkeypatch.delenv("ONEDAY_CACHE_DIR", raising=False)
 
 
 def write_cache(rows):
-    with open("case_scenarios_cache.jsonl", "w", encoding="utf-8") as f:
-        for row in rows:
-            f.write(json.dumps(row) + "\n")
+    store = scenario_store(scenario_module.formatter_version())
+    store.put_many(rows)
+    store.close()
 
 
 def read_cache():
-    with open("case_scenarios_cache.jsonl", "r", encoding="utf-8") as f:
-        return [json.loads(line) for line in f if line.strip()]
+    store = scenario_store(scenario_module.formatter_version())
+    rows = list(store.others([]).values())
+    store.close()
+    return rows
 
 
 def test_doc_to_scenarios_prunes_stale_cache_and_refreshes_case_numbers(tmp_path, monkeypatch):
@@ -115,3 +130,230 @@ def test_doc_to_scenarios_updates_case_number_for_cache_hit(tmp_path, monkeypatc
     assert len(cached_rows) == 1
     assert cached_rows[0]["case_number"] == 9
     assert cached_rows[0]["name"] == "Case 9 - cached"
+
+
+def test_unchanged_doc_reuses_the_last_scenarios(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scenario_module, "extract_case_separated_docs", lambda: [(3, "same text")])
+
+    async def format_once(cases, batch_size=10):
+        return [('{"name": "new"}', 3, "same text", {"name": "new", "description": "new", "expected_diagnosis": "new"})]
+
+    monkeypatch.setattr(scenario_module, "process_batch_async", format_once)
+    first = asyncio.run(scenario_module.doc_to_scenarios_async(retries=1))
+
+    async def fail_if_called(cases, batch_size=10):
+        raise AssertionError("process_batch_async should not run for an unchanged doc")
+
+    monkeypatch.setattr(scenario_module, "process_batch_async", fail_if_called)
+    # The store is only checked for the snapshot's keys, not read or written
+    monkeypatch.setattr(ScenarioStore, "get_many", lambda *args: pytest.fail("scenarios read for an unchanged doc"))
+    monkeypatch.setattr(ScenarioStore, "put_many", lambda *args: pytest.fail("scenarios written for an unchanged doc"))
+
+    assert asyncio.run(scenario_module.doc_to_scenarios_async(retries=1)) == first
+
+
+@pytest.mark.parametrize("invalidate", ["store", "cli"])
+def test_invalidated_entries_of_an_unchanged_doc_are_reformatted(tmp_path, monkeypatch, invalidate):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scenario_module, "extract_case_separated_docs", lambda: [(3, "same text")])
+    formatted = []
+
+    async def fake_process_batch_async(cases, batch_size=10):
+        formatted.extend(cases)
+        return [('{"name": "new"}', 3, "same text", {"name": "new", "description": "new", "expected_diagnosis": "new"})]
+
+    monkeypatch.setattr(scenario_module, "process_batch_async", fake_process_batch_async)
+    asyncio.run(scenario_module.doc_to_scenarios_async(retries=1))
+
+    if invalidate == "cli":
+        args = argparse.Namespace(case=[3], match=None, outdated=False, all=False, dry_run=False, db=None, json=True)
+        assert scenario_cache.invalidate(args) == 0
+        assert not os.path.exists(cache_path(scenario_module.SCENARIO_SNAPSHOT_FILE))
+    else:
+        # Another tool removed the entry but left the snapshot
+        store = scenario_store(scenario_module.formatter_version())
+        assert store.delete(["same text"]) == 1
+        store.close()
+
+    asyncio.run(scenario_module.doc_to_scenarios_async(retries=1))
+
+    assert formatted == [(3, "same text"), (3, "same text")]
+    assert [row["original_text"] for row in read_cache()] == ["same text"]
+
+
+def test_formatting_keeps_a_sliding_window_in_flight(monkeypatch):
+    in_flight = 0
+    peak = 0
+    started = []
+
+    async def fake_format(case_num, case_text):
+        nonlocal in_flight, peak
+        started.append(case_num)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        # Case 1 is slow; the others must not wait for it
+        await asyncio.sleep(0.2 if case_num == 1 else 0.01)
+        in_flight -= 1
+        return '{"name": "n", "description": "d", "expected_diagnosis": "x"}', case_num, case_text
+
+    monkeypatch.setattr(scenario_module, "format_case_async", fake_format)
+    cases = [(n, f"text {n}") for n in range(1, 9)]
+
+    async def run():
+        processed = []
+        task = asyncio.ensure_future(scenario_module.process_batch_async(cases, batch_size=2))
+        await asyncio.sleep(0.15)
+        processed.extend(started)
+        return processed, await task
+
+    processed_before_slow_case_finished, results = asyncio.run(run())
+
+    assert len(processed_before_slow_case_finished) == 8
+    assert peak <= 3
+    assert [case_num for _, case_num, _, _ in results] == list(range(1, 9))
+    assert all(checked for _, _, _, checked in results)
+
+
+def test_failed_formatting_keeps_the_case_for_retry(monkeypatch):
+    async def failing_format(case_num, case_text):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(scenario_module, "format_case_async", failing_format)
+
+    results = asyncio.run(scenario_module.process_batch_async([(4, "text")], batch_size=2))
+
+    assert results == [(None, 4, "text", None)]
+
+
+def test_edited_case_reuses_its_near_duplicate(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    old_text = ("a 55 year old man with blood pressure of 165 systolic who has a very mild headache but no other "
+                "symptoms. rdt for malaria was negative and his temperature was 36.8. what should i do next?")
+    new_text = old_text.replace("36.8", "36.9").replace("mild headache", "mild headache,")
+    write_cache([
+        {
+            "name": "Case 1 - headache",
+            "description": "NURSE: temperature 36.8",
+            "expected_diagnosis": "Tension headache",
+            "case_number": 1,
+            "original_text": old_text,
+        }
+    ])
+    monkeypatch.setattr(scenario_module, "extract_case_separated_docs", lambda: [(1, new_text)])
+
+    async def fail_if_called(cases, batch_size=10):
+        raise AssertionError("process_batch_async should not run for a near-duplicate case")
+
+    monkeypatch.setattr(scenario_module, "process_batch_async", fail_if_called)
+
+    scenarios = asyncio.run(scenario_module.doc_to_scenarios_async(retries=1, near_duplicate_threshold=DEFAULT_THRESHOLD))
+
+    assert scenarios[0]["original_text"] == new_text
+    assert scenarios[0]["description"] == "NURSE: temperature 36.9"
+    assert [row["original_text"] for row in read_cache()] == [new_text]
+    assert "changed readings patched into the reused scenario: 36.8 -> 36.9" in capsys.readouterr().out
+
+
+def test_fixed_typo_reuses_its_near_duplicate(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    new_text = ("a 55 year old man with blood pressure of 165 systolic who has a very mild headache but no other "
+                "symptoms. rdt for malaria was negative and his temperature was 36.8. what should i do next?")
+    old_text = new_text.replace("temperature", "tempreture")
+    write_cache([
+        {
+            "name": "Case 1 - headache",
+            "description": "NURSE: temperature 36.8",
+            "expected_diagnosis": "Tension headache",
+            "case_number": 1,
+            "original_text": old_text,
+        }
+    ])
+    monkeypatch.setattr(scenario_module, "extract_case_separated_docs", lambda: [(1, new_text)])
+
+    async def fail_if_called(cases, batch_size=10):
+        raise AssertionError("process_batch_async should not run for a fixed typo")
+
+    monkeypatch.setattr(scenario_module, "process_batch_async", fail_if_called)
+
+    scenarios = asyncio.run(scenario_module.doc_to_scenarios_async(retries=1, near_duplicate_threshold=DEFAULT_THRESHOLD))
+
+    assert scenarios[0]["original_text"] == new_text
+    assert scenarios[0]["description"] == "NURSE: temperature 36.8"
+
+
+@pytest.mark.parametrize("edit", [
+    # An answer flipped: the old scenario's diagnosis would be wrong
+    ("blood in the stool (no)", "blood in the stool (yes)"),
+    # A changed word the cached scenario doesn't contain, so it can't be patched
+    ("abdominal cramps", "abdominal swelling"),
+])
+def test_edited_case_is_reformatted_when_its_scenario_cant_follow(tmp_path, monkeypatch, edit):
+    monkeypatch.chdir(tmp_path)
+    old_text = ("a 4 year old child with loose mucoid diarrhoea for 5 days, fever 2 days, and abdominal cramps is drinking "
+                "eagerly. temperature 38.2 degree respiration 42 breath per minute. questions - any danger sign (no) "
+                "- blood in the stool (no) answer: treat with ORS and zinc")
+    new_text = old_text.replace(*edit)
+    write_cache([
+        {
+            "name": "Case 1 - diarrhoea",
+            "description": "NURSE: 4-year-old, diarrhoea 5 days, no blood in stool",
+            "expected_diagnosis": "Acute watery diarrhoea",
+            "case_number": 1,
+            "original_text": old_text,
+        }
+    ])
+    monkeypatch.setattr(scenario_module, "extract_case_separated_docs", lambda: [(1, new_text)])
+
+    async def fake_process_batch_async(cases, batch_size=10):
+        assert cases == [(1, new_text)]
+        return [('{"name": "dysentery"}', 1, new_text,
+                 {"name": "dysentery", "description": "reformatted", "expected_diagnosis": "Dysentery"})]
+
+    monkeypatch.setattr(scenario_module, "process_batch_async", fake_process_batch_async)
+
+    scenarios = asyncio.run(scenario_module.doc_to_scenarios_async(retries=1, near_duplicate_threshold=DEFAULT_THRESHOLD))
+
+    assert [scenario["description"] for scenario in scenarios] == ["reformatted"]
+    assert [row["expected_diagnosis"] for row in read_cache()] == ["Dysentery"]
+
+
+def test_near_duplicate_reuse_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    old_text = "a 55 year old man with a very mild headache. his temperature was 36.8. what should i do next?"
+    new_text = old_text.replace("36.8", "36.9")
+    write_cache([{"name": "headache", "description": "NURSE: temperature 36.8", "expected_diagnosis": "Tension headache",
+                  "case_number": 1, "original_text": old_text}])
+    monkeypatch.setattr(scenario_module, "extract_case_separated_docs", lambda: [(1, new_text)])
+    formatted = []
+
+    async def fake_process_batch_async(cases, batch_size=10):
+        formatted.extend(cases)
+        return [("{}", 1, new_text, {"name": "headache", "description": "reformatted", "expected_diagnosis": "Tension headache"})]
+
+    monkeypatch.setattr(scenario_module, "process_batch_async", fake_process_batch_async)
+
+    asyncio.run(scenario_module.doc_to_scenarios_async(retries=1))
+
+    assert formatted == [(1, new_text)]
+
+
+def test_formatter_change_misses_the_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_cache([
+        {"name": "cached", "description": "cached", "expected_diagnosis": "cached", "case_number": 1, "original_text": "same text"}
+    ])
+    monkeypatch.setattr(scenario_module, "extract_case_separated_docs", lambda: [(1, "same text")])
+    monkeypatch.setattr(scenario_module, "FORMATTER_MODEL", "another-model")
+    formatted = []
+
+    async def format_again(cases, batch_size=10):
+        formatted.extend(cases)
+        return [('{"name": "new"}', 1, "same text", {"name": "new", "description": "new", "expected_diagnosis": "new"})]
+
+    monkeypatch.setattr(scenario_module, "process_batch_async", format_again)
+
+    scenarios = asyncio.run(scenario_module.doc_to_scenarios_async(retries=1))
+
+    assert formatted == [(1, "same text")]
+    assert scenarios[0]["name"] == "Case 1 - new"
@@ -0,0 +1,61 @@
+import os
+
+from harness.guideline_index import GuidelineIndex, parse_sections, tokenize
+
+GUIDELINES_PATH = os.path.join(os.path.dirname(__file__), "oneday_guidelines.md")
+
+SAMPLE = """# Handbook
+
+## Table of Contents
+1. Danger signs
+2. Malaria
+
+## Danger Signs
+Convulsions, unable to drink, lethargy.
+
+---
+
+## Malaria
+### Uncomplicated malaria
+Fever with a positive malaria test. Give artemether-lumefantrine.
+
+---
+
+## Scabies
+Itchy rash between the fingers. Give benzyl benzoate.
+"""
+
+
+def test_parse_sections_splits_topics_and_skips_front_matter():
+    sections = parse_sections(SAMPLE)
+
+    assert [s["heading"] for s in sections] == ["Danger Signs", "Malaria", "Scabies"]
+    assert [s["index"] for s in sections] == [0, 1, 2]
+    assert sections[1]["subheadings"] == ["Uncomplicated malaria"]
+    assert not sections[0]["text"].endswith("---")
+
+
+def test_tokenize_folds_plurals_and_drops_stopwords():
+    assert tokenize("The patient has itchy ulcers") == ["itchy", "ulcer"]
+    assert tokenize("danger signs") == ["danger", "sign"]
+
+
+def test_retrieve_returns_top_hits_plus_danger_signs_in_document_order():
+    index = GuidelineIndex.from_markdown(SAMPLE)
+
+    assert [s["heading"] for _, s in index.search("itchy rash on fingers", k=1)] == ["Scabies"]
+    assert [s["heading"] for s in index.retrieve("itchy rash on fingers", k=1)] == ["Danger Signs", "Scabies"]
+    assert index.search("unrelated words only", k=3) == []
+
+
+def test_guidelines_for_real_guidelines_is_much_smaller_than_full_text():
+    with open(GUIDELINES_PATH, encoding="utf-8") as f:
+        markdown = f.read()
+    index = GuidelineIndex.from_markdown(markdown)
+
+    top = index.search("4 year old child with fever, malaria test positive", k=1)
+    assert "malaria" in top[0][1]["heading"].lower()
+
+    text = index.guidelines_for("4 year old child with fever, malaria test positive", k=4)
+    assert "danger sign" in text.lower()
+    assert len(text) < len(markdown) / 2
@@ -0,0 +1,101 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from harness.langwatch import TraceFetcher, usage_from_traces
+from harness.trace_store import TraceStore
+
+TRACE = {
+    "spans": [
+        {"span_id": "root", "type": "agent", "name": "UserSimulatorAgent.call"},
+        {
+            "span_id": "llm-1",
+            "parent_id": "root",
+            "type": "llm",
+            "model": "openai/gpt-5",
+            "metrics": {"prompt_tokens": 100, "completion_tokens": 20},
+            "timestamps": {"started_at": 1000, "finished_at": 1750},
+        },
+        {
+            "span_id": "llm-2",
+            "type": "llm",
+            "model": "openai/gpt-5-mini",
+            "metrics": {"prompt_tokens": 50, "completion_tokens": 10, "cache_read_input_tokens": 40},
+            "timestamps": {"started_at": 2000, "finished_at": 2300},
+        },
+    ]
+}
+
+
+def test_usage_from_traces_sums_tokens_and_splits_timing_by_agent():
+    usage = usage_from_traces([TRACE, None])
+
+    assert usage["prompt_tokens"] == 150
+    assert usage["cached_prompt_tokens"] == 40
+    assert usage["completion_tokens"] == 30
+    assert usage["user_sim_llm_ms"] == 750
+    assert usage["agent_llm_ms"] == 300
+    assert usage["cost"] > 0
+
+
+@pytest.fixture
+def langwatch():
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append((self.path, self.headers.get("X-Auth-Token")))
+            found = self.path.endswith("/trace-ok")
+            body = json.dumps(TRACE if found else {"error": "not found"}).encode()
+            self.send_response(200 if found else 403)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", requests_seen
+    server.shutdown()
+    server.server_close()
+
+
+def test_trace_fetcher_downloads_in_background_and_collects_once(langwatch):
+    endpoint, requests_seen = langwatch
+    fetcher = TraceFetcher("key", endpoint=endpoint, concurrency=2)
+    try:
+        fetcher.submit(["trace-ok", "trace-denied"])
+        fetcher.submit(["trace-ok"])  # already scheduled
+        traces = fetcher.collect(timeout=10)
+    finally:
+        fetcher.close()
+
+    assert traces == {"trace-ok": TRACE, "trace-denied": None}
+    assert sorted(requests_seen) == [("/api/traces/trace-denied", "key"), ("/api/traces/trace-ok", "key")]
+
+
+def test_trace_fetcher_reads_and_fills_the_trace_store(langwatch, tmp_path):
+    endpoint, requests_seen = langwatch
+    store = TraceStore(str(tmp_path / "traces.sqlite"))
+
+    first = TraceFetcher("key", endpoint=endpoint, store=store)
+    try:
+        first.submit(["trace-ok"], set_id="set-1")
+        first.collect(timeout=10)
+    finally:
+        first.close()
+    second = TraceFetcher("key", endpoint=endpoint, store=store)
+    try:
+        second.submit(["trace-ok"])
+        traces = second.collect(timeout=10)
+    finally:
+        second.close()
+
+    assert traces == {"trace-ok": TRACE}
+    assert second.store_hits == 1
+    assert len(requests_seen) == 1
+    assert store.trace_ids("set-1") == ["trace-ok"]
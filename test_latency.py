@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from harness.latency import RELATIVE_ERROR, LatencyHistogram, merge_histograms
+
+
+def _exact_quantile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+def test_quantiles_are_within_relative_error():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(7, 1) for _ in range(5000)]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+
+    summary = histogram.summary()
+
+    assert summary["count"] == 5000
+    assert summary["max"] == max(values)
+    for q, key in ((0.5, "p50"), (0.9, "p90"), (0.99, "p99")):
+        assert summary[key] == pytest.approx(_exact_quantile(values, q), rel=2 * RELATIVE_ERROR)
+
+
+def test_merged_worker_histograms_match_a_single_one():
+    rng = random.Random(3)
+    values = [rng.uniform(50, 5000) for _ in range(1000)]
+    whole = LatencyHistogram()
+    workers = [LatencyHistogram(), LatencyHistogram()]
+    for index, value in enumerate(values):
+        whole.record(value)
+        workers[index % 2].record(value)
+
+    merged: dict[str, LatencyHistogram] = {}
+    for worker in workers:
+        merge_histograms(merged, {"agent|gpt-5": worker.to_dict()})
+
+    assert merged["agent|gpt-5"].summary() == pytest.approx(whole.summary())
+
+
+def test_empty_and_zero_values():
+    histogram = LatencyHistogram()
+    assert histogram.summary() is None
+
+    histogram.record(0)
+    histogram.record(0)
+    histogram.record(100)
+
+    assert histogram.quantile(0.5) == 0.0
+    assert histogram.summary()["max"] == 100
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from harness.metrics import MetricTable, summarize
+
+
+def test_summarize_matches_numpy():
+    values = [3.0, 1.0, None, 4.0, 1.5, 9.0, 2.6]
+    present = np.array([v for v in values if v is not None])
+
+    stats = summarize(values)
+
+    assert stats["count"] == 6
+    assert stats["avg"] == pytest.approx(present.mean())
+    assert stats["stdev"] == pytest.approx(present.std(ddof=1))
+    assert stats["p90"] == pytest.approx(np.percentile(present, 90))
+    # 95% t interval with 5 degrees of freedom
+    half_width = 2.571 * present.std(ddof=1) / np.sqrt(6)
+    assert (stats["ci95_low"], stats["ci95_high"]) == pytest.approx((present.mean() - half_width, present.mean() + half_width))
+
+
+def test_summarize_empty():
+    assert summarize([]) is None
+    assert summarize([None, None]) is None
+    assert summarize([2.0])["stdev"] == 0.0
+
+
+def test_grouped_aggregation():
+    rows = [
+        {"variant": "standard", "passed": True, "total_time": 10.0},
+        {"variant": "diagnosis_only", "passed": False, "total_time": None},
+        {"variant": "standard", "passed": False, "total_time": 20.0},
+        {"variant": "standard", "passed": True},
+    ]
+
+    stats = MetricTable.from_rows(rows, ["passed", "total_time"], group_by=["variant"]).aggregate()
+
+    assert list(stats) == [("standard",), ("diagnosis_only",)]
+    assert stats[("standard",)]["passed"]["sum"] == 2
+    assert stats[("standard",)]["total_time"]["p50"] == 15.0
+    assert stats[("diagnosis_only",)]["total_time"] is None
+
+
+def test_explicit_keys():
+    stats = MetricTable.from_rows([{"x": 1}, {"x": 3}], ["x"], keys=[("a",), ("a",)]).aggregate()
+    assert stats[("a",)]["x"]["avg"] == 2
@@ -0,0 +1,65 @@
+from doc_extraction.near_duplicates import NearDuplicateIndex, edits_answers, refresh_scenario, shingles, jaccard
+
+CASE = ("a 4 year old child with loose mucoid diarrhoea for 5 days, fever 2 days, and abdominal cramps is drinking "
+        "eagerly. temperature 38.2 degree respiration 42 breath per minute no cough and flu no abdominal tenderness. "
+        "questions - any danger sign (no) - any other sign of dehydration (no) - malaria test (negative) "
+        "- blood in the stool (yes) answer: communicate and treat with ciprofloxacin page 9")
+OTHER = ("a 55 year old man with blood pressure of 165 systolic who has a very mild headache but no other symptoms. "
+         "rdt for malaria was negative and his temperature was 36.8. what should i do next?")
+
+
+def test_typo_fix_matches_its_original():
+    index = NearDuplicateIndex()
+    index.add("diarrhoea", CASE)
+    index.add("headache", OTHER)
+
+    match = index.query(CASE.replace("diarrhoea", "diarrhea").replace("breath per", "breaths per"))
+
+    assert match is not None
+    key, score = match
+    assert key == "diarrhoea"
+    assert 0.9 <= score < 1.0
+    assert score == jaccard(shingles(CASE), shingles(CASE.replace("diarrhoea", "diarrhea").replace("breath per", "breaths per")))
+
+
+def test_different_case_does_not_match():
+    index = NearDuplicateIndex()
+    index.add("diarrhoea", CASE)
+
+    assert index.query(OTHER) is None
+    index.remove("diarrhoea")
+    assert index.query(CASE) is None
+    assert len(index) == 0
+
+
+def test_refresh_patches_changed_values():
+    scenario = {
+        "description": "NURSE: A 4-year-old child ... Temperature 38.2°C, respiration 42 breaths per minute.",
+        "expected_diagnosis": "Bloody diarrhea (dysentery)",
+    }
+
+    refresh = refresh_scenario(scenario, CASE, CASE.replace("38.2", "38.9"))
+
+    assert "Temperature 38.9°C" in refresh.scenario["description"]
+    assert (refresh.patched, refresh.unpatched) == (1, 0)
+    assert refresh.readings == ["38.2 -> 38.9"]
+    assert scenario["description"].count("38.2") == 1
+
+
+def test_refresh_accepts_spelling_fixes_the_formatter_already_made():
+    typo = CASE.replace("temperature", "tempreture")
+    scenario = {"description": "NURSE: ... Temperature 38.2°C, abdominal cramps.", "expected_diagnosis": "Dysentery"}
+
+    refresh = refresh_scenario(scenario, typo, CASE)
+
+    assert refresh.scenario == scenario
+    assert (refresh.patched, refresh.unpatched, refresh.spelling) == (0, 0, 1)
+    # A new word the scenario doesn't use, and a removed one, can't be followed
+    assert refresh_scenario(scenario, CASE, CASE.replace("loose", "watery")).unpatched == 1
+    assert refresh_scenario(scenario, CASE, CASE.replace("no cough", "cough")).unpatched == 1
+
+
+def test_edits_answers_flags_changed_answers_only():
+    assert edits_answers(CASE, CASE.replace("stool (yes)", "stool (no)"))
+    assert edits_answers(CASE, CASE.replace("ciprofloxacin", "amoxicillin"))
+    assert not edits_answers(CASE, CASE.replace("38.2", "38.9").replace("diarrhoea", "diarrhea"))
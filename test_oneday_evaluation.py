@@ -2,12 +2,36 @@ import os
 import pytest
 import scenario
 import litellm
-import requests
 import datetime
 
 litellm.drop_params = True  # Ignore params models don't support
 from dotenv import load_dotenv
 from typing import TypedDict
+from harness import (
+    GuidelineIndex,
+    OffloadedCall,
+    PromptRegistry,
+    RoleTaggedCall,
+    ScenarioPool,
+    StreamMetrics,
+    add_response_usage,
+    agent_response_cache,
+    apost_turn_simulation,
+    astream_completion,
+    cached_system_message,
+    finish_case_profile,
+    llm_role,
+    new_usage,
+    post_turn_simulation,
+    prompt_cache_params,
+    prompt_hash,
+    response_cache_key,
+    settle_case_accounting,
+    span,
+    start_case_profile,
+    start_case_stats,
+    stream_completion,
+)
 load_dotenv()
 
 
@@ -19,24 +43,58 @@ class Scenario(TypedDict):
     original_text: str
     expected_diagnosis: str | None
 
-def oneday_guidelines() -> str:
-    """Returns the content of the oneday_guidelines.md file."""
-    import os
+GUIDELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "oneday_guidelines.md")
+
+# Guidelines are loaded once per process; derived prompts are rebuilt only when the file changes.
+prompt_registry = PromptRegistry(GUIDELINES_PATH)
 
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    guidelines_path = os.path.join(current_dir, "oneday_guidelines.md")
 
-    with open(guidelines_path, "r", encoding="utf-8") as f:
-        return f.read()
+def oneday_guidelines() -> str:
+    """Returns the content of the oneday_guidelines.md file."""
+    return prompt_registry.guidelines()
 
 
 def oneday_system_prompt() -> str:
     """Returns the OneDay Agent system prompt exactly as it is in Turn.io internally"""
+    return prompt_registry.build("agent", _build_system_prompt)
+
+
+def guideline_index() -> GuidelineIndex:
+    """BM25 section index over the guidelines, built once per guidelines version."""
+    return prompt_registry.derived("index", GuidelineIndex.from_markdown)
+
+
+def oneday_retrieval_system_prompt(messages, k: int) -> str:
+    """Agent system prompt carrying only the top-k guideline sections for the conversation so far (plus danger signs)."""
+    query = "\n".join(str(_message_content(m) or "") for m in messages)
+    return _build_system_prompt(guideline_index().guidelines_for(query, k))
+
+
+def _message_content(message):
+    return message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+
+
+def oneday_prompt_hash() -> str:
+    """Content hash of the current agent system prompt."""
+    return prompt_registry.build_hash("agent", _build_system_prompt)
+
+
+def oneday_prompt_version(retrieval_k: int = 0) -> str:
+    """
+    Version of the agent prompt a case ran with, recorded with each result. Retrieval mode
+    sends different guideline sections every turn, so it's versioned by the full prompt and k.
+    """
+    if not retrieval_k:
+        return oneday_prompt_hash()
+    return prompt_hash(f"{oneday_prompt_hash()}:retrieval-k={retrieval_k}")
+
+
+def _build_system_prompt(guidelines: str) -> str:
     system_prompt = f"""
   You help nurses diagnose patients exclusively following the diagnostic guidelines outlined below:
 
   <GUIDELINES>
-  {oneday_guidelines()}
+  {guidelines}
   </GUIDELINES>
 
   ## Instructions
@@ -117,6 +175,11 @@ def oneday_system_prompt() -> str:
 
 def oneday_judge_prompt(scenario_description: str, criteria: list[str]) -> str:
     """Returns the judge prompt for evaluating OneDay agent performance in scenarios."""
+    return prompt_registry.build("judge", _build_judge_prompt_prefix) + _judge_prompt_suffix(scenario_description, criteria)
+
+
+def _build_judge_prompt_prefix(guidelines: str) -> str:
+    # Everything up to the per-scenario criteria is identical across cases, so it is built once.
     return f"""
       <role>
       You are an LLM as a judge watching a simulated conversation as it plays out live to determine if the agent under test meets the criteria or not.
@@ -124,7 +187,7 @@ def oneday_judge_prompt(scenario_description: str, criteria: list[str]) -> str:
       </role>
 
       <one_day_guidelines>
-      {oneday_guidelines()}
+      {guidelines}
       </one_day_guidelines>
 
       <goal>
@@ -143,7 +206,11 @@ def oneday_judge_prompt(scenario_description: str, criteria: list[str]) -> str:
       Once a diagnosis and treatment have been given, you should be looking for the conversation to end — do not let it drag on.
       </goal>
 
-      <criteria>
+"""
+
+
+def _judge_prompt_suffix(scenario_description: str, criteria: list[str]) -> str:
+    return f"""      <criteria>
       {chr(10).join(criteria)}
       </criteria>
 
@@ -181,83 +248,163 @@ def oneday_judge_prompt(scenario_description: str, criteria: list[str]) -> str:
     """
 
 
-def generate_oneday_agent_response(messages, model: str, turn: bool = False, simulation_id: str = "", turn_uuid: str | None = ""):
+class AgentOptions(TypedDict, total=False):
+    """Agent call options shared by every case (set from CLI flags in conftest)."""
+    sync: bool  # --sync-agent: blocking litellm/requests path
+    prompt_cache: bool  # --prompt-cache: provider prompt caching for the system prompt
+    retrieval_k: int  # --retrieval-k: send only the top-k guideline sections instead of the full guidelines
+    response_cache: bool  # agent response cache; off with --no-agent-cache for fresh sampling
+    stream: bool  # --stream-agent: stream replies and record TTFT / generation time / tokens per second
+
+
+def _agent_system_prompt(messages, retrieval_k: int = 0) -> str:
+    if retrieval_k:
+        return oneday_retrieval_system_prompt(messages, retrieval_k)
+    return oneday_system_prompt()
+
+
+def _agent_messages(messages, system_prompt: str, model: str, prompt_cache: bool = False) -> list:
+    return [
+        cached_system_message(system_prompt, model) if prompt_cache else {
+            "role": "system",
+            "content": system_prompt,
+        },
+        *messages,
+    ]
+
+
+def _agent_params(model: str, system_prompt: str, prompt_cache: bool = False, retrieval_k: int = 0) -> dict:
+    if not prompt_cache:
+        return {}
+    # Retrieval prompts carry different sections every turn; each prefix gets its own cache key
+    return prompt_cache_params(model, prompt_hash(system_prompt) if retrieval_k else oneday_prompt_hash())
+
+
+def _agent_request(messages, model: str, prompt_cache: bool = False, retrieval_k: int = 0) -> dict:
+    system_prompt = _agent_system_prompt(messages, retrieval_k)
+    return {
+        "model": model,
+        "messages": _agent_messages(messages, system_prompt, model, prompt_cache),
+        **_agent_params(model, system_prompt, prompt_cache, retrieval_k),
+    }
+
+
+def _cached_agent_response(request: dict, response_cache: bool):
+    """Returns (cache key or None, cached response or None)."""
+    if not response_cache:
+        return None, None
+    key = response_cache_key(request)
+    return key, agent_response_cache().get(key)
+
+
+def _agent_message(response, usage: dict | None = None):
+    if usage is not None:
+        add_response_usage(usage, response)
+
+    message = response.choices[0].message #type: ignore
+
+    # Some models (e.g. Claude Sonnet) may hallucinate tool calls even when
+    # no tools are provided. Convert these to plain text to avoid breaking
+    # downstream consumers (Turn API, user simulator, etc.).
+    if message.content is None and hasattr(message, 'tool_calls') and message.tool_calls:
+        print(f"WARNING: Model returned tool_calls instead of text: {message.tool_calls}")
+        message.content = str(message.tool_calls[0].function.arguments)
+        message.tool_calls = None
+
+    return message
+
+
+def generate_oneday_agent_response(messages, model: str, turn: bool = False, simulation_id: str = "", turn_uuid: str | None = "", prompt_cache: bool = False, retrieval_k: int = 0, response_cache: bool = False, stream: bool = False, stream_metrics: list | None = None, usage: dict | None = None):
+    """Blocking agent call. Kept as a fallback for the async path (--sync-agent)."""
     if turn:
-        turn_key = os.getenv("TURN_API_KEY")
         user_input = messages[-1]["content"] if messages else ""
-        response = requests.post(
-            f"https://whatsapp.turn.io/v1/journeys/{turn_uuid}/simulation",
-            headers={
-                "Authorization": f"Bearer {turn_key}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "simulation_id": f"{simulation_id}",
-                "revision": "staging",
-                "contact": {
-                    "name": "Test User",
-                    "language": "eng",
-                },
-                "input": user_input,
-            },
-        )
-        if not response.ok:
-            # Turn.io returns 500 when the journey has already ended and receives
-            # an unexpected user message (e.g. the UserSimulator sends one more
-            # turn after the agent emitted <END>). Treat this as a graceful
-            # conversation end rather than a hard failure.
-            if response.status_code == 500 and "unexpectedly received user input" in response.text:
-                return {"role": "assistant", "content": "<END>"}
-            raise RuntimeError(f"Turn API error {response.status_code}: {response.text[:500]}")
-        raw_response = response.json()
-        message = raw_response["message"]
-        state = raw_response.get("state")
-
-        # Turn journey ended or returned empty — treat as conversation end
-        if state == "end" or not message:
-            return {"role": "assistant", "content": "<END>"}
-
+        return post_turn_simulation(turn_uuid, simulation_id, user_input)
+
+    with span("agent.prompt"):
+        request = _agent_request(messages, model, prompt_cache, retrieval_k)
+    key, cached = _cached_agent_response(request, response_cache)
+    if cached is not None:
+        return _agent_message(cached)
+    if stream:
+        response, metrics = stream_completion(request)
+        if stream_metrics is not None:
+            stream_metrics.append(metrics)
     else:
-        response = litellm.completion(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": oneday_system_prompt(),
-                },
-                *messages,
-            ],
-        )
+        response = litellm.completion(**request)
+    if key:
+        agent_response_cache().put(key, response)
+    return _agent_message(response, usage) #type: ignore
 
-        message = response.choices[0].message #type: ignore
 
-        # Some models (e.g. Claude Sonnet) may hallucinate tool calls even when
-        # no tools are provided. Convert these to plain text to avoid breaking
-        # downstream consumers (Turn API, user simulator, etc.).
-        if message.content is None and hasattr(message, 'tool_calls') and message.tool_calls:
-            print(f"WARNING: Model returned tool_calls instead of text: {message.tool_calls}")
-            message.content = str(message.tool_calls[0].function.arguments)
-            message.tool_calls = None
+async def generate_oneday_agent_response_async(messages, model: str, turn: bool = False, simulation_id: str = "", turn_uuid: str | None = "", prompt_cache: bool = False, retrieval_k: int = 0, response_cache: bool = False, stream: bool = False, stream_metrics: list | None = None, usage: dict | None = None):
+    """Non-blocking agent call: litellm.acompletion, or the pooled async Turn.io client."""
+    if turn:
+        user_input = messages[-1]["content"] if messages else ""
+        return await apost_turn_simulation(turn_uuid, simulation_id, user_input)
+
+    with span("agent.prompt"):
+        request = _agent_request(messages, model, prompt_cache, retrieval_k)
+    key, cached = _cached_agent_response(request, response_cache)
+    if cached is not None:
+        return _agent_message(cached)
+    if stream:
+        response, metrics = await astream_completion(request)
+        if stream_metrics is not None:
+            stream_metrics.append(metrics)
+    else:
+        response = await litellm.acompletion(**request)
+    if key:
+        agent_response_cache().put(key, response)
+    return _agent_message(response, usage) #type: ignore
 
-    return message #type: ignore
 
 class OneDayAgentAdapter(scenario.AgentAdapter):
     """Provides the scenario agent adapter for the OneDay workflow"""
-    def __init__(self, model: str, simulation_id: str, turn: bool, turn_uuid: str | None):
+    def __init__(self, model: str, simulation_id: str, turn: bool, turn_uuid: str | None, options: AgentOptions | None = None):
         self.model = model
         self.turn = turn
         self.simulation_id = simulation_id
         self.turn_uuid = turn_uuid
+        self.options: AgentOptions = options or {}
+        # Token usage reported by the provider for this agent's own calls (not Turn)
+        self.usage = new_usage()
+        # Per-turn TTFT / generation time / tokens per second (--stream-agent)
+        self.stream_metrics: list[StreamMetrics] = []
 
     async def call(self, input: scenario.AgentInput) -> scenario.AgentReturnTypes:
         if self.turn and not self.turn_uuid:
             raise ValueError("Cannot call turn without an associated uuid.")
-        
-        message = generate_oneday_agent_response(input.messages, self.model, turn = self.turn, simulation_id = self.simulation_id, turn_uuid = self.turn_uuid)
+
+        kwargs = dict(turn = self.turn, simulation_id = self.simulation_id, turn_uuid = self.turn_uuid, prompt_cache = self.options.get("prompt_cache", False), retrieval_k = self.options.get("retrieval_k", 0), response_cache = self.options.get("response_cache", False), stream = self.options.get("stream", False), stream_metrics = self.stream_metrics, usage = self.usage)
+        with llm_role("agent"), span("agent"):
+            if self.options.get("sync"):
+                message = generate_oneday_agent_response(input.messages, self.model, **kwargs)
+            else:
+                message = await generate_oneday_agent_response_async(input.messages, self.model, **kwargs)
         return message # type: ignore[return-value]
 
 
-async def run_oneday_scenario(test_scenario: Scenario, testrun_uid: str, model_id: str, diagnosis_only: bool = False, use_turn: bool = False, turn_uuid: str | None = None, request=None):
+class UserSimulatorAgent(RoleTaggedCall, scenario.UserSimulatorAgent):
+    """User simulator whose litellm calls are accounted under the user_sim role."""
+    llm_role = "user_sim"
+
+
+class JudgeAgent(RoleTaggedCall, scenario.JudgeAgent):
+    """Judge whose litellm calls are accounted under the judge role."""
+    llm_role = "judge"
+
+
+class ThreadedUserSimulatorAgent(RoleTaggedCall, OffloadedCall, scenario.UserSimulatorAgent):
+    """User simulator whose blocking litellm call runs off the event loop (--concurrency)."""
+    llm_role = "user_sim"
+
+
+class ThreadedJudgeAgent(RoleTaggedCall, OffloadedCall, scenario.JudgeAgent):
+    """Judge whose blocking litellm call runs off the event loop (--concurrency)."""
+    llm_role = "judge"
+
+
+async def run_oneday_scenario(test_scenario: Scenario, testrun_uid: str, model_id: str, diagnosis_only: bool = False, use_turn: bool = False, turn_uuid: str | None = None, agent_options: AgentOptions | None = None, scenario_pool: ScenarioPool | None = None, request=None):
     """
     Shared helper that runs a OneDay agent scenario test.
 
@@ -269,6 +416,30 @@ async def run_oneday_scenario(test_scenario: Scenario, testrun_uid: str, model_i
         use_turn: If True, use the Turn.io simulation API instead of calling the model directly.
         turn_uuid: Turn.io journey UUID. When provided it takes exclusive precedence over the
                    TURN_JOURNEY_UUID env var; when None the env var is used as a fallback.
+        agent_options: Agent call options (sync fallback, prompt caching, retrieval, response cache, streaming); see AgentOptions.
+        scenario_pool: When set (--concurrency), the case runs concurrently with the rest of its
+                       batch and this call only waits for its outcome.
+    """
+    if scenario_pool is not None and request is not None:
+        outcome = await scenario_pool.run(request.node, run_oneday_case)
+        if "skipped" in outcome:
+            pytest.skip(outcome["skipped"])
+    else:
+        outcome = await run_oneday_case(test_scenario, testrun_uid, model_id, diagnosis_only=diagnosis_only, use_turn=use_turn, turn_uuid=turn_uuid, agent_options=agent_options)
+
+    if request is not None:
+        request.node.user_properties.extend(outcome["user_properties"])
+
+    assert outcome["success"]
+
+
+async def run_oneday_case(test_scenario: Scenario, testrun_uid: str, model_id: str, diagnosis_only: bool = False, use_turn: bool = False, turn_uuid: str | None = None, agent_options: AgentOptions | None = None, offload_simulators: bool = False) -> dict:
+    """
+    Runs one OneDay agent scenario and returns its outcome without asserting.
+
+    Returns a dict with `success` and the `user_properties` the conftest summary reads.
+    Arguments match `run_oneday_scenario`; `offload_simulators` runs the user simulator
+    and judge off the event loop so concurrent scenarios don't block each other.
     """
     scenario_description = test_scenario["description"]
     nurse_description = (
@@ -312,65 +483,92 @@ async def run_oneday_scenario(test_scenario: Scenario, testrun_uid: str, model_i
 
     time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     resolved_turn_uuid = turn_uuid  # if turn_uuid is not None else os.getenv("TURN_JOURNEY_UUID")
-    raw_simulation_id = f"OD{test_scenario['case_number']}-{time}"
+    # Variant suffix keeps both variants of a case distinct when they start in the same second (--concurrency)
+    raw_simulation_id = f"OD{test_scenario['case_number']}{'D' if diagnosis_only else ''}-{time}"
     simulation_id = raw_simulation_id[:24].ljust(6, "0")
-    agent = OneDayAgentAdapter(model_id, simulation_id=simulation_id, turn=use_turn, turn_uuid=resolved_turn_uuid)
-    result = await scenario.run(
-        name=test_name if test_name.startswith("OneDay") else f"OneDay - {test_name}",
-        description=nurse_description,
-        agents=[
-            agent,
-            scenario.UserSimulatorAgent(
-                system_prompt=nurse_description,
-                model="gpt-5"
-            ),
-            scenario.JudgeAgent(
-                criteria=criteria,
-                model="gpt-5",
-                system_prompt=oneday_judge_prompt(scenario_description, criteria)
-            )
-        ],
-        set_id=testrun_uid
-    )
+    agent = OneDayAgentAdapter(model_id, simulation_id=simulation_id, turn=use_turn, turn_uuid=resolved_turn_uuid, options=agent_options)
+    user_simulator_cls = ThreadedUserSimulatorAgent if offload_simulators else UserSimulatorAgent
+    judge_cls = ThreadedJudgeAgent if offload_simulators else JudgeAgent
+    variant = "diagnosis_only" if diagnosis_only else "standard"
+    case_stats = start_case_stats()
+    profile = start_case_profile(f"case_{test_scenario['case_number']}")
+    with span("judge.prompt"):
+        judge_prompt = oneday_judge_prompt(scenario_description, criteria)
+    with span("scenario.run"):
+        result = await scenario.run(
+            name=test_name if test_name.startswith("OneDay") else f"OneDay - {test_name}",
+            description=nurse_description,
+            agents=[
+                agent,
+                user_simulator_cls(
+                    system_prompt=nurse_description,
+                    model="gpt-5"
+                ),
+                judge_cls(
+                    criteria=criteria,
+                    model="gpt-5",
+                    system_prompt=judge_prompt
+                )
+            ],
+            set_id=testrun_uid
+        )
 
-    # Collect all unique trace_ids (one per turn); usage is computed in conftest post-run hook
+    # Token/cost/latency per role is counted in-process (harness.accounting); the
+    # trace ids are kept for linking to LangWatch and as a usage fallback.
+    await settle_case_accounting(case_stats)
     trace_ids = list(dict.fromkeys(
         tid for msg in result.messages if (tid := msg.get("trace_id"))
     ))
 
-    if request is not None:
-        request.node.user_properties.append(("total_time", result.total_time))
-        request.node.user_properties.append(("agent_time", result.agent_time))
-        request.node.user_properties.append(("trace_ids", ",".join(trace_ids)))
-        if use_turn:
-            # Turn API doesn't expose model info, so estimate only the Turn agent's token
-            # contribution. Judge + UserSimulator tokens come from LangWatch (accurate).
-            # 4/3 tokens per word is the industry-standard approximation for English text.
-            def _word_count(msg):
-                content = msg.get("content")
-                return len(str(content).split()) if content else 0
-
-            system_prompt_words = len(oneday_system_prompt().split())
-            agent_prompt_words = system_prompt_words + sum(_word_count(m) for m in result.messages if m.get("role") == "user")
-            agent_completion_words = sum(_word_count(m) for m in result.messages if m.get("role") == "assistant")
-            request.node.user_properties.append(("turn_agent_prompt_tokens", round(agent_prompt_words * 4 / 3)))
-            request.node.user_properties.append(("turn_agent_completion_tokens", round(agent_completion_words * 4 / 3)))
-
-    assert result.success
-
-
+    user_properties = [
+        ("total_time", result.total_time),
+        ("agent_time", result.agent_time),
+        ("trace_ids", ",".join(trace_ids)),
+        ("set_id", testrun_uid),
+        ("prompt_hash", oneday_prompt_version(0 if use_turn else (agent_options or {}).get("retrieval_k", 0))),
+    ]
+    if agent.stream_metrics:
+        user_properties.append(("agent_ttft_s", [m["ttft_s"] for m in agent.stream_metrics]))
+        user_properties.append(("agent_generation_s", [m["generation_s"] for m in agent.stream_metrics]))
+        user_properties.append(("agent_tokens_per_s", [m["tokens_per_s"] for m in agent.stream_metrics if m["tokens_per_s"]]))
+    # Harness counters for this case: per-role LLM usage, cassette hits/misses, retries, throttled time
+    user_properties.extend(case_stats.items())
+    if profile is not None:
+        # Harness overhead vs network wait (--profile); collapsed stacks go to the profile directory
+        user_properties.append(("profile", finish_case_profile(profile, f"case_{test_scenario['case_number']}_{variant}")))
+    if not use_turn and "agent_prompt_tokens" not in case_stats:
+        user_properties.append(("agent_prompt_tokens", agent.usage["prompt_tokens"]))
+        user_properties.append(("agent_cached_prompt_tokens", agent.usage["cached_prompt_tokens"]))
+    if use_turn:
+        # Turn API doesn't expose model info, so estimate only the Turn agent's token
+        # contribution. Judge + UserSimulator usage is accounted in-process (harness.accounting).
+        # 4/3 tokens per word is the industry-standard approximation for English text.
+        def _word_count(msg):
+            content = msg.get("content")
+            return len(str(content).split()) if content else 0
+
+        system_prompt_words = len(oneday_system_prompt().split())
+        agent_prompt_words = system_prompt_words + sum(_word_count(m) for m in result.messages if m.get("role") == "user")
+        agent_completion_words = sum(_word_count(m) for m in result.messages if m.get("role") == "assistant")
+        user_properties.append(("turn_agent_prompt_tokens", round(agent_prompt_words * 4 / 3)))
+        user_properties.append(("turn_agent_completion_tokens", round(agent_completion_words * 4 / 3)))
+
+    return {"success": result.success, "user_properties": user_properties}
+
+
+# Session loop scope keeps one event loop per worker so pooled async clients are reused across scenarios.
 @pytest.mark.agent_test
-@pytest.mark.asyncio
-async def test_oneday_agent_standard(test_scenario: Scenario, testrun_uid: str, model_id: str, use_turn: bool, turn_journey_uuid: str | None, request):
+@pytest.mark.asyncio(loop_scope="session")
+async def test_oneday_agent_standard(test_scenario: Scenario, testrun_uid: str, model_id: str, use_turn: bool, turn_journey_uuid: str | None, agent_options: AgentOptions, scenario_pool: ScenarioPool | None, request):
     """Standard test for OneDay agent diagnostic scenarios."""
-    await run_oneday_scenario(test_scenario, testrun_uid, model_id, use_turn=use_turn, turn_uuid=turn_journey_uuid, request=request)
+    await run_oneday_scenario(test_scenario, testrun_uid, model_id, use_turn=use_turn, turn_uuid=turn_journey_uuid, agent_options=agent_options, scenario_pool=scenario_pool, request=request)
 
 
 @pytest.mark.agent_test
-@pytest.mark.asyncio
-async def test_oneday_agent_diagnosis_only(test_scenario: Scenario, testrun_uid: str, model_id: str, use_turn: bool, turn_journey_uuid: str | None, request):
+@pytest.mark.asyncio(loop_scope="session")
+async def test_oneday_agent_diagnosis_only(test_scenario: Scenario, testrun_uid: str, model_id: str, use_turn: bool, turn_journey_uuid: str | None, agent_options: AgentOptions, scenario_pool: ScenarioPool | None, request):
     """
     Test for OneDay agent diagnostic scenarios.
     Requires the agent to provide the correct diagnosis only.
     """
-    await run_oneday_scenario(test_scenario, testrun_uid, model_id, diagnosis_only=True, use_turn=use_turn, turn_uuid=turn_journey_uuid, request=request)
\ No newline at end of file
+    await run_oneday_scenario(test_scenario, testrun_uid, model_id, diagnosis_only=True, use_turn=use_turn, turn_uuid=turn_journey_uuid, agent_options=agent_options, scenario_pool=scenario_pool, request=request)
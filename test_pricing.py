@@ -0,0 +1,37 @@
+import litellm
+import pytest
+
+from harness.pricing import PricingTable
+
+MODEL_COST = {
+    "gpt-5": {"input_cost_per_token": 1e-06, "output_cost_per_token": 1e-05, "cache_read_input_token_cost": 1e-07},
+    "free-model": {"input_cost_per_token": 0.0, "output_cost_per_token": 0.0},
+}
+
+
+def test_cost_is_a_multiply_over_memoized_rates():
+    table = PricingTable(MODEL_COST)
+
+    cost = table.cost("openai/gpt-5", prompt_tokens=1000, completion_tokens=100, cached_prompt_tokens=400)
+
+    assert cost == pytest.approx(600 * 1e-06 + 400 * 1e-07 + 100 * 1e-05)
+    assert table.rates("openai/gpt-5") is table.rates("openai/gpt-5")
+
+
+def test_unknown_and_zero_priced_models_are_reported():
+    table = PricingTable(MODEL_COST)
+
+    assert table.cost("mystery-model", 10, 10) is None
+    assert table.cost("mystery-model", 10, 10) is None
+    assert table.cost("free-model", 10, 10) is None
+
+    assert table.unpriced == {"mystery-model": 2, "free-model": 1}
+
+
+def test_matches_litellm_completion_cost():
+    table = PricingTable()
+    response = litellm.ModelResponse(model="gpt-5-mini", usage=litellm.Usage(prompt_tokens=1200, completion_tokens=300, total_tokens=1500))
+
+    expected = litellm.completion_cost(completion_response=response, model="gpt-5-mini")
+
+    assert table.cost("openai/gpt-5-mini", 1200, 300) == pytest.approx(expected)
@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import litellm
+import pytest
+
+from harness.accounting import install_call_accounting, settle_case_accounting, uninstall_call_accounting
+from harness.case_stats import start_case_stats
+from harness.profiling import (
+    CaseProfile,
+    StackSampler,
+    finish_case_profile,
+    install_profiling,
+    merge_breakdowns,
+    span,
+    start_case_profile,
+    uninstall_profiling,
+)
+from harness.testing import isolated_llm_hooks
+
+REQUEST = {
+    "model": "gpt-4o",
+    "messages": [{"role": "user", "content": "Hello"}],
+    "mock_response": "Hello nurse, please describe the patient.",
+}
+
+
+@pytest.fixture
+def profiling(tmp_path):
+    # The session's --profile and call accounting are set aside and restored afterwards
+    with isolated_llm_hooks():
+        install_profiling(str(tmp_path))
+        yield tmp_path
+        uninstall_profiling()
+
+
+def test_spans_are_noops_without_a_profile():
+    with span("agent") as first, span("judge") as second:
+        pass
+    assert first is second
+
+
+def test_self_time_excludes_children():
+    profile = CaseProfile("case_1")
+    profile.add(("scenario.run",), 3.0)
+    profile.add(("scenario.run", "judge"), 2.0)
+    profile.add(("scenario.run", "judge", "llm api"), 1.5, network=True)
+    profile.wall_s = 4.0
+
+    breakdown = profile.breakdown()
+
+    assert breakdown["self_ms"] == {"llm api": 1500.0, "case": 1000.0, "scenario.run": 1000.0, "judge": 500.0}
+    assert breakdown["network_ms"] == 1500.0
+    assert breakdown["overhead_ms"] == 2500.0
+    assert "case_1;scenario.run;judge;llm api 1500000" in profile.folded().splitlines()
+
+
+def test_case_profile_nests_spans_across_tasks_and_threads(profiling):
+    async def case():
+        profile = start_case_profile("case_3")
+        with span("scenario.run"):
+            with span("agent"):
+                await asyncio.sleep(0.01)
+            with span("judge"):
+                await asyncio.to_thread(time.sleep, 0.01)
+        return profile
+
+    profile = asyncio.run(case())
+    breakdown = finish_case_profile(profile, "case_3_standard")
+
+    assert set(profile.totals) == {("scenario.run",), ("scenario.run", "agent"), ("scenario.run", "judge")}
+    assert breakdown["self_ms"]["agent"] >= 10
+    folded = (profiling / "case_3_standard.folded").read_text()
+    assert "case_3;scenario.run;agent " in folded
+
+
+def test_litellm_calls_get_their_own_span(profiling):
+    install_call_accounting()
+    try:
+        async def case():
+            stats = start_case_stats()
+            profile = start_case_profile("case_1")
+            with span("agent"):
+                await litellm.acompletion(**REQUEST)
+                await asyncio.to_thread(litellm.completion, **REQUEST)
+            await settle_case_accounting(stats)
+            return profile
+
+        profile = asyncio.run(case())
+    finally:
+        uninstall_call_accounting()
+
+    assert ("agent", "litellm") in profile.totals
+    # Provider wait is filed under the calling span, once per call, even from litellm's callback threads
+    assert profile.network == {("agent", "litellm", "llm api")}
+
+
+def test_merge_breakdowns():
+    merged = merge_breakdowns([
+        {"wall_ms": 100.0, "network_ms": 60.0, "overhead_ms": 40.0, "self_ms": {"llm api": 60.0, "judge": 40.0}},
+        {"wall_ms": 50.0, "network_ms": 20.0, "overhead_ms": 30.0, "self_ms": {"llm api": 20.0, "case": 30.0}},
+    ])
+
+    assert merged["cases"] == 2
+    assert (merged["wall_ms"], merged["network_ms"], merged["overhead_ms"]) == (150.0, 80.0, 70.0)
+    assert merged["self_ms"] == {"llm api": 80.0, "judge": 40.0, "case": 30.0}
+    assert merge_breakdowns([]) is None
+
+
+def test_stack_sampler_records_the_sampled_thread(tmp_path):
+    sampler = StackSampler(0.002).start()
+    deadline = time.perf_counter() + 0.1
+    while time.perf_counter() < deadline:
+        pass
+    sampler.stop(str(tmp_path / "sampled.folded"))
+
+    assert sampler.samples
+    assert "test_stack_sampler_records_the_sampled_thread" in (tmp_path / "sampled.folded").read_text()
@@ -0,0 +1,56 @@
+import os
+
+from harness.prompts import PromptRegistry, cached_system_message, prompt_cache_params, prompt_hash
+
+
+def test_prompt_registry_builds_once_per_guidelines_version(tmp_path):
+    guidelines = tmp_path / "guidelines.md"
+    guidelines.write_text("## Malaria\nGive ACT.", encoding="utf-8")
+    registry = PromptRegistry(str(guidelines))
+
+    calls = []
+
+    def builder(text):
+        calls.append(text)
+        return f"<GUIDELINES>{text}</GUIDELINES>"
+
+    first = registry.build("agent", builder)
+    second = registry.build("agent", builder)
+
+    assert first == second == "<GUIDELINES>## Malaria\nGive ACT.</GUIDELINES>"
+    assert len(calls) == 1
+    assert registry.version == prompt_hash("## Malaria\nGive ACT.")
+    assert registry.build_hash("agent", builder) == prompt_hash(first)
+
+
+def test_prompt_registry_picks_up_edits_without_restart(tmp_path):
+    guidelines = tmp_path / "guidelines.md"
+    guidelines.write_text("v1", encoding="utf-8")
+    registry = PromptRegistry(str(guidelines))
+
+    assert registry.build("agent", str.upper) == "V1"
+    old_version = registry.version
+
+    guidelines.write_text("v2 edited", encoding="utf-8")
+    # Force a distinct mtime even on filesystems with coarse timestamps
+    st = os.stat(guidelines)
+    os.utime(guidelines, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    assert registry.build("agent", str.upper) == "V2 EDITED"
+    assert registry.version != old_version
+
+
+def test_cached_system_message_marks_anthropic_breakpoint_only():
+    anthropic = cached_system_message("guidelines", "anthropic/claude-haiku-4-5")
+    assert anthropic["content"] == [
+        {"type": "text", "text": "guidelines", "cache_control": {"type": "ephemeral"}}
+    ]
+
+    # OpenAI/Gemini cache a stable prefix automatically; the message stays plain text
+    assert cached_system_message("guidelines", "openai/gpt-5-mini") == {"role": "system", "content": "guidelines"}
+    assert cached_system_message("guidelines", "google/gemini-3-flash-preview") == {"role": "system", "content": "guidelines"}
+
+
+def test_prompt_cache_params_only_for_openai():
+    assert prompt_cache_params("openai/gpt-5-mini", "abc123") == {"prompt_cache_key": "oneday-abc123"}
+    assert prompt_cache_params("anthropic/claude-haiku-4-5", "abc123") == {}
@@ -0,0 +1,63 @@
+import litellm
+import pytest
+
+from harness.case_stats import start_case_stats
+from harness.ratelimit import RateLimiter, backoff_s, parse_rate_limits, provider_for, retry_after_s
+
+
+def test_parse_rate_limits():
+    assert parse_rate_limits(["openai=500:200000", "Turn=120"]) == {"openai": (500, 200000), "turn": (120, None)}
+    with pytest.raises(ValueError, match="PROVIDER=RPM"):
+        parse_rate_limits(["openai"])
+    with pytest.raises(ValueError, match="positive"):
+        parse_rate_limits(["openai=0"])
+
+
+def test_provider_for_model_ids():
+    assert provider_for("openai/gpt-5-mini") == "openai"
+    assert provider_for("anthropic/claude-haiku-4-5") == "anthropic"
+    assert provider_for("gpt-5") == "openai"
+
+
+def test_bucket_is_shared_through_the_store(tmp_path):
+    path = str(tmp_path / "ratelimit.sqlite")
+    first = RateLimiter({"openai": (60, None)}, path)
+    second = RateLimiter({"openai": (60, None)}, path)  # another worker on the same host
+
+    # 60 RPM -> 1 request/s with a 10 request burst shared by both limiters
+    waits = [limiter.acquire("openai") for limiter in (first, second) * 5]
+    assert waits == [0.0] * 10
+    assert first.acquire("openai") == pytest.approx(1.0, abs=0.1)
+    assert second.acquire("openai") == pytest.approx(2.0, abs=0.1)
+    assert first.acquire("unlimited") == 0.0
+
+
+def test_backoff_honours_retry_after():
+    assert 0 <= backoff_s(0) <= 1.0
+    assert backoff_s(0, retry_after=7) == 7
+    error = litellm.RateLimitError("slow down", "openai", "gpt-5")
+    error.headers = {"retry-after": "3"}  # type: ignore[attr-defined]
+    assert retry_after_s(error) == 3
+
+
+def test_call_retries_transient_errors_and_counts_them(monkeypatch):
+    monkeypatch.setattr("harness.ratelimit.time.sleep", lambda s: None)
+    limiter = RateLimiter({}, "", max_retries=2)
+    stats = start_case_stats()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise litellm.RateLimitError("429", "openai", "gpt-5")
+        return "ok"
+
+    assert limiter.call("openai", flaky) == "ok"
+    assert stats["retries"] == 2
+
+    def broken():
+        raise litellm.BadRequestError("bad", "gpt-5", "openai")
+
+    with pytest.raises(litellm.BadRequestError):
+        limiter.call("openai", broken)
+    assert stats["retries"] == 2
@@ -0,0 +1,57 @@
+import litellm
+
+from harness.case_stats import start_case_stats
+from harness.response_cache import ResponseCache, response_cache_key
+
+SYSTEM = {"role": "system", "content": "You are the OneDay agent."}
+
+
+def _response(text: str) -> litellm.ModelResponse:
+    return litellm.ModelResponse(choices=[{"message": {"role": "assistant", "content": text}}])
+
+
+def _request(*messages, **params) -> dict:
+    return {"model": "openai/gpt-5-mini", "messages": [SYSTEM, *messages], **params}
+
+
+def test_key_covers_model_system_prompt_conversation_and_params():
+    hello = {"role": "user", "content": "Hello"}
+    base = response_cache_key(_request(hello))
+
+    assert response_cache_key(_request(dict(hello))) == base
+    assert response_cache_key({**_request(hello), "model": "openai/gpt-5.2"}) != base
+    assert response_cache_key({**_request(hello), "messages": [{"role": "system", "content": "v2"}, hello]}) != base
+    assert response_cache_key(_request(hello, {"role": "assistant", "content": "Hi"})) != base
+    assert response_cache_key(_request(hello, prompt_cache_key="oneday-abc")) != base
+
+
+def test_memory_then_disk_tier(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    cache = ResponseCache(path, memory_entries=1)
+    stats = start_case_stats()
+
+    assert cache.get("greeting") is None
+    cache.put("greeting", _response("Hello nurse"))
+    cache.put("other", _response("Other"))  # pushes "greeting" out of the 1-entry LRU
+
+    assert cache.get("greeting").choices[0].message.content == "Hello nurse"
+    # Another worker sees the same disk tier
+    assert ResponseCache(path).get("other").choices[0].message.content == "Other"
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert dict(stats) == {"agent_cache_misses": 1, "agent_cache_hits": 2}
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    cache = ResponseCache(path, memory_entries=0)
+    cache.put("old", _response("a" * 100))
+    entry_size = cache._conn.execute("SELECT size FROM responses").fetchone()[0]
+
+    # Room for two entries: the third put evicts the least recently read one
+    cache.max_disk_bytes = entry_size * 2 + entry_size // 2
+    cache.put("middle", _response("b" * 100))
+    assert cache.get("old") is not None  # "middle" is now the least recently used
+    cache.put("new", _response("c" * 100))
+
+    keys = {row[0] for row in cache._conn.execute("SELECT key FROM responses")}
+    assert keys == {"old", "new"}
@@ -0,0 +1,50 @@
+import json
+
+from harness.results_log import ResultsLog, compact_results_log, partial_results, read_results_log
+from run_all_models import load_results
+
+
+def _case(variant, nodeid, case, **row):
+    return {"type": "case", "variant": variant, "key": nodeid, "row": {"case": case, "passed": True, "failed": False, **row}}
+
+
+def test_log_survives_a_torn_last_line_and_keeps_latest_record(tmp_path):
+    path = tmp_path / "gpt-5-mini.jsonl"
+    log = ResultsLog(str(path), fsync_every=2)
+    log.write({"type": "run", "model": "gpt-5-mini", "timestamp": "Dec03-1430Z"})
+    log.write(_case("standard", "t[case_2]", 2, cost=None))
+    log.write(_case("standard", "t[case_1]", 1, cost=0.01))
+    log.write(_case("standard", "t[case_2]", 2, cost=0.02))  # usage filled in later
+    log.close()
+    with open(path, "a") as f:
+        f.write('{"type": "case", "variant": "stan')  # killed mid-write
+
+    compacted = compact_results_log(read_results_log(str(path)))
+
+    assert compacted["run"]["model"] == "gpt-5-mini"
+    assert [row["case"] for row in compacted["variants"]["standard"]] == [1, 2]
+    assert compacted["variants"]["standard"][1]["cost"] == 0.02
+
+
+def test_load_results_reads_partial_logs_and_prefers_final_json(tmp_path):
+    log = ResultsLog(str(tmp_path / "claude-haiku-4-5.jsonl"))
+    log.write({"type": "run", "model": "claude-haiku-4-5", "timestamp": "Dec03-1430Z"})
+    log.write(_case("diagnosis_only", "t[case_1]", 1, prompt_tokens=100, cost=0.5))
+    log.close()
+    ResultsLog(str(tmp_path / "gpt-5-mini.jsonl")).close()
+    (tmp_path / "gpt-5-mini.json").write_text(json.dumps({"model": "gpt-5-mini", "variants": {}}))
+
+    results = load_results(str(tmp_path))
+
+    assert results["gpt-5-mini"] == {"model": "gpt-5-mini", "variants": {}}
+    partial = results["claude-haiku-4-5"]
+    assert partial["partial"] is True
+    assert partial["variants"]["diagnosis_only"]["total_cost"] == 0.5
+    assert partial["variants"]["diagnosis_only"]["total_prompt_tokens"] == 100
+
+
+def test_partial_results_of_an_empty_log_is_none(tmp_path):
+    path = tmp_path / "turn.jsonl"
+    ResultsLog(str(path)).close()
+
+    assert partial_results(str(path)) is None
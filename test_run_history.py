@@ -0,0 +1,74 @@
+import pytest
+
+from harness.metrics import summarize
+from harness.run_history import RunHistory, new_run_id
+
+
+def _results(run_id, started_at, agent_times, model="gpt-5-mini"):
+    return {
+        "run_id": run_id,
+        "model": model,
+        "timestamp": "Dec03-1430Z",
+        "started_at": started_at,
+        "prompt_hashes": ["abc123"],
+        "variants": {
+            "standard": {
+                "cases": [
+                    {"case": case, "passed": case != 2, "failed": case == 2, "skipped": False,
+                     "total_time": agent_time * 2, "agent_time": agent_time, "prompt_tokens": 100,
+                     "completion_tokens": 10, "cost": 0.01, "prompt_hash": "abc123"}
+                    for case, agent_time in enumerate(agent_times, start=1)
+                ],
+            },
+        },
+    }
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = RunHistory(str(tmp_path / "runs.sqlite"))
+    yield history
+    history.close()
+
+
+def test_trend_per_run(history):
+    history.record_run(_results("run-a", "2026-01-01T10:00:00+00:00", [1.0, 2.0, 3.0]))
+    history.record_run(_results("run-b", "2026-01-02T10:00:00+00:00", [2.0, 4.0]))
+
+    trend = history.trend()
+
+    assert [row["run_id"] for row in trend] == ["run-a", "run-b"]
+    assert trend[0]["passed"] == 2 and trend[0]["cases"] == 3
+    assert trend[0]["agent_ms_p50"] == 2000
+    assert trend[1]["pass_rate"] == 0.5
+    assert history.trend(last=1)[0]["run_id"] == "run-b"
+
+
+def test_case_history_in_ms(history):
+    for day, agent_time in enumerate([1.0, 1.5, 2.0, 9.0], start=1):
+        history.record_run(_results(f"run-{day}", f"2026-01-0{day}T10:00:00+00:00", [agent_time]))
+
+    rows = history.case_history(1, metric="agent_ms", last=3)
+
+    assert [row["agent_ms"] for row in rows] == [1500, 2000, 9000]
+    assert summarize(row["agent_ms"] for row in rows)["p90"] == pytest.approx(7600)
+    with pytest.raises(ValueError):
+        history.case_history(1, metric="trace_id")
+
+
+def test_recording_a_run_again_replaces_it(history):
+    history.record_run(_results("run-a", "2026-01-01T10:00:00+00:00", [1.0, 2.0, 3.0]))
+    history.record_run(_results("run-a", "2026-01-01T10:00:00+00:00", [5.0]))
+
+    assert [row["agent_ms"] for row in history.case_history(1)] == [5000]
+    assert history.trend()[0]["cases"] == 1
+
+
+def test_runs_in_the_same_minute_keep_separate_entries(history):
+    started_at = "2026-01-01T10:00:00+00:00"
+    first, second = new_run_id(started_at), new_run_id(started_at)
+    for run_id in (first, second):
+        history.record_run({**_results(run_id, started_at, [1.0]), "label": "oneday-gpt-5-mini-Jan01-1000Z"})
+
+    assert first != second
+    assert {row["run_id"] for row in history.trend()} == {first, second}
@@ -0,0 +1,100 @@
+import json
+import threading
+
+from doc_extraction.scenario_store import FormatterVersion, ScenarioStore, scenario_store
+from harness.storage import connect_sqlite
+
+VERSION = FormatterVersion("abc123def456", "gpt-5-nano", 1)
+
+
+def scenario(case_number, text):
+    return {"name": f"Case {case_number}", "description": "d", "expected_diagnosis": "x", "case_number": case_number, "original_text": text}
+
+
+def test_upsert_and_lookup_by_text(tmp_path):
+    store = ScenarioStore(str(tmp_path / "scenarios.sqlite"), VERSION)
+    store.put_many([scenario(1, "first"), scenario(2, "second")])
+    store.put(scenario(5, "first"))
+
+    assert store.get("first")["case_number"] == 5
+    assert store.get("missing") is None
+    assert set(store.get_many(["first", "missing"])) == {"first"}
+    assert set(store.others(["first"])) == {"second"}
+    assert store.delete(["second"]) == 1
+    assert len(store) == 1
+
+
+def test_concurrent_writers_keep_every_entry(tmp_path):
+    path = str(tmp_path / "scenarios.sqlite")
+
+    def writer(offset):
+        store = ScenarioStore(path, VERSION)
+        for n in range(offset, offset + 50):
+            store.put(scenario(n, f"case text {n}"))
+        store.close()
+
+    threads = [threading.Thread(target=writer, args=(offset,)) for offset in (0, 50, 100)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(ScenarioStore(path, VERSION)) == 150
+
+
+def test_legacy_jsonl_cache_is_imported_once(tmp_path):
+    legacy = tmp_path / "case_scenarios_cache.jsonl"
+    legacy.write_text("\n".join(json.dumps(row) for row in (scenario(1, "first"), scenario(2, "second"))) + "\n", encoding="utf-8")
+    path = str(tmp_path / "scenarios.sqlite")
+
+    store = scenario_store(VERSION, path, legacy_path=str(legacy))
+    assert store.get("second")["case_number"] == 2
+    store.delete(["second"])
+    store.close()
+
+    # A non-empty store doesn't re-import
+    assert len(scenario_store(VERSION, path, legacy_path=str(legacy))) == 1
+
+
+def test_entries_are_keyed_by_formatter_version(tmp_path):
+    path = str(tmp_path / "scenarios.sqlite")
+    old = ScenarioStore(path, VERSION)
+    old.put_many([scenario(1, "first"), scenario(2, "second")])
+    new_prompt = ScenarioStore(path, VERSION._replace(prompt_hash="0123456789ab"))
+    new_prompt.put(scenario(1, "first"))
+
+    assert old.get("first") is not None and old.get("second") is not None
+    # A changed prompt misses the old entries and doesn't treat them as stale cases of its own
+    assert new_prompt.get("second") is None
+    assert new_prompt.others([]).keys() == {"first"}
+    assert new_prompt.count() == 1 and len(new_prompt) == 3
+    assert sorted(version.prompt_hash for version in new_prompt.stored_versions(["first"])["first"]) == ["0123456789ab", "abc123def456"]
+    assert new_prompt.stored_versions(["second"])["second"][0].changes_from(new_prompt.version) == ["prompt"]
+
+
+def test_select_and_invalidate_entries(tmp_path):
+    path = str(tmp_path / "scenarios.sqlite")
+    ScenarioStore(path, VERSION._replace(model="gpt-4o-mini")).put(scenario(1, "fever and cough"))
+    store = ScenarioStore(path, VERSION)
+    store.put_many([scenario(1, "fever and cough"), scenario(2, "Malaria RDT positive"), scenario(3, "headache")])
+
+    assert [entry["case_number"] for entry in store.select(case_numbers=[1])] == [1, 1]
+    assert [entry["case_number"] for entry in store.select(match="malaria")] == [2]
+    outdated = store.select(outdated=True)
+    assert [entry["version"].model for entry in outdated] == ["gpt-4o-mini"]
+    assert store.delete_keys([entry["cache_key"] for entry in outdated]) == 1
+    assert [(version.model, count) for version, count in store.versions()] == [("gpt-5-nano", 3)]
+
+
+def test_unversioned_store_is_rekeyed(tmp_path):
+    path = str(tmp_path / "scenarios.sqlite")
+    conn = connect_sqlite(path)
+    conn.execute("CREATE TABLE scenarios (text_hash TEXT PRIMARY KEY, case_number INTEGER, original_text TEXT NOT NULL, "
+                 "scenario TEXT NOT NULL, updated REAL NOT NULL)")
+    conn.execute("INSERT INTO scenarios VALUES ('h', 4, 'old text', ?, 0)", (json.dumps(scenario(4, "old text")),))
+    conn.close()
+
+    store = ScenarioStore(path, VERSION)
+
+    assert store.get("old text")["case_number"] == 4
+    assert len(store) == 1
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from harness.streaming import astream_completion, stream_completion
+from harness.testing import isolated_llm_hooks
+
+REQUEST = {
+    "model": "gpt-4o",
+    "messages": [{"role": "user", "content": "Hello"}],
+    "mock_response": "Hello nurse, please describe the patient.",
+}
+
+
+@pytest.fixture(autouse=True)
+def _isolated():
+    # A session's --cassette replay can't serve streams; its hooks are restored afterwards
+    with isolated_llm_hooks():
+        yield
+
+
+def test_stream_completion_assembles_message_and_times_it():
+    response, metrics = stream_completion(REQUEST)
+
+    assert response.choices[0].message.content == "Hello nurse, please describe the patient."
+    assert response.usage.completion_tokens > 0
+    assert 0 <= metrics["ttft_s"] <= metrics["generation_s"]
+
+
+def test_astream_completion_matches_sync():
+    response, metrics = asyncio.run(astream_completion(REQUEST))
+
+    assert response.choices[0].message.content == "Hello nurse, please describe the patient."
+    assert 0 <= metrics["ttft_s"] <= metrics["generation_s"]
+    assert metrics["tokens_per_s"] is None or metrics["tokens_per_s"] > 0
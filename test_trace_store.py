@@ -0,0 +1,42 @@
+import time
+
+from harness.trace_store import TraceStore, result_trace_ids
+
+FINISHED = {"spans": [{"span_id": "a", "timestamps": {"started_at": 1, "finished_at": 2}}]}
+RUNNING = {"spans": [{"span_id": "a", "timestamps": {"started_at": 1}}]}
+
+
+def test_store_round_trips_finished_traces_only(tmp_path):
+    store = TraceStore(str(tmp_path / "traces.sqlite"))
+
+    assert store.put("done", FINISHED, set_id="set-1")
+    assert not store.put("running", RUNNING, set_id="set-1")
+
+    assert store.get("done") == FINISHED
+    assert store.get("running") is None
+    assert store.get_many(["done", "running"]) == {"done": FINISHED}
+    assert store.trace_ids("set-1") == ["done"]
+
+
+def test_eviction_drops_old_then_least_recently_read(tmp_path):
+    store = TraceStore(str(tmp_path / "traces.sqlite"), max_age_days=1)
+    for trace_id in ("old", "a", "b", "c"):
+        store.put(trace_id, FINISHED)
+    store._conn.execute("UPDATE traces SET fetched = ? WHERE trace_id = 'old'", (time.time() - 2 * 86400,))
+    size = store._conn.execute("SELECT size FROM traces WHERE trace_id = 'a'").fetchone()[0]
+    store.get("a")  # most recently read survives
+    store.max_bytes = size
+
+    assert store.evict() == 3
+    assert store.get_many(["old", "a", "b", "c"]) == {"a": FINISHED}
+
+
+def test_result_trace_ids_filters_by_set(tmp_path):
+    path = tmp_path / "gpt-5-mini.json"
+    path.write_text(
+        '{"variants": {"standard": {"cases": ['
+        '{"set_id": "s1", "trace_ids": ["t1", "t2"]}, {"set_id": "s2", "trace_ids": ["t3"]}]}}}'
+    )
+
+    assert result_trace_ids([str(path)]) == {"t1": "s1", "t2": "s1", "t3": "s2"}
+    assert result_trace_ids([str(path)], "s2") == {"t3": "s2"}
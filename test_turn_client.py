@@ -0,0 +1,74 @@
+import httpx
+import pytest
+import requests
+
+import harness.turn as turn
+from harness.ratelimit import RateLimiter
+from harness.turn import TurnHTTPError, is_turn_retryable, post_turn_simulation, turn_reply
+
+
+def test_turn_reply_returns_message_text():
+    assert turn_reply(200, "", {"message": "Hi nurse", "state": "waiting"}) == "Hi nurse"
+
+
+@pytest.mark.parametrize(
+    "status_code, text, body",
+    [
+        (200, "", {"message": "Bye", "state": "end"}),
+        (200, "", {"message": ""}),
+        (500, "journey unexpectedly received user input", None),
+    ],
+)
+def test_turn_reply_treats_journey_end_as_end_tag(status_code, text, body):
+    assert turn_reply(status_code, text, body) == {"role": "assistant", "content": "<END>"}
+
+
+def test_turn_reply_raises_on_other_errors():
+    with pytest.raises(RuntimeError, match="Turn API error 502"):
+        turn_reply(502, "bad gateway", None)
+
+
+@pytest.mark.parametrize(
+    "error, retryable",
+    [
+        (TurnHTTPError(429, "slow down"), True),
+        (httpx.ConnectError("refused"), True),
+        (httpx.ConnectTimeout("no connection"), True),
+        (TurnHTTPError(503, "unavailable"), False),
+        (httpx.ReadTimeout("no reply"), False),
+        (httpx.RemoteProtocolError("closed mid-response"), False),
+        (requests.ReadTimeout("no reply"), False),
+    ],
+)
+def test_turn_only_retries_requests_the_server_did_not_process(error, retryable):
+    assert is_turn_retryable(error) is retryable
+
+
+def test_refused_connection_is_retried():
+    with pytest.raises(requests.ConnectionError) as refused:
+        requests.post("http://127.0.0.1:9", timeout=1)
+    assert is_turn_retryable(refused.value)
+
+
+class FakeResponse:
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+        self.headers = {}
+        self.ok = status_code < 400
+
+
+def test_server_error_is_not_resent(monkeypatch):
+    posts = []
+
+    class Session:
+        def post(self, url, headers, json):
+            posts.append(json["input"])
+            return FakeResponse(502, "bad gateway")
+
+    monkeypatch.setattr(turn, "get_turn_session", Session)
+    monkeypatch.setattr(turn, "rate_limiter", lambda: RateLimiter({}, "", max_retries=3))
+
+    with pytest.raises(TurnHTTPError, match="502"):
+        post_turn_simulation("journey", "OD1", "fever for 2 days")
+    assert posts == ["fever for 2 days"]
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+import harness.turn as turn
+from harness.turn import apost_turn_simulation, close_turn_async_client, post_turn_simulation, set_turn_base_url
+from harness.turn_standin import TurnStandIn, scripted_replies
+
+END = {"role": "assistant", "content": "<END>"}
+
+
+@pytest.fixture
+def standin(monkeypatch):
+    server = TurnStandIn(scripted_replies({"journey": ["Hi nurse", "Any danger signs?"]})).start()
+    # Restores the session's --turn-base-url afterwards, so later cases keep using it
+    monkeypatch.setattr(turn, "_base_url", turn._base_url)
+    set_turn_base_url(server.base_url)
+    yield server
+    server.stop()
+
+
+def test_standin_walks_script_then_ends_like_turn(standin):
+    assert post_turn_simulation("journey", "sim-1", "Hello") == "Hi nurse"
+    assert post_turn_simulation("journey", "sim-1", "Child with fever") == "Any danger signs?"
+    # Script exhausted -> state "end"; further input -> Turn's 500, both read as <END>
+    assert post_turn_simulation("journey", "sim-1", "No") == END
+    assert post_turn_simulation("journey", "sim-1", "Thanks") == END
+    # Simulations are independent
+    assert post_turn_simulation("journey", "sim-2", "Hello") == "Hi nurse"
+
+
+def test_standin_serves_concurrent_async_simulations(standin):
+    standin.latency_ms = 50
+
+    async def run():
+        try:
+            return await asyncio.gather(*(apost_turn_simulation("journey", f"sim-{i}", "Hello") for i in range(40)))
+        finally:
+            await close_turn_async_client()
+
+    assert asyncio.run(run()) == ["Hi nurse"] * 40
+    assert standin.requests == 40